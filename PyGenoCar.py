@@ -1,22 +1,34 @@
 from PyQt5 import QtGui, QtWidgets
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QScrollArea, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QFormLayout
-from PyQt5.QtGui import QPainter, QBrush, QPen, QPolygonF, QColor
-from PyQt5.QtCore import Qt, QPointF, QTimer, QRect
-from typing import Optional, Tuple, List, Dict, Any
+from PyQt5.QtGui import QPainter, QBrush, QPen, QPolygonF, QColor, QPixmap, QTransform
+from PyQt5.QtCore import Qt, QPointF, QLineF, QTimer, QRect, QRectF, QThread
+from typing import Optional, Tuple, List, Dict, Any, Sequence, Union, Callable
 import argparse
-import dill as pickle
+import bisect
+import weakref
 from enum import Enum, unique
 from Box2D import *
 import random
 from boxcar.floor import Floor
 from boxcar.car import Car, create_random_car, save_car, load_car, smart_clip
+from boxcar.archive import PopulationArchive, population_arrays, write_archive, load_chromosomes
+from boxcar.checkpoint import checkpoint_arrays, load_checkpoint
+from boxcar.genome import Genome, STATS_DTYPE
+from boxcar.headless import evaluate
+from boxcar.writer import BackgroundWriter
+from boxcar.trajectory import TrajectoryRecorder, TrajectoryFile, TrajectoryPlayer, CarShape, car_poses
+from boxcar.keyframes import Keyframe, KeyframeStore, capture_keyframe, restore_keyframe
+from boxcar.snapshot import SnapshotBuffer
+from boxcar.run_stats import RunStats
+from boxcar.phase_timer import PhaseTimer, format_phases
+from boxcar.profiling import GenerationProfiler, generation_range
 from genetic_algorithm.population import Population
 from genetic_algorithm.individual import Individual
 from genetic_algorithm.crossover import simulated_binary_crossover as SBX
 from genetic_algorithm.crossover import single_point_binary_crossover as SPBX
 from genetic_algorithm.mutation import gaussian_mutation
 from genetic_algorithm.selection import elitism_selection, roulette_wheel_selection, tournament_selection
-from settings import get_boxcar_constant, get_ga_constant
+from settings import get_settings
 import settings
 from windows import SettingsWindow, StatsWindow, draw_border
 import os
@@ -30,6 +42,10 @@ import math
 scale = 70
 default_scale = 70
 FPS = 60
+# Fraction of a tick `--steps-per-tick auto` spends stepping. The rest is left for painting and events
+STEP_BUDGET = 0.75
+# How often the stats labels are updated, in milliseconds
+STATS_INTERVAL = 250
 
 
 @unique
@@ -42,83 +58,264 @@ class States(Enum):
     REPLAY = 6
 
 
-def draw_circle(painter: QPainter, body: b2Body, local=False) -> None:
+def _hue_color(density: float, min_density: float, max_density: float) -> QColor:
     """
-    Draws a circle with the given painter.
+    Color used to show how dense a body is, from red (min_density) to red again (max_density) around the hue circle.
     """
-    for fixture in body.fixtures:
-        if isinstance(fixture.shape, b2CircleShape):
-            # Set the color of the circle to be based off wheel density
-            adjust = get_boxcar_constant('max_wheel_density') - get_boxcar_constant('min_wheel_density')
-            # If the min/max are the same you will get 0 adjust. This is to prevent divide by zero.
-            if adjust == 0.0:
-                hue_ratio = 0.0
-            else:
-                hue_ratio = (fixture.density - get_boxcar_constant('min_wheel_density')) / adjust
-            hue_ratio = min(max(hue_ratio, 0.0), 1.0)  # Just in case you leave the GA unbounded...
-            color = QColor.fromHsvF(hue_ratio, 1., .8)
-            painter.setBrush(QBrush(color, Qt.SolidPattern))
-
-            radius = fixture.shape.radius
-            if local:
-                center = fixture.shape.pos
-            else:
-                center = body.GetWorldPoint(fixture.shape.pos)
+    adjust = max_density - min_density
+    # If the min/max are the same you will get 0 adjust. This is to prevent divide by zero.
+    if adjust == 0.0:
+        hue_ratio = 0.0
+    else:
+        hue_ratio = (density - min_density) / adjust
+    hue_ratio = min(max(hue_ratio, 0.0), 1.0)  # Just in case you leave the GA unbounded...
+    return QColor.fromHsvF(hue_ratio, 1., .8)
 
-            # Fill circle
-            painter.drawEllipse(QPointF(center.x, center.y), radius, radius)
 
-            # Draw line (helps for visualization of how fast and direction wheel is moving)
-            _set_painter_solid(painter, Qt.black)
-            p0 = QPointF(center.x, center.y)
-            p1 = QPointF(center.x + radius*math.cos(body.angle), center.y + radius*math.sin(body.angle))
-            painter.drawLine(p0, p1)
+class FloorGeometry(object):
+    """
+    World space polygons of every floor tile, sorted by their left edge. The floor never moves,
+    so this is built once per floor. See `draw_floor`.
 
+    @NOTE: Building it reads the Box2D floor. With `--simulation-thread` it is built on the simulation thread and
+    handed to the game window with the snapshots, so painting only ever reads these plain polygons.
+    """
+    def __init__(self, floor: Floor):
+        self.key = floor_key(floor)
+        tiles = []
+        for tile in floor.floor_tiles:
+            world_coords = [tile.GetWorldPoint(point) for point in tile.fixtures[0].shape.vertices]
+            xs = [coord.x for coord in world_coords]
+            polygon = QPolygonF([QPointF(coord.x, coord.y) for coord in world_coords])
+            tiles.append((min(xs), max(xs), polygon, tile is floor.winning_tile))
+        tiles.sort(key=lambda t: t[0])
+
+        self.polygons: List[QPolygonF] = [t[2] for t in tiles]
+        self.is_winning: List[bool] = [t[3] for t in tiles]
+        self._min_x: List[float] = [t[0] for t in tiles]
+        # Running max of the right edges. Tiles can overlap, so the right edges alone aren't sorted
+        self._max_x: List[float] = []
+        for t in tiles:
+            self._max_x.append(max(t[1], self._max_x[-1]) if self._max_x else t[1])
+
+    def visible(self, min_x: float, max_x: float) -> range:
+        """
+        Indices of the tiles that can overlap [min_x, max_x]
+        """
+        start = bisect.bisect_left(self._max_x, min_x)
+        end = bisect.bisect_right(self._min_x, max_x)
+        return range(start, max(start, end))
 
-def draw_polygon(painter: QPainter, body: b2Body, poly_type: str = '', adjust_painter: bool = True, local=False) -> None:
+
+_floor_geometry: 'weakref.WeakKeyDictionary[Floor, FloorGeometry]' = weakref.WeakKeyDictionary()
+
+def get_floor_geometry(floor: Floor) -> FloorGeometry:
+    geometry = _floor_geometry.get(floor)
+    if geometry is None:
+        geometry = _floor_geometry[floor] = FloorGeometry(floor)
+    return geometry
+
+def draw_floor(painter: QPainter, floor: Floor) -> None:
     """
-    Draws a polygon with the given painter. Uses poly_type for determining the fill of the polygon.
+    Draws the floor tiles that are within the painter's viewport. The winning tile is green.
     """
-    if adjust_painter:
-        _set_painter_clear(painter, Qt.black)
+    geometry = get_floor_geometry(floor)
+    # What part of the world is on screen
+    inverse, invertible = painter.transform().inverted()
+    if invertible:
+        view = inverse.mapRect(QRectF(painter.viewport()))
+        tiles = geometry.visible(view.left(), view.right())
+    else:
+        tiles = range(len(geometry.polygons))
+
+    _draw_floor_tiles(painter, geometry, tiles)
+
+def _draw_floor_tiles(painter: QPainter, geometry: FloorGeometry, tiles: range) -> None:
+    _set_painter_clear(painter, Qt.black)
+    for i in tiles:
+        if geometry.is_winning[i]:
+            painter.setBrush(QBrush(Qt.green, Qt.SolidPattern))
+            painter.drawPolygon(geometry.polygons[i])
+            painter.setBrush(Qt.NoBrush)
+        else:
+            painter.drawPolygon(geometry.polygons[i])
 
-    for fixture in body.fixtures:
-        if isinstance(fixture.shape, b2PolygonShape):
-            poly = []
-            # If we are drawing a chassis, determine fill color
-            if poly_type == 'chassis':
-                adjust = get_boxcar_constant('max_chassis_density') - get_boxcar_constant('min_chassis_density')
-                # If the min/max are the same you will get 0 adjust. This is to prevent divide by zero.
-                if adjust == 0.0:
-                    hue_ratio = 0.0
-                else:
-                    hue_ratio = (fixture.density - get_boxcar_constant('min_chassis_density')) / adjust
-                hue_ratio = min(max(hue_ratio, 0.0), 1.0)  # Just in case you leave the GA unbounded...
-                color = QColor.fromHsvF(hue_ratio, 1., .8)
-                painter.setBrush(QBrush(color, Qt.SolidPattern))
-            
-            polygon: b2PolygonShape = fixture.shape
-            local_points: List[b2Vec2] = polygon.vertices
-
-            if local:
-                world_coords = local_points
-            else:
-                world_coords = [body.GetWorldPoint(point) for point in local_points]
-            for i in range(len(world_coords)):
-                p0 = world_coords[i]
-                if i == len(world_coords)-1:
-                    p1 = world_coords[0]
-                else:
-                    p1 = world_coords[i+1]
 
-                qp0 = QPointF(*p0)
-                qp1 = QPointF(*p1)
+class FloorLayer(object):
+    """
+    The floor pre-rendered into QPixmap chunks `CHUNK_WIDTH` pixels wide, at one scale.
+    Chunks are rendered the first time they come on screen. Once zoom changes, a new layer is needed.
+    """
+    CHUNK_WIDTH = 512
+    MAX_CHUNKS = 32  # Chunks far from the screen are dropped past this
+    _PADDING = 2  # Pixels around the tiles so the antialiased edges aren't cut off
+
+    def __init__(self, geometry: FloorGeometry, scale: float):
+        self.geometry = geometry
+        self.scale = scale
+        self.key = geometry.key
+        self._chunks: Dict[int, Tuple[QPixmap, int]] = {}  # Chunk -> (pixmap, device y of its top)
+
+    def _render_chunk(self, chunk: int) -> Tuple[Optional[QPixmap], int]:
+        left_x = chunk * self.CHUNK_WIDTH / self.scale
+        right_x = (chunk + 1) * self.CHUNK_WIDTH / self.scale
+        tiles = self.geometry.visible(left_x, right_x)
+        if not tiles:
+            return None, 0
+        bounds = self.geometry.polygons[tiles[0]].boundingRect()
+        for i in tiles:
+            bounds = bounds.united(self.geometry.polygons[i].boundingRect())
+        # Device y grows downwards, world y upwards
+        top = int(math.floor(-bounds.bottom() * self.scale)) - self._PADDING
+        bottom = int(math.ceil(-bounds.top() * self.scale)) + self._PADDING
+
+        pixmap = QPixmap(self.CHUNK_WIDTH, bottom - top)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        # Whole pixel offsets, so neighboring chunks line up exactly
+        painter.translate(-chunk * self.CHUNK_WIDTH, -top)
+        painter.scale(self.scale, -self.scale)
+        _draw_floor_tiles(painter, self.geometry, tiles)
+        painter.end()
+        return pixmap, top
+
+    def draw(self, painter: QPainter, offset_x: float, offset_y: float, width: int) -> None:
+        """
+        Draws the chunks that are on screen. The painter should be untransformed and (offset_x, offset_y) is where
+        the world origin is on screen.
+        """
+        first = int(math.floor(-offset_x / self.CHUNK_WIDTH))
+        last = int(math.floor((width - offset_x) / self.CHUNK_WIDTH))
+        for chunk in range(first, last + 1):
+            if chunk not in self._chunks:
+                self._chunks[chunk] = self._render_chunk(chunk)
+            pixmap, top = self._chunks[chunk]
+            if pixmap is not None:
+                painter.drawPixmap(int(round(offset_x)) + chunk * self.CHUNK_WIDTH, int(round(offset_y)) + top, pixmap)
+        if len(self._chunks) > self.MAX_CHUNKS:
+            keep = range(first - self.MAX_CHUNKS // 4, last + self.MAX_CHUNKS // 4 + 1)
+            self._chunks = {chunk: value for chunk, value in self._chunks.items() if chunk in keep}
+
+
+def floor_key(floor: Floor) -> Tuple:
+    """
+    Floors with the same key look the same. Resetting the world creates a new floor from the same settings.
+    """
+    return (floor.settings.fingerprint, floor.seed, floor.num_tiles)
+
+
+class CarPaint(object):
+    """
+    Everything about how a car looks that doesn't change while it is on the track: a brush for every chassis part
+    and wheel, and the chassis parts as polygons in the chassis' own coordinates. Each body is then drawn with a
+    single transform. Built once per car, see `get_car_paint`.
+    """
+    __slots__ = ('chassis_parts', 'wheels', 'outline', 'outline_brush', 'radius')
+
+    def __init__(self, chassis_parts: List[Tuple[List[Tuple[float, float]], float]],
+                 wheels: List[Tuple[Tuple[float, float], float, float]],
+                 outline: List[Tuple[float, float]]):
+        """
+        chassis_parts: (local vertices, density) of every chassis fixture
+        wheels: (local center, radius, density) of every wheel
+        outline: chassis vertices in order, for drawing the car at less detail
+        """
+        boxcar = get_settings().boxcar
+        self.chassis_parts: List[Tuple[QPolygonF, QBrush]] = []
+        for vertices, density in chassis_parts:
+            color = _hue_color(density, boxcar.min_chassis_density, boxcar.max_chassis_density)
+            self.chassis_parts.append((QPolygonF([QPointF(x, y) for x, y in vertices]), QBrush(color, Qt.SolidPattern)))
+
+        # The whole chassis as one polygon, colored by its mean density
+        self.outline = QPolygonF([QPointF(x, y) for x, y in outline])
+        mean_density = sum(density for _, density in chassis_parts) / max(len(chassis_parts), 1)
+        self.outline_brush = QBrush(_hue_color(mean_density, boxcar.min_chassis_density, boxcar.max_chassis_density), Qt.SolidPattern)
+
+        # Everything is within this distance of the chassis' origin. Wheels are centered on chassis vertices
+        self.radius = max((math.hypot(x, y) for x, y in outline), default=0.0) + max((radius for _, radius, _ in wheels), default=0.0)
+
+        # (center, radius, brush, spoke). The spoke shows how fast and in which direction the wheel is turning
+        self.wheels: List[Tuple[QPointF, float, QBrush, QLineF]] = []
+        for (x, y), radius, density in wheels:
+            color = _hue_color(density, boxcar.min_wheel_density, boxcar.max_wheel_density)
+            self.wheels.append((QPointF(x, y), radius, QBrush(color, Qt.SolidPattern), QLineF(x, y, x + radius, y)))
+
+    @classmethod
+    def from_car(cls, car: Car) -> 'CarPaint':
+        chassis_parts = [([(v[0], v[1]) for v in fixture.shape.vertices], fixture.density)
+                         for fixture in car.chassis.fixtures if isinstance(fixture.shape, b2PolygonShape)]
+        wheels = []
+        for wheel in car.wheels:
+            for fixture in wheel.body.fixtures:
+                if isinstance(fixture.shape, b2CircleShape):
+                    center = fixture.shape.pos
+                    wheels.append(((center.x, center.y), fixture.shape.radius, fixture.density))
+        return cls(chassis_parts, wheels, [(v.x, v.y) for v in car.chassis_vertices])
+
+    @classmethod
+    def from_shape(cls, shape: CarShape) -> 'CarPaint':
+        # Each part is a triangle between two neighboring vertices and the origin of the chassis
+        vertices = shape.chassis_vertices.tolist()
+        chassis_parts = [([vertices[i], vertices[(i+1) % len(vertices)], (0.0, 0.0)], density)
+                         for i, density in enumerate(shape.chassis_densities.tolist())]
+        wheels = [((0.0, 0.0), radius, density)
+                  for radius, density in zip(shape.wheel_radii.tolist(), shape.wheel_densities.tolist())]
+        return cls(chassis_parts, wheels, vertices)
+
+    def draw(self, painter: QPainter, poses: Sequence[Tuple[float, float, float]]) -> None:
+        """
+        Draws the car at `poses`, (x, y, angle) of the chassis followed by each wheel.
+        Uses the current pen and leaves the painter's transform the way it was.
+        """
+        base = painter.worldTransform()
+        for (x, y, angle), (center, radius, brush, spoke) in zip(poses[1:], self.wheels):
+            cos, sin = math.cos(angle), math.sin(angle)
+            painter.setWorldTransform(QTransform(cos, sin, -sin, cos, x, y) * base)
+            painter.setBrush(brush)
+            painter.drawEllipse(center, radius, radius)
+            painter.drawLine(spoke)
+
+        x, y, angle = poses[0]
+        cos, sin = math.cos(angle), math.sin(angle)
+        painter.setWorldTransform(QTransform(cos, sin, -sin, cos, x, y) * base)
+        for polygon, brush in self.chassis_parts:
+            painter.setBrush(brush)
+            painter.drawPolygon(polygon)
+        painter.setWorldTransform(base)
+
+    def draw_outline(self, painter: QPainter, x: float, y: float, angle: float) -> None:
+        """
+        Draws only the outline of the chassis at (x, y, angle). One polygon instead of a polygon per part and wheel
+        """
+        base = painter.worldTransform()
+        cos, sin = math.cos(angle), math.sin(angle)
+        painter.setWorldTransform(QTransform(cos, sin, -sin, cos, x, y) * base)
+        painter.setBrush(self.outline_brush)
+        painter.drawPolygon(self.outline)
+        painter.setWorldTransform(base)
+
+
+_car_paint: 'weakref.WeakKeyDictionary[Any, CarPaint]' = weakref.WeakKeyDictionary()
+
+def get_car_paint(car: Union[Car, CarShape]) -> CarPaint:
+    """
+    Paint data of a car on the track or a recorded car. Only built the first time it is drawn
+    """
+    paint = _car_paint.get(car)
+    if paint is None:
+        paint = CarPaint.from_shape(car) if isinstance(car, CarShape) else CarPaint.from_car(car)
+        _car_paint[car] = paint
+    return paint
+
+def draw_recorded_car(painter: QPainter, poses: np.ndarray, shape: CarShape) -> None:
+    """
+    Draws a car from its poses, (1 + num_wheels, 3) of (x, y, angle) like `TrajectoryFile.poses`. Looks the same
+    as the cars on the track, without needing the Box2D bodies.
+    """
+    _set_painter_clear(painter, Qt.black)
+    get_car_paint(shape).draw(painter, poses.tolist())
 
-                poly.append(qp0)
-                poly.append(qp1)
-            if poly:
-                painter.drawPolygon(QPolygonF(poly))
-    
 
 def _set_painter_solid(painter: QPainter, color: Qt.GlobalColor, with_antialiasing: bool = True):
     _set_painter(painter, color, True, with_antialiasing)
@@ -148,7 +345,22 @@ class GameWindow(QWidget):
         self.leader: Car = leader  # Track the leader
         self.best_car_ever = None
         self.cars = cars
+        self.playback: Optional[TrajectoryPlayer] = None  # Drawn instead of cars when replaying trajectories
+        self.labels: List[str] = []  # Drawn above each of `cars` when not empty
+        # Set when the world is stepped on another thread. The cars are then only ever drawn from the latest snapshot
+        self.snapshots: Optional[SnapshotBuffer] = None
+
+        # Level of detail. The leader and the `full_detail` cars nearest the camera are drawn with every part, the next
+        # `outline_detail` as an outline of their chassis and the rest as a dot. Cars off screen aren't drawn at all
+        self.full_detail = 10
+        self.outline_detail = 50
+        self.num_drawn = 0  # Cars on screen during the last paint
+        self.num_on_track = 0
         self.manual_control = False  # W,A,S,D, Z,C, E,R
+        self.phase_timer = PhaseTimer(enabled=False)  # Times painting when the main window's timer is on
+
+        # The floor pre-rendered at the current scale. See `_draw_floor`
+        self._floor_layer: Optional[FloorLayer] = None
 
         # Camera stuff
         self._camera = b2Vec2()
@@ -156,10 +368,19 @@ class GameWindow(QWidget):
         self._camera.x
 
     def pan_camera_to_leader(self) -> None:
-        diff_x = self._camera.x - self.leader.chassis.position.x
-        diff_y = self._camera.y - self.leader.chassis.position.y
-        self._camera.x -= self._camera_speed * diff_x 
-        self._camera.y -= self._camera_speed * diff_y
+        position = self.leader.chassis.position
+        self.pan_camera_to(position.x, position.y)
+
+    def pan_camera_to(self, x: float, y: float, speed: Optional[float] = None) -> None:
+        """
+        Moves the camera part of the way to (x, y). A speed of 1 moves it all the way there.
+        """
+        if speed is None:
+            speed = self._camera_speed
+        diff_x = self._camera.x - x
+        diff_y = self._camera.y - y
+        self._camera.x -= speed * diff_x
+        self._camera.y -= speed * diff_y
 
     def pan_camera_in_direction(self, direction: str, amount: int) -> None:
         diff_x, diff_y = 0, 0
@@ -181,31 +402,99 @@ class GameWindow(QWidget):
         self.update()
 
 
-    def _draw_car(self, painter: QPainter, car: Car):
+    def _draw_cars(self, painter: QPainter) -> None:
         """
-        Draws a car to the window
+        Draws the cars on the track, either straight from Box2D or from the simulation thread's latest snapshot
         """
-        for wheel in car.wheels:
-            draw_circle(painter, wheel.body)
-
-        draw_polygon(painter, car.chassis, poly_type='chassis')
+        if self.snapshots is not None:
+            with self.snapshots.read() as snapshot:
+                alive = np.flatnonzero(snapshot.alive)
+                paints = [get_car_paint(snapshot.shapes[i]) for i in alive]
+                chassis = snapshot.poses[snapshot.starts[alive]]
+                leader = -1
+                if snapshot.leader >= 0 and snapshot.alive[snapshot.leader]:
+                    leader = int(np.searchsorted(alive, snapshot.leader))
+                self._draw_with_detail(painter, paints, chassis, leader, lambda i: snapshot.car_poses(alive[i]).tolist())
+            return
+        # Nothing is left of a car once it's off the track
+        cars = [car for car in self.cars if car.is_alive]
+        paints = [get_car_paint(car) for car in cars]
+        chassis = np.array([(car.chassis.position.x, car.chassis.position.y, car.chassis.angle) for car in cars]).reshape(-1, 3)
+        leader = next((i for i, car in enumerate(cars) if car is self.leader), -1)
+        self._draw_with_detail(painter, paints, chassis, leader, lambda i: car_poses(cars[i]).tolist())
+
+    def _draw_with_detail(self, painter: QPainter, paints: List[CarPaint], chassis: np.ndarray, leader: int,
+                          poses: Callable[[int], Sequence[Tuple[float, float, float]]]) -> None:
+        """
+        Draws cars at a level of detail that goes down with their distance from the camera. See `full_detail`.
+        `chassis` is (num cars, 3) of the chassis' x, y, angle and `poses(i)` gives the poses of every body of car i.
+        """
+        self.num_on_track = len(paints)
+        self.num_drawn = 0
+        if not paints:
+            return
+        x, y = chassis[:, 0], chassis[:, 1]
+        radii = np.array([paint.radius for paint in paints])
+        # What part of the world is on screen. Cars that can't overlap it are skipped
+        inverse, invertible = painter.transform().inverted()
+        if invertible:
+            view = inverse.mapRect(QRectF(painter.viewport()))
+            visible = np.flatnonzero((x + radii >= view.left()) & (x - radii <= view.right()) &
+                                     (y + radii >= view.top()) & (y - radii <= view.bottom()))
+        else:
+            visible = np.arange(len(paints))
+        self.num_drawn = len(visible)
+
+        # Nearest to the camera first
+        order = visible[np.argsort(np.hypot(x[visible] - self._camera.x, y[visible] - self._camera.y), kind='stable')]
+        num_full = self.full_detail
+        # The leader is always drawn in full, on top of the nearest ones
+        if leader >= 0 and leader in order:
+            order = np.concatenate(([leader], order[order != leader]))
+            num_full += 1
+        full = order[:num_full]
+        outlines = order[num_full: num_full + self.outline_detail]
+        dots = order[num_full + self.outline_detail:]
+
+        # Least detailed first so the detailed cars end up on top
+        if len(dots):
+            pen = QPen(Qt.darkGray, 5, Qt.SolidLine, Qt.RoundCap)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.drawPoints(QPolygonF([QPointF(px, py) for px, py in chassis[dots, :2].tolist()]))
+            _set_painter_clear(painter, Qt.black)
+        for i in outlines.tolist():
+            px, py, angle = chassis[i].tolist()
+            paints[i].draw_outline(painter, px, py, angle)
+        for i in full.tolist():
+            paints[i].draw(painter, poses(i))
 
     def _draw_floor(self, painter: QPainter):
-        #@TODO: Make this more efficient. Only need to draw things that are currently on the screen or about to be on screen
-        for tile in self.floor.floor_tiles:
-            if tile is self.floor.winning_tile:
-                painter.setPen(QPen(Qt.black, 1./scale, Qt.SolidLine))
-                painter.setBrush(QBrush(Qt.green, Qt.SolidPattern))
-                painter.setRenderHint(QPainter.Antialiasing)
-                local_points: List[b2Vec2] = tile.fixtures[0].shape.vertices
-                world_coords = [tile.GetWorldPoint(point) for point in local_points]
-                qpoints = [QPointF(coord[0], coord[1]) for coord in world_coords]
-                polyf = QPolygonF(qpoints)
-                painter.drawPolygon(polyf)
-            else:
-                draw_polygon(painter, tile)
+        """
+        Draws the pre-rendered floor. It is only rendered again when the zoom or the floor changes.
+        """
+        if self.snapshots is not None:
+            # The world belongs to the simulation thread, which builds the floor geometry for us
+            with self.snapshots.read() as snapshot:
+                geometry = snapshot.floor
+            if geometry is None:
+                return
+        else:
+            geometry = get_floor_geometry(self.floor)
+        if self._floor_layer is None or self._floor_layer.scale != scale or self._floor_layer.key != geometry.key:
+            self._floor_layer = FloorLayer(geometry, scale)
+        painter.save()
+        painter.resetTransform()
+        self._floor_layer.draw(painter, 200 - (self._camera.x * scale), 250 + (self._camera.y * scale), self.size[0])
+        painter.restore()
+        # Leave the painter the way drawing the floor tiles would, the cars are drawn with the same pen
+        _set_painter_clear(painter, Qt.black)
 
     def paintEvent(self, event):
+        with self.phase_timer.phase('paint'):
+            self._paint()
+
+    def _paint(self) -> None:
         painter = QPainter(self)
         draw_border(painter, self.size)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -220,15 +509,83 @@ class GameWindow(QWidget):
         self._draw_floor(painter)
 
         # self.draw_polygon(painter, self.chassis)
-        for car in self.cars:
-            self._draw_car(painter, car)
+        self._draw_cars(painter)
+        if self.playback:
+            draw_recorded_car(painter, self.playback.poses, self.playback.shape)
+        if self.labels:
+            self._draw_labels(painter)
+
+    def _draw_labels(self, painter: QPainter) -> None:
+        """
+        Draws the label of each car above its chassis. Text has to be drawn without the flipped world transform.
+        """
+        transform = painter.transform()
+        painter.save()
+        painter.resetTransform()
+        painter.setPen(QPen(Qt.black))
+        for car, label in zip(self.cars, self.labels):
+            if not car.is_alive:
+                continue
+            point = transform.map(QPointF(car.chassis.position.x, car.chassis.position.y))
+            painter.drawText(QPointF(point.x() - 20, point.y() - 40), label)
+        painter.restore()
         # for fixture in self.chassis.fixtures:
         #     print([self.chassis.GetWorldPoint(vert) for vert in fixture.shape.vertices])
 
+class SimulationThread(QThread):
+    """
+    Steps the world off the GUI thread with `--simulation-thread`, so painting and dragging the window around don't
+    slow the simulation down and the window stays responsive in turbo.
+
+    Every repaint interval the poses of the cars are published to a `SnapshotBuffer`, which is all the game window
+    draws from. Stats only go through `MainWindow.run_stats`, which the GUI thread shows on its own timer.
+    """
+    def __init__(self, window: 'MainWindow'):
+        super().__init__(window)
+        self.window = window
+
+    def run(self) -> None:
+        window = self.window
+        frame = 0
+        last_publish = 0.0
+        steps_this_tick = 0
+        next_tick = time.perf_counter()
+        while not self.isInterruptionRequested():
+            window._step()
+            frame += 1
+            now = time.perf_counter()
+            if now - last_publish >= window._repaint_interval:
+                last_publish = now
+                window._snapshots.capture(frame, window.current_generation, window.cars, window.leader,
+                                          get_floor_geometry(window.floor))
+                window._snapshots.publish()
+
+            # Keep to --steps-per-tick steps per frame, the same as the timer does. Turbo and 'auto' go flat out
+            steps = window._steps_per_tick
+            if window._turbo or steps is None:
+                continue
+            steps_this_tick += 1
+            if steps_this_tick >= steps:
+                steps_this_tick = 0
+                next_tick += window._tick_seconds
+                delay = next_tick - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Fell behind. Don't try to catch up
+                    next_tick = time.perf_counter()
+
+
 class MainWindow(QMainWindow):
     def __init__(self, world, replay=False):
+        global args
         super().__init__()
+        # What the stats window shows. Written as things happen, shown a few times a second. See `_push_stats`
+        self.run_stats = RunStats()
+        # Where the time goes, per batch and generation. Off (and close to free) unless --time-phases is passed
+        self.phase_timer = PhaseTimer(args.time_phases or None, enabled=args.time_phases is not None and not replay)
         self.world = world
+        self.settings = get_settings()
         self.title = 'Genetic Algorithm - Cars'
         self.top = 150
         self.left = 150
@@ -240,16 +597,47 @@ class MainWindow(QMainWindow):
         self.state = States.FIRST_GEN
         self._next_pop = []  # Used when you are in state 1, i.e. creating new cars from the old population
         self.current_batch = 1
-        self.batch_size = get_boxcar_constant('run_at_a_time')
+        self.batch_size = self.settings.boxcar.run_at_a_time
         self.gen_without_improvement = 0
         self.replay = replay
+        # Saves happen on a background thread so a slow disk doesn't stall the simulation
+        self._writer = None
+        if args.save_pop or args.save_best or args.save_pop_on_close or args.checkpoint:
+            self._writer = BackgroundWriter()
+        self._recorder = None
+        if args.record_trajectories and not self.replay:
+            self._recorder = TrajectoryRecorder(args.record_trajectories, settings.settings)
+        # Plays back recorded trajectories without stepping the world. See `_update_playback`
+        self._player: Optional[TrajectoryPlayer] = None
+        self._playback_text = None
+        # Keyframes of the car being replayed, so seeking doesn't have to simulate from the start. See `_seek_replay`
+        self._keyframes: Optional[KeyframeStore] = None
+        self._replay_frame = 0
+        self._keyframed_until = -1  # Keyframes are only taken the first time a frame is played, see `_keyframe_if_due`
+        # (labels, chromosomes) of every car to replay at once with --replay-ghosts
+        self._ghosts: Optional[Tuple[List[str], np.ndarray]] = None
+        # Physics steps per timer tick. None steps for as much of the tick as `STEP_BUDGET` allows
+        self._steps_per_tick: Optional[int] = args.steps_per_tick
+        self._tick_seconds = 1. / self.settings.boxcar.fps
+        # Toggled with T. Steps back to back and only draws when a generation ends
+        self._turbo = False
+        self._last_repaint = 0.0
+        self._repaint_interval = self._tick_seconds
+        # With --simulation-thread. See `SimulationThread`
+        self._thread: Optional[SimulationThread] = None
+        self._snapshots: Optional[SnapshotBuffer] = None
+        self._shown_frame = -1
+        self._shown_generation = -1
+        # The cars `_positions` belongs to. See `_step`
+        self._tracked_cars: Optional[List[Car]] = None
+        self._positions = np.zeros(0)
 
         self.manual_control = False
 
         
         self.current_generation = 0
         self.leader = None  # What car is leading
-        self.num_cars_alive = get_boxcar_constant('run_at_a_time')
+        self.num_cars_alive = self.settings.boxcar.run_at_a_time
         self.batch_size = self.num_cars_alive
         self._total_individuals_ran = 0
         self._offset_into_population = 0  # Used if we display only a certain number at a 
@@ -261,74 +649,127 @@ class MainWindow(QMainWindow):
         self._creating_random_cars = True
         
         # Determine how large the next generation is
-        if get_ga_constant('selection_type').lower() == 'plus':
-            self._next_gen_size = get_ga_constant('num_parents') + get_ga_constant('num_offspring')
-        elif get_ga_constant('selection_type').lower() == 'comma':
-            self._next_gen_size = get_ga_constant('num_parents')
+        if self.settings.ga.selection_type.lower() == 'plus':
+            self._next_gen_size = self.settings.ga.num_parents + self.settings.ga.num_offspring
+        elif self.settings.ga.selection_type.lower() == 'comma':
+            self._next_gen_size = self.settings.ga.num_parents
         else:
-            raise Exception('Selection type "{}" is invalid'.format(get_ga_constant('selection_type')))
+            raise Exception('Selection type "{}" is invalid'.format(self.settings.ga.selection_type))
+
+        # Profiles --profile-generations while they run. See `_step`
+        self._profiler: Optional[GenerationProfiler] = None
+        if args.profile_generations and not self.replay:
+            self._profiler = GenerationProfiler(args.profile_out, args.profile_generations, self.settings.boxcar.run_at_a_time,
+                                                self.settings.boxcar.floor_creation_type)
+
+        # Chromosomes that the first generation is made of instead of random cars. See `_seed_first_generation`
+        self._first_gen_chromosomes = []
+        if args.seed_population and not self.replay and not args.resume:
+            self._seed_first_generation(args.seed_population, args.seed_random_fraction)
 
         if self.replay:
-            global args
-            self.floor = Floor(self.world)
+            self.floor = Floor(self.world, settings=self.settings)
             self.state = States.REPLAY
-            self.num_replay_inds = len([x for x in os.listdir(args.replay_from_folder) if x.startswith('car_')])
+            if args.replay_trajectories:
+                # The champion of every recorded generation. Nothing gets simulated, the poses are drawn as they are
+                trajectories = TrajectoryFile(args.replay_trajectories)
+                self._player = TrajectoryPlayer(trajectories, trajectories.champions(), args.replay_speed)
+                self.num_replay_inds = len(self._player.records)
+            else:
+                # What to pass to `load_car` for each replay. Archives are read by index
+                if args.replay_from_archive:
+                    self._replay_source = args.replay_from_archive
+                    if args.replay_index is not None:
+                        self._replay_names = [args.replay_index]
+                    else:
+                        self._replay_names = list(range(len(PopulationArchive(args.replay_from_archive))))
+                else:
+                    self._replay_source = args.replay_from_folder
+                    num_cars = len([x for x in os.listdir(args.replay_from_folder) if x.startswith('car_')])
+                    self._replay_names = ['car_{}.npy'.format(i) for i in range(num_cars)]
+                self.num_replay_inds = len(self._replay_names)
+                if args.replay_ghosts:
+                    self._ghosts = load_replay_chromosomes(args)
+                    self.num_replay_inds = 1
+                else:
+                    # No seeking with ghosts. Their scores are printed, and have to match --headless
+                    self._keyframes = KeyframeStore(args.keyframe_interval, int(args.keyframe_budget * 2**20))
+        elif args.resume:
+            # The population comes from the checkpoint, which is loaded once the windows exist
+            self.floor = Floor(self.world, settings=self.settings)
         else:
             self._set_first_gen()
         # self.population = Population(self.cars)
         # For now this is all I'm supporting, may change in the future. There really isn't a reason to use
         # uniform or single point here because all the values have different ranges, and if you clip them, it
         # can make those crossovers useless. Instead just use simulated binary crossover to ensure better crossover.
-        self._crossover_bins = np.cumsum([get_ga_constant('probability_SBX')])
+        self._crossover_bins = np.cumsum([self.settings.ga.probability_SBX])
 
-        self._mutation_bins = np.cumsum([get_ga_constant('probability_gaussian'),
-                                         get_ga_constant('probability_random_uniform')])
+        self._mutation_bins = np.cumsum([self.settings.ga.probability_gaussian,
+                                         self.settings.ga.probability_random_uniform])
 
 
 
         self.init_window()
-        self.stats_window.pop_size.setText(str(get_ga_constant('num_parents')))
+        self.run_stats.pop_size = self.settings.ga.num_parents
         self._set_number_of_cars_alive()
         self.game_window.cars = self.cars
+        self.game_window.playback = self._player
+        self.game_window.full_detail = args.lod_full
+        self.game_window.outline_detail = args.lod_outline
+        self.game_window.phase_timer = self.phase_timer
+        if not self.replay and args.resume:
+            self._restore_checkpoint(args.resume)
+        # No point in painting faster than the screen can show it
+        screen = QApplication.primaryScreen()
+        if screen and screen.refreshRate() > 0:
+            self._repaint_interval = max(self._tick_seconds, 1. / screen.refreshRate())
         self._timer = QTimer(self)
         self._timer.timeout.connect(self._update)
-        self._timer.start(1000//get_boxcar_constant('fps'))
+        self._timer.start(int(1000//self.settings.boxcar.fps))
+        self._stats_timer = QTimer(self)
+        self._stats_timer.timeout.connect(self._push_stats)
+        self._stats_timer.start(STATS_INTERVAL)
+        if args.simulation_thread:
+            self._snapshots = SnapshotBuffer()
+            self.game_window.snapshots = self._snapshots
+            self._thread = SimulationThread(self)
+            self._thread.start()
 
     def next_generation(self) -> None:
         if self.state == States.NEXT_GEN:
-            self.stats_window.pop_size.setText(str(self._next_gen_size))
+            self.run_stats.pop_size = self._next_gen_size
             self.current_batch = 0
             # Set next state to copy parents if its plus, otherwise comma is just going to create offspring
-            if get_ga_constant('selection_type').lower() == 'plus':
+            if self.settings.ga.selection_type.lower() == 'plus':
                 self.state = States.NEXT_GEN_COPY_PARENTS_OVER
-            elif get_ga_constant('selection_type').lower() == 'comma':
+            elif self.settings.ga.selection_type.lower() == 'comma':
                 self.state = States.NEXT_GEN_CREATE_OFFSPRING
             else:
-                raise Exception('Invalid selection_type: "{}"'.format(get_ga_constant('selection_type')))
+                raise Exception('Invalid selection_type: "{}"'.format(self.settings.ga.selection_type))
 
             self._offset_into_population = 0
             self._total_individuals_ran = 0  # Reset back to the first individual
 
-            self.population.individuals = self._next_pop
-            self._next_pop = []  # Reset the next pop
-
-            # Calculate fit
-            for individual in self.population.individuals:
-                individual.calculate_fitness()
-
-            # Should we save the pop
-            if args.save_pop:
-                path = os.path.join(args.save_pop, 'pop_gen{}'.format(self.current_generation))
-                if os.path.exists(path):
-                    raise Exception('{} already exists. This would overwrite everything, choose a different folder or delete it and try again'.format(path))
-                os.makedirs(path)
-                save_population(path, self.population, settings.settings)
-            # Save best? 
-            if args.save_best:
-                save_car(args.save_best, 'car_{}'.format(self.current_generation), self.population.fittest_individual, settings.settings)
-
-            self._set_previous_gen_avg_fitness()
-            self._set_previous_gen_num_winners()
+            finished_generation = self.current_generation
+            with self.phase_timer.phase('genomes'):
+                # Calculate fit and only keep the genomes around. The cars (and their Box2D handles) are done
+                self.population.individuals = [car.to_genome() for car in self._next_pop]
+                self._next_pop = []  # Reset the next pop
+                self._record_generation_stats()
+
+            with self.phase_timer.phase('save'):
+                # Should we save the pop
+                # @NOTE: The folders are checked once at startup (see `check_save_folders`), not here
+                if args.save_pop:
+                    path = os.path.join(args.save_pop, 'pop_gen{}.npz'.format(self.current_generation))
+                    save_population(path, self.population, settings.settings, self._writer)
+                # Save best? 
+                if args.save_best:
+                    best = self.population.fittest_individual
+                    self._writer.submit(save_car, args.save_best, 'car_{}'.format(self.current_generation),
+                                        Genome(np.copy(best.chromosome), best.fitness), settings.settings)
+
             self._increment_generation()
 
 
@@ -340,22 +781,28 @@ class MainWindow(QMainWindow):
                 self.gen_without_improvement = 0
             else:
                 self.gen_without_improvement += 1
-            # Set text for gen improvement
-            self.stats_window.gens_without_improvement.setText(str(self.gen_without_improvement))
-
-            # Set the population to be just the parents allowed for reproduction. Only really matters if `plus` method is used.
-            # If `plus` method is used, there can be more individuals in the next generation, so this limits the number of parents.
-            self.population.individuals = elitism_selection(self.population, get_ga_constant('num_parents'))
-
-            random.shuffle(self.population.individuals)
-            
-            # Parents + offspring selection type ('plus')
-            if get_ga_constant('selection_type').lower() == 'plus':
-                # Decrement lifespan
-                for individual in self.population.individuals:
-                    individual.lifespan -= 1
-
-        num_offspring = min(self._next_gen_size - len(self._next_pop), get_boxcar_constant('run_at_a_time'))
+            self.run_stats.gens_without_improvement = self.gen_without_improvement
+
+            with self.phase_timer.phase('ga'):
+                # Set the population to be just the parents allowed for reproduction. Only really matters if `plus` method is used.
+                # If `plus` method is used, there can be more individuals in the next generation, so this limits the number of parents.
+                self.population.individuals = elitism_selection(self.population, self.settings.ga.num_parents)
+
+                random.shuffle(self.population.individuals)
+                
+                # Parents + offspring selection type ('plus')
+                if self.settings.ga.selection_type.lower() == 'plus':
+                    # Decrement lifespan
+                    for individual in self.population.individuals:
+                        individual.lifespan -= 1
+
+            # Every car of the last generation has finished, so nothing lives in Box2D and the run can be checkpointed
+            if args.checkpoint and self.current_generation % args.checkpoint_every == 0:
+                with self.phase_timer.phase('save'):
+                    self._save_checkpoint()
+            self.phase_timer.end_generation(finished_generation)
+
+        num_offspring = min(self._next_gen_size - len(self._next_pop), self.settings.boxcar.run_at_a_time)
         self.cars = self._create_num_offspring(num_offspring)
         # Set number of cars alive
         self.num_cars_alive = len(self.cars)
@@ -367,9 +814,9 @@ class MainWindow(QMainWindow):
         leader = self.find_new_leader()
         self.leader = leader
         self.game_window.leader = leader
-        if get_ga_constant('selection_type').lower() == 'comma':
+        if self.settings.ga.selection_type.lower() == 'comma':
             self.state = States.NEXT_GEN_CREATE_OFFSPRING
-        elif get_ga_constant('selection_type').lower() == 'plus' and self._offset_into_population >= len(self.population.individuals):
+        elif self.settings.ga.selection_type.lower() == 'plus' and self._offset_into_population >= len(self.population.individuals):
             self.state = States.NEXT_GEN_CREATE_OFFSPRING
         
 
@@ -380,6 +827,80 @@ class MainWindow(QMainWindow):
 
 
 
+    def _reset_world(self) -> None:
+        """
+        Replaces the world and floor with brand new ones.
+        Box2D keeps internal state around (contact and proxy ordering) even after bodies are destroyed,
+        so this is what a resumed run starts from.
+        """
+        self.world = b2World(self.settings.boxcar.gravity)
+        self.floor = Floor(self.world, settings=self.settings)
+        self.game_window.world = self.world
+        self.game_window.floor = self.floor
+
+    def _checkpoint_state(self) -> Dict[str, Any]:
+        """
+        Everything besides the population that is needed to continue the run exactly where it left off.
+        Only valid between generations.
+        """
+        return {
+            'state': self.state.name,
+            'current_generation': self.current_generation,
+            'max_fitness': self.max_fitness,
+            'gen_without_improvement': self.gen_without_improvement,
+            'current_batch': self.current_batch,
+            'offset_into_population': self._offset_into_population,
+            'total_individuals_ran': self._total_individuals_ran,
+            'creating_random_cars': self._creating_random_cars,
+            'average_fitness_last_gen': '{:.2f}'.format(self.run_stats.mean_fitness_last_gen),
+            'num_solved_last_gen': str(self.run_stats.num_solved_last_gen),
+            'numpy_random_state': np.random.get_state(),
+            'random_state': random.getstate(),
+            'floor_random_state': self.floor.rand.get_state(),
+        }
+
+    def _save_checkpoint(self) -> None:
+        """
+        Snapshots the run and writes it to `--checkpoint` on the background writer.
+        """
+        global args
+        # Physics can't be saved, so a resumed run starts in a new world. Do the same here so both continue identically
+        self._reset_world()
+        arrays = checkpoint_arrays(self._checkpoint_state(), self.population.individuals)
+        self._writer.submit(write_archive, args.checkpoint, arrays, settings.settings)
+
+    def _restore_checkpoint(self, path: str) -> None:
+        """
+        Loads a checkpoint written by `_save_checkpoint` and starts the next batch, just like `next_generation`
+        does right after taking the checkpoint.
+        """
+        state, genomes, _ = load_checkpoint(path)
+        self.population = Population(genomes)
+        self._next_pop = []
+        self.state = States[state['state']]
+        self.current_generation = state['current_generation']
+        self.max_fitness = state['max_fitness']
+        self.gen_without_improvement = state['gen_without_improvement']
+        self.current_batch = state['current_batch']
+        self._offset_into_population = state['offset_into_population']
+        self._total_individuals_ran = state['total_individuals_ran']
+        self._creating_random_cars = state['creating_random_cars']
+
+        # Stats
+        self.run_stats.generation = self.current_generation
+        self.run_stats.pop_size = self._next_gen_size
+        self.run_stats.mean_fitness_last_gen = float(state['average_fitness_last_gen'])
+        self.run_stats.num_solved_last_gen = int(state['num_solved_last_gen'])
+        self.run_stats.gens_without_improvement = self.gen_without_improvement
+        self._set_max_fitness()
+
+        np.random.set_state(state['numpy_random_state'])
+        random.setstate(state['random_state'])
+        self.floor.rand.set_state(state['floor_random_state'])
+        print('resuming generation {} from {}'.format(self.current_generation, path))
+
+        self.next_generation()
+
     def init_window(self):
         self.centralWidget = QWidget(self)
         self.setCentralWidget(self.centralWidget)
@@ -387,7 +908,7 @@ class MainWindow(QMainWindow):
         self.setGeometry(self.top, self.left, self.width, self.height)
 
         # Create stats_window
-        self.stats_window = StatsWindow(self.centralWidget, (800, 200))
+        self.stats_window = StatsWindow(self.centralWidget, (800, 200), self.run_stats.history, self.phase_timer.enabled)
         self.stats_window.setGeometry(QRect(0, 500, 800, 200))
         self.stats_window.setObjectName('stats_window')
 
@@ -407,7 +928,7 @@ class MainWindow(QMainWindow):
         self.main_window.setGeometry(QRect(0, 0, 800, 500))
         self.main_window.setObjectName('main_window')
 
-        if get_boxcar_constant('show'):
+        if self.settings.boxcar.show:
             self.show()
 
     def find_new_leader(self) -> Optional[Car]:
@@ -425,13 +946,15 @@ class MainWindow(QMainWindow):
 
         return leader
 
-    def _set_previous_gen_avg_fitness(self) -> None:
-        avg_fitness = sum(ind.fitness for ind in self.population.individuals) / len(self.population.individuals)
-        self.stats_window.average_fitness_last_gen.setText('{:.2f}'.format(avg_fitness))
-
-    def _set_previous_gen_num_winners(self) -> None:
-        winners = sum(ind.is_winner for ind in self.population.individuals)
-        self.stats_window.num_solved_last_gen.setText(str(winners))
+    def _record_generation_stats(self) -> None:
+        """
+        Hands the generation that just finished to the stats. The chart and labels only ever read from `run_stats`,
+        so the population is looked at once here, on the thread running the generations.
+        """
+        individuals = self.population.individuals
+        fitness = np.fromiter((ind.fitness for ind in individuals), dtype=np.float64, count=len(individuals))
+        winners = sum(ind.is_winner for ind in individuals)
+        self.run_stats.end_generation(self.current_generation, fitness, winners)
 
     def _create_num_offspring(self, number_of_offspring) -> List[Individual]:
         """
@@ -445,7 +968,7 @@ class MainWindow(QMainWindow):
         #@TODO: comment this to new state
         # If the selection type is plus, then it means certain individuals survive to the next generation, so we need
         # to grab those first before we create new ones
-        # if get_ga_constant('selection_type').lower() == 'plus' and len(self._next_pop) < get_ga_constant('num_parents'):
+        # if self.settings.ga.selection_type.lower() == 'plus' and len(self._next_pop) < self.settings.ga.num_parents:
         if self.state == States.NEXT_GEN_COPY_PARENTS_OVER:
             # Select the subset of the individuals to bring to the next gen
             increment = 0  # How much did the offset increment by
@@ -453,23 +976,13 @@ class MainWindow(QMainWindow):
             # for individual in self.population.individuals[self._offset_into_population: self._offset_into_population + number_of_offspring]:
                     individual = self.population.individuals[idx]
                     increment += 1  # For offset
-                    world = self.world
-                    wheel_radii = individual.wheel_radii
-                    wheel_densities = individual.wheel_densities
-                    #wheel_motor_speeds = individual.wheel_motor_speeds
-                    chassis_vertices = individual.chassis_vertices
-                    chassis_densities = individual.chassis_densities
-                    winning_tile = individual.winning_tile
-                    lowest_y_pos = individual.lowest_y_pos
                     lifespan = individual.lifespan
 
                     # If the individual is still alive, they survive
                     if lifespan > 0:
-                        car = Car(world, 
-                                wheel_radii, wheel_densities,# wheel_motor_speeds,       # Wheel
-                                chassis_vertices, chassis_densities,                    # Chassis
-                                winning_tile, lowest_y_pos,
-                                lifespan)
+                        with self.phase_timer.phase('create_cars'):
+                            car = Car.create_car_from_chromosome(self.world, self.floor.winning_tile, self.floor.lowest_y,
+                                                                 lifespan, individual.chromosome, self.settings)
                         next_pop.append(car)
                         # Check to see if we've added enough parents. The reason we check here is if you requet 5 parents but
                         # 2/5 are dead, then you need to keep going until you get 3 good ones.
@@ -490,29 +1003,31 @@ class MainWindow(QMainWindow):
         else:
             # Keep adding children until we reach the size we need
             while len(next_pop) < number_of_offspring:
-                # Tournament crossover
-                if get_ga_constant('crossover_selection').lower() == 'tournament':
-                    p1, p2 = tournament_selection(self.population, 2, get_ga_constant('tournament_size'))
-                # Roulette
-                elif get_ga_constant('crossover_selection').lower() == 'roulette':
-                    p1, p2 = roulette_wheel_selection(self.population, 2)
-                else:
-                    raise Exception('crossover_selection "{}" is not supported'.format(get_ga_constant('crossover_selection').lower()))
+                with self.phase_timer.phase('ga'):
+                    # Tournament crossover
+                    if self.settings.ga.crossover_selection.lower() == 'tournament':
+                        p1, p2 = tournament_selection(self.population, 2, self.settings.ga.tournament_size)
+                    # Roulette
+                    elif self.settings.ga.crossover_selection.lower() == 'roulette':
+                        p1, p2 = roulette_wheel_selection(self.population, 2)
+                    else:
+                        raise Exception('crossover_selection "{}" is not supported'.format(self.settings.ga.crossover_selection.lower()))
 
-                # Crossover
-                c1_chromosome, c2_chromosome = self._crossover(p1.chromosome, p2.chromosome)
+                    # Crossover
+                    c1_chromosome, c2_chromosome = self._crossover(p1.chromosome, p2.chromosome)
 
-                # Mutation
-                self._mutation(c1_chromosome)
-                self._mutation(c2_chromosome)
+                    # Mutation
+                    self._mutation(c1_chromosome)
+                    self._mutation(c2_chromosome)
 
-                # Don't let the chassis density become <=0. It is bad
-                smart_clip(c1_chromosome)
-                smart_clip(c2_chromosome)
+                    # Don't let the chassis density become <=0. It is bad
+                    smart_clip(c1_chromosome)
+                    smart_clip(c2_chromosome)
 
                 # Create children from the new chromosomes
-                c1 = Car.create_car_from_chromosome(p1.world, p1.winning_tile, p1.lowest_y_pos, get_ga_constant('lifespan'), c1_chromosome)
-                c2 = Car.create_car_from_chromosome(p2.world, p2.winning_tile, p2.lowest_y_pos, get_ga_constant('lifespan'), c2_chromosome)
+                with self.phase_timer.phase('create_cars'):
+                    c1 = Car.create_car_from_chromosome(self.world, self.floor.winning_tile, self.floor.lowest_y, self.settings.ga.lifespan, c1_chromosome, self.settings)
+                    c2 = Car.create_car_from_chromosome(self.world, self.floor.winning_tile, self.floor.lowest_y, self.settings.ga.lifespan, c2_chromosome, self.settings)
 
                 # Add children to the next generation
                 next_pop.extend([c1, c2])
@@ -523,10 +1038,10 @@ class MainWindow(QMainWindow):
     
     def _increment_generation(self) -> None:
         """
-        Increments the generation and sets the label
+        Increments the generation
         """
         self.current_generation += 1
-        self.stats_window.generation.setText("<font color='red'>" + str(self.current_generation + 1) + '</font>')
+        self.run_stats.generation = self.current_generation
 
     def _set_first_gen(self) -> None:
         """
@@ -534,7 +1049,7 @@ class MainWindow(QMainWindow):
         """
         # Create the floor if FIRST_GEN, but not if it's in progress
         if self.state == States.FIRST_GEN:
-            self.floor = Floor(self.world)
+            self.floor = Floor(self.world, settings=self.settings)
 
         # We are now in progress of creating the first gen
         self.state = States.FIRST_GEN_IN_PROGRESS
@@ -543,15 +1058,21 @@ class MainWindow(QMainWindow):
         self.cars = []
         # Determine how many cars to make
         num_to_create = None
-        if get_ga_constant('num_parents') - self._total_individuals_ran >= get_boxcar_constant('run_at_a_time'):
-            num_to_create = get_boxcar_constant('run_at_a_time')
+        if self.settings.ga.num_parents - self._total_individuals_ran >= self.settings.boxcar.run_at_a_time:
+            num_to_create = self.settings.boxcar.run_at_a_time
         else:
-            num_to_create = get_ga_constant('num_parents') - self._total_individuals_ran
+            num_to_create = self.settings.ga.num_parents - self._total_individuals_ran
 
         # @NOTE that I create the subset of cars
-        for i in range(num_to_create):
-            car = create_random_car(self.world, self.floor.winning_tile, self.floor.lowest_y)
-            self.cars.append(car)
+        with self.phase_timer.phase('create_cars'):
+            for i in range(num_to_create):
+                if self._first_gen_chromosomes:
+                    chromosome = self._first_gen_chromosomes.pop()
+                    car = Car.create_car_from_chromosome(self.world, self.floor.winning_tile, self.floor.lowest_y,
+                                                         self.settings.ga.lifespan, chromosome, self.settings)
+                else:
+                    car = create_random_car(self.world, self.floor.winning_tile, self.floor.lowest_y, self.settings)
+                self.cars.append(car)
         
         self._next_pop.extend(self.cars)  # Add the cars to the next_pop which is used by population
 
@@ -559,72 +1080,213 @@ class MainWindow(QMainWindow):
         self.leader = leader
 
         # Time to go to new state?
-        if self._total_individuals_ran == get_ga_constant('num_parents'):
+        if self._total_individuals_ran == self.settings.ga.num_parents:
             self._creating_random_cars = False
             self.state = States.NEXT_GEN
 
+    def _seed_first_generation(self, source: str, random_fraction: float) -> None:
+        """
+        Makes the first generation out of a saved population instead of random cars.
+        The best `num_parents` cars are used, except for `random_fraction` of the generation which is left random.
+        If the saved population is too small, the rest is random as well.
+
+        @NOTE: The seeded cars still run in the first generation. A folder has no fitness to go by,
+        and an archive's fitness may be from a different track or settings.
+        """
+        if not 0.0 <= random_fraction <= 1.0:
+            raise Exception('seed_random_fraction must be between 0 and 1, got {}'.format(random_fraction))
+        num_seeded = self.settings.ga.num_parents - int(round(random_fraction * self.settings.ga.num_parents))
+        chromosomes = load_chromosomes(source)[:num_seeded]
+        # Reversed since `_set_first_gen` pops from the end and the best should run first
+        self._first_gen_chromosomes = list(chromosomes[::-1])
+        print('seeding {} of {} cars in the first generation from {}'.format(len(chromosomes), self.settings.ga.num_parents, source))
+
     def _set_number_of_cars_alive(self) -> None:
         """
-        Set the number of cars alive on the screen label
+        Updates the number of cars alive and which batch this is in the stats
+        """
+        stats = self.run_stats
+        stats.num_alive = self.num_cars_alive
+        stats.batch_size = self.batch_size
+        stats.current_batch = self.current_batch
+        stats.num_batches = math.ceil(self._generation_size(self.current_generation) / self.settings.boxcar.run_at_a_time)
+
+    def _generation_size(self, generation: int) -> int:
+        """
+        How many cars run in `generation`. The first generation is only the parents
         """
-        total_for_gen = get_ga_constant('num_parents')
-        if self.current_generation > 0:
-            total_for_gen = self._next_gen_size
-        num_batches = math.ceil(total_for_gen / get_boxcar_constant('run_at_a_time'))
-        text = '{}/{} (batch {}/{})'.format(self.num_cars_alive, self.batch_size, self.current_batch, num_batches)
-        self.stats_window.current_num_alive.setText(text)
+        if generation == 0:
+            return self.settings.ga.num_parents
+        return self._next_gen_size
 
     def _set_max_fitness(self) -> None:
         """
-        Sets the max fitness label
+        Updates the max fitness in the stats
         """
-        self.stats_window.best_fitness.setText(str(int(self.max_fitness)))
+        self.run_stats.best_fitness = self.max_fitness
+
+    def _push_stats(self) -> None:
+        """
+        Shows `run_stats` in the stats window. Runs off a timer every `STATS_INTERVAL`, so the labels change at the same
+        rate however many cars finish in between. Only labels whose text changed are touched.
+        Replays show their own labels, so only the cars alive (for ghosts) and drawn are shown then.
+        """
+        stats = self.run_stats
+        window = self.stats_window
+        texts = [(window.cars_drawn, '{}/{}'.format(self.game_window.num_drawn, self.game_window.num_on_track))]
+        if self._ghosts:
+            texts.append((window.current_num_alive, "<font color='red'>Ghosts {}/{}</font>".format(stats.num_alive, stats.batch_size)))
+        elif not self.replay:
+            texts.extend([
+                (window.generation, "<font color='red'>" + str(stats.generation + 1) + '</font>'),
+                (window.current_num_alive, '{}/{} (batch {}/{})'.format(stats.num_alive, stats.batch_size, stats.current_batch, stats.num_batches)),
+                (window.pop_size, str(stats.pop_size)),
+                (window.best_fitness, str(int(stats.best_fitness))),
+                (window.average_fitness_last_gen, '{:.2f}'.format(stats.mean_fitness_last_gen)),
+                (window.num_solved_last_gen, str(stats.num_solved_last_gen)),
+                (window.gens_without_improvement, str(stats.gens_without_improvement)),
+            ])
+        if window.phases is not None:
+            phases = self.phase_timer.last_generation
+            if phases:
+                overall = sum(phase.total for phase in phases.values())
+                slowest = max(phases, key=lambda name: phases[name].total)
+                texts.append((window.phases, '{} {:.0f}% of {:.1f}s'.format(slowest, 100.0 * phases[slowest].total / max(overall, 1e-9), overall)))
+                tooltip = '<pre>' + format_phases(phases) + '</pre>'
+                if window.phases.toolTip() != tooltip:
+                    window.phases.setToolTip(tooltip)
+        for label, text in texts:
+            if label.text() != text:
+                label.setText(text)
+        window.fitness_chart.refresh()
 
 
     def _update(self) -> None:
         """
-        Called once every 1/FPS to update everything
+        Called once every 1/FPS. Runs this tick's physics steps and repaints at most once.
         """
-        for car in self.cars:
-            if not car.is_alive:
-                continue
-            # Did the car die/win?
-            if not car.update():
-                # Another individual has finished
-                self._total_individuals_ran += 1
-                # Decrement the number of cars alive
-                self.num_cars_alive -= 1
-                self._set_number_of_cars_alive()
+        if self._player:
+            self._update_playback()
+            return
+        if self._thread is not None:
+            self._show_snapshot()
+            return
+        generation = self.current_generation
+        start = time.perf_counter()
+        if self._turbo:
+            # Nothing gets painted, so the whole tick can be spent stepping. Stop at the end of a generation to show it
+            while time.perf_counter() - start < self._tick_seconds:
+                self._step()
+                if self.current_generation != generation:
+                    break
+            if self.current_generation == generation:
+                return
+        elif self._steps_per_tick is None:
+            while time.perf_counter() - start < self._tick_seconds * STEP_BUDGET:
+                self._step()
+        else:
+            for _ in range(self._steps_per_tick):
+                self._step()
 
-                # If the car that just died/won was the leader, we need to find a new one
-                if car == self.leader:
-                    leader = self.find_new_leader()
-                    self.leader = leader
-                    self.game_window.leader = leader
-            else:
-                if not self.leader:
-                    self.leader = leader
-                    self.game_window.leader = leader
-                else:
-                    car_pos = car.position.x
-                    if car_pos > self.leader.position.x:
-                        self.leader = car
-                        self.game_window.leader = car
-        # If the leader is valid, then just pan to the leader
+        # The camera eases towards the leader once per frame drawn, however many steps that was
         if not self.manual_control and self.leader:
             self.game_window.pan_camera_to_leader()
+        now = time.perf_counter()
+        if self._turbo or now - self._last_repaint >= self._repaint_interval:
+            self._last_repaint = now
+            self.game_window._update()
+
+    def _show_snapshot(self) -> None:
+        """
+        Follows the leader and repaints from the latest snapshot of the simulation thread
+        """
+        with self._snapshots.read() as snapshot:
+            frame, generation = snapshot.frame, snapshot.generation
+            leader = snapshot.car_poses(snapshot.leader)[0].tolist() if snapshot.leader >= 0 else None
+        # Nothing new, or turbo and the generation isn't over yet
+        if frame == self._shown_frame or (self._turbo and generation == self._shown_generation):
+            return
+        self._shown_frame = frame
+        self._shown_generation = generation
+        if not self.manual_control and leader:
+            self.game_window.pan_camera_to(leader[0], leader[1])
+        self.game_window._update()
+
+    def _step(self) -> None:
+        """
+        Moves everything along by one physics step, starting the next batch or generation when the current one is done
+        """
+        # Here rather than where the generation changes, since this is the thread the generations run on
+        if self._profiler is not None:
+            self._profiler.at_generation(self.current_generation, self._generation_size(self.current_generation))
+        # How far each car of the batch got this step. Finished cars are -inf, so the leader is the argmax
+        if self._tracked_cars is not self.cars:
+            self._tracked_cars = self.cars
+            self._positions = np.full(len(self.cars), -np.inf)
+        positions = self._positions
+        with self.phase_timer.phase('cars'):
+            for i, car in enumerate(self.cars):
+                if not car.is_alive:
+                    continue
+                # Did the car die/win?
+                if car.update():
+                    positions[i] = car.x
+                else:
+                    positions[i] = -np.inf
+                    # Another individual has finished
+                    self._total_individuals_ran += 1
+                    # Decrement the number of cars alive
+                    self.num_cars_alive -= 1
+                    self._set_number_of_cars_alive()
+            leader = None
+            if len(positions):
+                # Same as `find_new_leader` when the leader is gone: the new one has to have made it past x = -1.
+                # Otherwise the batch is over
+                threshold = -np.inf if self.leader is not None and self.leader.is_alive else -1.0
+                i = int(np.argmax(positions))
+                if positions[i] > threshold:
+                    leader = self.cars[i]
+        if leader is not self.leader:
+            self.leader = leader
+            self.game_window.leader = leader
         # If there is not a leader then the generation is over OR the next group of N need to run
         if not self.leader:
+            # The batch is done. Its cars are the last ones added to the next population
+            if self._recorder:
+                with self.phase_timer.phase('save'):
+                    self._recorder.end_batch(self.cars, self.current_generation, len(self._next_pop) - len(self.cars))
+            self.phase_timer.end_batch(self.current_generation, self.current_batch)
             # Replay state
             if self.state == States.REPLAY:
-                name = 'car_{}.npy'.format(self.current_generation)
-                car = load_car(self.world, self.floor.winning_tile, self.floor.lowest_y, np.inf, args.replay_from_folder, name)
-                self.cars = [car]
+                if self._ghosts:
+                    # Every car at once, then start over
+                    labels, chromosomes = self._ghosts
+                    if self.cars:
+                        print_scores(labels, np.array([car.to_genome().stats for car in self.cars], dtype=STATS_DTYPE))
+                    # A new world every time, like `boxcar.evaluate` runs a batch
+                    self._reset_world()
+                    self.cars = [Car.create_car_from_chromosome(self.world, self.floor.winning_tile, self.floor.lowest_y, np.inf, chromosome, self.settings)
+                                 for chromosome in chromosomes]
+                    self.game_window.labels = labels
+                    txt = 'Ghosts {}/{}'.format(len(self.cars), len(self.cars))
+                else:
+                    # Start over once everything has been replayed
+                    name = self._replay_names[self.current_generation % self.num_replay_inds]
+                    car = load_car(self.world, self.floor.winning_tile, self.floor.lowest_y, np.inf, self._replay_source, name, self.settings)
+                    self.cars = [car]
+                    txt = 'Replay {}/{}'.format(self.current_generation + 1, self.num_replay_inds)
+                self.num_cars_alive = len(self.cars)
+                self.batch_size = len(self.cars)
+                self._set_number_of_cars_alive()
                 self.game_window.cars = self.cars
                 self.leader = self.find_new_leader()
                 self.game_window.leader = self.leader
+                if self._keyframes is not None:
+                    self._keyframes.clear()
+                    self._replay_frame = 0
+                    self._keyframed_until = -1
+                    self._keyframe_if_due()
                 self.current_generation += 1
-                txt = 'Replay {}/{}'.format(self.current_generation, self.num_replay_inds)
                 self.stats_window.generation.setText("<font color='red'>Replay</font>")
                 self.stats_window.pop_size.setText("<font color='red'>Replay</font>")
                 self.stats_window.current_num_alive.setText("<font color='red'>" + txt + '</font>')
@@ -642,7 +1304,7 @@ class MainWindow(QMainWindow):
             # Next N individuals need to run
             # We already have a population defined and we need to create N cars to run
             elif self.state == States.NEXT_GEN_CREATE_OFFSPRING:
-                num_create = min(self._next_gen_size - self._total_individuals_ran, get_boxcar_constant('run_at_a_time'))
+                num_create = min(self._next_gen_size - self._total_individuals_ran, self.settings.boxcar.run_at_a_time)
 
                 self.cars = self._create_num_offspring(num_create)
                 self.batch_size = len(self.cars)
@@ -654,7 +1316,7 @@ class MainWindow(QMainWindow):
                 self.leader = leader
                 self.game_window.leader = leader
                 # should we go to the next state? 
-                if (self.current_generation == 0 and (self._total_individuals_ran >= get_ga_constant('num_parents'))) or\
+                if (self.current_generation == 0 and (self._total_individuals_ran >= self.settings.ga.num_parents)) or\
                     (self.current_generation > 0 and (self._total_individuals_ran >= self._next_gen_size)):
                     self.state = States.NEXT_GEN
                 else:
@@ -667,13 +1329,154 @@ class MainWindow(QMainWindow):
             else:
                 raise Exception('You should not be able to get here, but if you did, awesome! Report this to me if you actually get here.')
 
-        self.world.ClearForces()
+        # Before stepping, so the poses line up with the positions the cars just saw in `update`
+        if self._recorder:
+            with self.phase_timer.phase('record'):
+                self._recorder.record(self.cars)
+
+        with self.phase_timer.phase('physics'):
+            self.world.ClearForces()
+
+            # Step
+            self.world.Step(1./FPS, 10, 6)
+
+        if self._keyframes is not None:
+            self._replay_frame += 1
+            self._keyframe_if_due()
+
+    def _keyframe_if_due(self) -> None:
+        """
+        Every `--keyframe-interval` frames of a replay, snapshots the car to seek from later. Playing on doesn't touch
+        the world, so a replay nobody seeks in runs exactly like the car did in training.
+        Only frames that haven't been played yet are kept, so the keyframes all come from playing straight through.
+        """
+        if self._replay_frame <= self._keyframed_until:
+            return
+        self._keyframed_until = self._replay_frame
+        if not self._keyframes.is_due(self._replay_frame):
+            return
+        self._keyframes.add(capture_keyframe(self._replay_frame, self.cars))
+
+    def _restore_keyframe(self, keyframe: Keyframe) -> None:
+        self._reset_world()
+        self.cars = restore_keyframe(keyframe, self.world, self.floor, self.settings)
+        self._replay_frame = keyframe.frame
+        self.game_window.cars = self.cars
+        self.leader = self.find_new_leader()
+        self.game_window.leader = self.leader
+
+    def _seek_replay(self, frame: int) -> None:
+        """
+        Jumps to a frame of the car being replayed. Only the frames since the nearest keyframe are simulated.
+        Stops early if the car finishes before `frame`.
+
+        @NOTE: Seeking is approximate. A keyframe is restored into a new world, and Box2D keeps internal state that
+        can't be snapshotted (i.e. contact ordering), so the car can end up somewhere slightly different than playing
+        straight through would have. Seeking forward with no keyframe in between just keeps simulating the world as it is.
+        """
+        frame = max(frame, 0)
+        keyframe = self._keyframes.nearest(frame)
+        # Going backwards, or there is a keyframe between here and there
+        if keyframe and (frame < self._replay_frame or keyframe.frame > self._replay_frame):
+            self._restore_keyframe(keyframe)
+        while self._replay_frame < frame:
+            # Same as `_update`, minus the drawing
+            for car in self.cars:
+                car.update()
+            if not any(car.is_alive for car in self.cars):
+                break
+            self.world.ClearForces()
+            self.world.Step(1./FPS, 10, 6)
+            self._replay_frame += 1
+            self._keyframe_if_due()
+        self.leader = self.find_new_leader()
+        self.game_window.leader = self.leader
+        if self.leader and not self.manual_control:
+            position = self.leader.chassis.position
+            self.game_window.pan_camera_to(position.x, position.y, 1.0)
+        self.game_window.update()
+
+    def _replay_key(self, key) -> bool:
+        """
+        Keys for seeking while replaying. Returns whether the key was used.
+            Left/Right: back/forward one second
+            Home: back to the start
+        """
+        if key == Qt.Key_Right:
+            self._seek_replay(self._replay_frame + FPS)
+        elif key == Qt.Key_Left:
+            self._seek_replay(self._replay_frame - FPS)
+        elif key == Qt.Key_Home:
+            self._seek_replay(0)
+        else:
+            return False
+        return True
 
-        # Update windows
+    def _update_playback(self) -> None:
+        """
+        Moves the trajectory player along instead of stepping the world
+        """
+        self._player.advance()
+        if not self.manual_control:
+            x, y, _ = self._player.poses[0].tolist()
+            self.game_window.pan_camera_to(x, y)
+        self._set_playback_labels()
         self.game_window._update()
 
-        # Step
-        self.world.Step(1./FPS, 10, 6)
+    def _set_playback_labels(self) -> None:
+        player = self._player
+        txt = 'Frame {}/{} at {:g}x{}'.format(int(player.frame) + 1, player.num_frames, player.speed,
+                                                ' (paused)' if player.paused else '')
+        # Only touch the labels when something changed, this runs every frame
+        if txt == self._playback_text:
+            return
+        self._playback_text = txt
+        self.stats_window.generation.setText("<font color='red'>Replay {}</font>".format(player.generation))
+        self.stats_window.pop_size.setText("<font color='red'>Champion {}/{}</font>".format(player.position + 1, self.num_replay_inds))
+        self.stats_window.best_fitness.setText(str(int(player.fitness)))
+        self.stats_window.current_num_alive.setText("<font color='red'>" + txt + '</font>')
+
+    def _playback_key(self, key) -> bool:
+        """
+        Keys for controlling trajectory playback. Returns whether the key was used.
+            Space: pause/resume
+            +/-: double/halve the speed
+            Left/Right: back/forward one second (one frame while paused)
+            N/P or PageDown/PageUp: next/previous champion
+            Home/End: start/end of the current champion
+            0-9: jump to 0%-90% of the current champion
+        """
+        player = self._player
+        step = 1 if player.paused else FPS
+        if key == Qt.Key_Space:
+            player.paused = not player.paused
+        elif key in (Qt.Key_Plus, Qt.Key_Equal):
+            player.speed = min(player.speed * 2, 64.0)
+        elif key == Qt.Key_Minus:
+            player.speed = max(player.speed / 2, 1./16)
+        elif key == Qt.Key_Right:
+            player.skip(step)
+        elif key == Qt.Key_Left:
+            player.skip(-step)
+        elif key in (Qt.Key_N, Qt.Key_PageDown):
+            player.next_record()
+        elif key in (Qt.Key_P, Qt.Key_PageUp):
+            player.previous_record()
+        elif key == Qt.Key_Home:
+            player.seek(0)
+        elif key == Qt.Key_End:
+            player.seek(player.num_frames - 1)
+        elif Qt.Key_0 <= key <= Qt.Key_9:
+            player.seek_fraction((key - Qt.Key_0) / 10.)
+        else:
+            return False
+        # Jumps would take a while to pan to, so snap the camera there
+        if not self.manual_control:
+            x, y, _ = player.poses[0].tolist()
+            self.game_window.pan_camera_to(x, y, 1.0)
+        self._set_playback_labels()
+        self.game_window.update()
+        return True
 
     def _crossover(self, p1_chromosome: np.ndarray, p2_chromosome: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
@@ -684,7 +1487,7 @@ class MainWindow(QMainWindow):
 
         # SBX
         if crossover_bucket == 0:
-            c1_chromosome, c2_chromosome = SBX(p1_chromosome, p2_chromosome, get_ga_constant('SBX_eta'))
+            c1_chromosome, c2_chromosome = SBX(p1_chromosome, p2_chromosome, self.settings.ga.SBX_eta)
         else:
             raise Exception('Unable to determine valid crossover based off probabilities')
 
@@ -699,10 +1502,10 @@ class MainWindow(QMainWindow):
 
         # Gaussian
         if mutation_bucket == 0:
-            mutation_rate = get_ga_constant('mutation_rate')
-            if get_ga_constant('mutation_rate_type').lower() == 'dynamic':
+            mutation_rate = self.settings.ga.mutation_rate
+            if self.settings.ga.mutation_rate_type.lower() == 'dynamic':
                 mutation_rate = mutation_rate / math.sqrt(self.current_generation + 1)
-            gaussian_mutation(chromosome, mutation_rate, scale=get_ga_constant('gaussian_mutation_scale'))
+            gaussian_mutation(chromosome, mutation_rate, scale=self.settings.ga.gaussian_mutation_scale)
 
 
         # Random uniform
@@ -715,6 +1518,10 @@ class MainWindow(QMainWindow):
     def keyPressEvent(self, event):
         global scale, default_scale
         key = event.key()
+        if self._player and self._playback_key(key):
+            return
+        if self._keyframes is not None and self._replay_key(key):
+            return
         # Zoom in
         if key == Qt.Key_C:
             scale += 1
@@ -738,36 +1545,137 @@ class MainWindow(QMainWindow):
             self.manual_control = False
         elif key == Qt.Key_E:
             scale = default_scale
+        elif key == Qt.Key_T and not self._player:
+            self._set_turbo(not self._turbo)
+
+    def _set_turbo(self, turbo: bool) -> None:
+        """
+        Turbo steps as fast as it can and only draws the last frame of each generation
+        """
+        self._turbo = turbo
+        # Back to back ticks. Events still get handled in between, so the window stays usable.
+        # The simulation thread doesn't need the timer to go any faster
+        if self._thread is None:
+            self._timer.setInterval(0 if turbo else int(1000//self.settings.boxcar.fps))
+        self.setWindowTitle(self.title + (' (turbo)' if turbo else ''))
 
     def closeEvent(self, event):
         global args
+        # Stop stepping before saving anything, the population can't change while it's written
+        if self._thread is not None:
+            self._thread.requestInterruption()
+            self._thread.wait()
+        # Keep what was profiled of a generation that didn't get to finish
+        if self._profiler is not None:
+            self._profiler.stop()
+        # Finish writing anything that is still queued
+        if self._writer:
+            self._writer.close()
+        self.phase_timer.close()
         if args.save_pop_on_close:
             save_population(args.save_pop_on_close, self.population, settings.settings)
 
 
-def save_population(population_folder: str, population: Population, settings: Dict[str, Any]) -> None:
+def save_population(path: str, population: Population, settings: Dict[str, Any],
+                    writer: Optional[BackgroundWriter] = None) -> None:
     """
-    Saves all cars in the population
+    Saves all cars in the population to a single archive. See boxcar/archive.py
+    If a writer is given, the population is copied here and written on the writer's thread.
     """
     # @NOTE: self.population.individuals is not the same as self.cars
     # self.cars are the cars that run at a given time for the BATCH
     # self.population.individuals is the ENTIRE population of chromosomes.
     # This will not save anything the first generation since those are just random cars and nothing has
     # been added to the population yet.
-    for i, car in enumerate(population.individuals):
-        name = 'car_{}'.format(i)
-        print('saving {} to {}'.format(name, population_folder))
-        save_car(population_folder, name, car, settings)
+    arrays = population_arrays(population.individuals)
+    print('saving {} cars to {}'.format(population.num_individuals, path))
+    if writer:
+        writer.submit(write_archive, path, arrays, settings)
+    else:
+        write_archive(path, arrays, settings)
+
+def load_replay_chromosomes(args) -> Tuple[List[str], np.ndarray]:
+    """
+    Labels and chromosomes of every car in `--replay-from-archive` or `--replay-from-folder`.
+    Cars saved with `--save-best` are labeled with the generation they are from.
+    """
+    if args.replay_from_archive:
+        archive = PopulationArchive(args.replay_from_archive)
+        return ['#{}'.format(i) for i in range(len(archive))], np.array(archive.chromosomes)
+    generations = sorted(int(name[len('car_'):-len('.npy')]) for name in os.listdir(args.replay_from_folder)
+                         if name.startswith('car_') and name.endswith('.npy'))
+    chromosomes = [np.load(os.path.join(args.replay_from_folder, 'car_{}.npy'.format(gen))) for gen in generations]
+    return ['Gen {}'.format(gen) for gen in generations], np.array(chromosomes).reshape(-1, 5, 8)
+
+def print_scores(labels: List[str], stats: np.ndarray) -> None:
+    """
+    Prints a line per car with the stats from a ghost replay, best first
+    """
+    print('{:>10} {:>14} {:>10} {:>7} {:>6}'.format('car', 'fitness', 'distance', 'frames', 'winner'))
+    for i in np.argsort(-stats['fitness'], kind='stable'):
+        row = stats[i]
+        print('{:>10} {:>14.2f} {:>10.2f} {:>7} {:>6}'.format(labels[i], row['fitness'], row['max_position'],
+                                                           row['frames'], 'yes' if row['is_winner'] else ''))
+
+def check_save_folders(args) -> None:
+    """
+    Makes sure nothing already saved would get overwritten. This is done before the run starts
+    instead of failing partway through. A resumed run is expected to write over what came after its checkpoint.
+    """
+    for folder, prefix in ((args.save_pop, 'pop_gen'), (args.save_best, 'car_')):
+        if folder and not args.resume and os.path.isdir(folder) and any(name.startswith(prefix) for name in os.listdir(folder)):
+            raise Exception('{} already contains saved individuals. This would overwrite them, choose a different folder or delete it and try again'.format(folder))
+
+def steps_per_tick(value: str) -> Optional[int]:
+    """
+    Parses --steps-per-tick. 'auto' is None
+    """
+    if value.lower() == 'auto':
+        return None
+    steps = int(value)
+    if steps < 1:
+        raise ValueError('--steps-per-tick must be at least 1')
+    return steps
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description='PyGenoCar V1.0')
     # Save
     parser.add_argument('--save-best', dest='save_best', type=str, help='destination folder to save best individiuals after each gen')
-    parser.add_argument('--save-pop', dest='save_pop', type=str, help='destination folder to save population after each gen')
-    parser.add_argument('--save-pop-on-close', dest='save_pop_on_close', type=str, help='destination to save the population when program exits')
+    parser.add_argument('--save-pop', dest='save_pop', type=str, help='destination folder to save a population archive to after each gen')
+    parser.add_argument('--save-pop-on-close', dest='save_pop_on_close', type=str, help='archive (.npz) to save the population to when program exits')
 
     # Replay @NOTE: Only supports replaying the best individual. Not a list of populations.
     parser.add_argument('--replay-from-folder', dest='replay_from_folder', type=str, help='destination to replay individuals from')
+    parser.add_argument('--replay-from-archive', dest='replay_from_archive', type=str, help='population archive (.npz) to replay individuals from')
+    parser.add_argument('--replay-index', dest='replay_index', type=int, help='only replay this individual from the archive')
+    parser.add_argument('--replay-trajectories', dest='replay_trajectories', type=str, help='folder from --record-trajectories to play the champion of each generation back from, without simulating')
+    parser.add_argument('--replay-ghosts', dest='replay_ghosts', action='store_true', help='replay every car from the folder or archive at once, labeled with its generation')
+    parser.add_argument('--headless', dest='headless', action='store_true', help='with --replay-ghosts, only re-score the cars and print the results')
+    parser.add_argument('--replay-speed', dest='replay_speed', type=float, default=1.0, help='frames to advance per tick when replaying trajectories')
+    parser.add_argument('--keyframe-interval', dest='keyframe_interval', type=int, default=60, help='frames between keyframes to seek from when replaying from a folder or archive')
+    parser.add_argument('--keyframe-budget', dest='keyframe_budget', type=float, default=64.0, help='megabytes of keyframes to keep per replayed car')
+
+    # Record
+    parser.add_argument('--record-trajectories', dest='record_trajectories', type=str, help='folder to record the pose of every car, every frame to')
+
+    # Speed
+    parser.add_argument('--steps-per-tick', dest='steps_per_tick', type=steps_per_tick, default=1, help="physics steps per frame, or 'auto' for as many as fit in a frame")
+    parser.add_argument('--lod-full', dest='lod_full', type=int, default=10, help='besides the leader, how many cars nearest the camera are drawn in full detail')
+    parser.add_argument('--lod-outline', dest='lod_outline', type=int, default=50, help='how many of the next nearest cars are drawn as an outline. The rest are drawn as dots')
+    parser.add_argument('--simulation-thread', dest='simulation_thread', action='store_true', help='step the world on its own thread so the window stays responsive')
+    parser.add_argument('--profile-generations', dest='profile_generations', type=generation_range, help="generations to profile, i.e. '120-125'. Counted from 0, like the --save-pop files")
+    parser.add_argument('--profile-out', dest='profile_out', type=str, default='profiles', help='folder to write the .pstats and .collapsed profile of each generation to')
+    parser.add_argument('--time-phases', dest='time_phases', type=str, nargs='?', const='', default=None, help='time each phase of the run loop and show it in the stats window. Given a path, also log it per batch and generation (.csv, otherwise JSONL)')
+
+    # Seed
+    parser.add_argument('--seed-population', dest='seed_population', type=str, help='population archive or folder of car_N.npy to start the first generation from')
+    parser.add_argument('--seed-random-fraction', dest='seed_random_fraction', type=float, default=0.0, help='fraction of the first generation to keep random when seeding')
+
+    # Checkpoint
+    parser.add_argument('--checkpoint', dest='checkpoint', type=str, help='file (.npz) to save a checkpoint of the whole run to')
+    parser.add_argument('--checkpoint-every', dest='checkpoint_every', type=int, default=1, help='checkpoint every N generations')
+    parser.add_argument('--resume', dest='resume', type=str, help='checkpoint to resume the run from')
 
     args = parser.parse_args()
     return args
@@ -776,17 +1684,61 @@ def parse_args():
 if __name__ == "__main__":
     global args
     args = parse_args()
+    check_save_folders(args)
     replay = False
-    if args.replay_from_folder:
+    if args.replay_trajectories:
+        trajectory_settings = TrajectoryFile(args.replay_trajectories).settings
+        if trajectory_settings is None:
+            raise Exception('settings.pkl not found within {}'.format(args.replay_trajectories))
+        settings.settings = trajectory_settings
+        replay = True
+    elif args.replay_from_archive:
+        archive_settings = PopulationArchive(args.replay_from_archive).settings
+        if archive_settings is None:
+            raise Exception('settings not found within {}'.format(args.replay_from_archive))
+        settings.settings = archive_settings
+        replay = True
+    elif args.replay_from_folder:
         if 'settings.pkl' not in os.listdir(args.replay_from_folder):
             raise Exception('settings.pkl not found within {}'.format(args.replay_from_folder))
+        import dill as pickle
         settings_path = os.path.join(args.replay_from_folder, 'settings.pkl')
         with open(settings_path, 'rb') as f:
             settings.settings = pickle.load(f)
         replay = True
 
 
-    world = b2World(get_boxcar_constant('gravity'))
+    if args.simulation_thread and replay:
+        raise Exception('--simulation-thread only works while training, not while replaying')
+
+    if args.profile_generations and replay and args.replay_ghosts and args.headless and 0 not in args.profile_generations:
+        raise Exception('--replay-ghosts --headless runs everything as generation 0, so --profile-generations has to include 0')
+
+    # Continue with the settings the checkpoint was made with
+    if args.resume and not replay:
+        checkpoint_settings = PopulationArchive(args.resume).settings
+        if checkpoint_settings is not None:
+            settings.settings = checkpoint_settings
+
+    # Re-score every car in a single world, without any window
+    if replay and args.replay_ghosts and args.headless:
+        labels, chromosomes = load_replay_chromosomes(args)
+        timer = PhaseTimer(args.time_phases or None, enabled=args.time_phases is not None)
+        # Re-scoring is all one generation, generation 0
+        profiler = None
+        if args.profile_generations:
+            profiler = GenerationProfiler(args.profile_out, args.profile_generations, len(chromosomes),
+                                          get_settings().boxcar.floor_creation_type)
+            profiler.at_generation(0, len(chromosomes))
+        print_scores(labels, evaluate(chromosomes, get_settings(), batch_size=len(chromosomes), timer=timer))
+        if profiler:
+            profiler.stop()
+        if timer.enabled:
+            print(format_phases(timer.end_generation(0)))
+        timer.close()
+        sys.exit(0)
+
+    world = b2World(get_settings().boxcar.gravity)
     App = QApplication(sys.argv)
     window = MainWindow(world, replay)
     sys.exit(App.exec_())
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Time appending to `FitnessHistory` and painting the `FitnessChart` in the stats window, for runs of different length.
+
+Both should stay flat however many generations there are, since the history is decimated into a fixed number of
+buckets.
+
+    python benchmarks/fitness_chart.py --generations 1000,10000,100000
+"""
+import argparse
+import os
+import sys
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from boxcar.run_stats import FitnessHistory
+from windows import FitnessChart
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Fitness chart append and paint time')
+    parser.add_argument('--generations', dest='generations', type=str, default='1000,10000,100000', help='comma separated run lengths')
+    parser.add_argument('--frames', dest='frames', type=int, default=50, help='times to paint the chart')
+    parser.add_argument('--size', dest='size', type=str, default='160x200', help='WIDTHxHEIGHT of the chart')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    app = QApplication([])
+    width, height = (int(x) for x in args.size.lower().split('x'))
+    rng = np.random.default_rng(0)
+    print('{:>12} {:>12} {:>12} {:>10}'.format('generations', 'append (us)', 'paint (ms)', 'buckets'))
+    for num_generations in (int(n) for n in args.generations.split(',')):
+        history = FitnessHistory()
+        # Something that looks like a run: best fitness climbing with noise and a few more winners over time
+        best = 1e6 * np.log1p(np.arange(num_generations)) + rng.normal(scale=1e5, size=num_generations)
+        start = time.perf_counter()
+        for generation in range(num_generations):
+            history.append(generation, best[generation], best[generation] / 3, best[generation] / 5, generation * 20 // num_generations)
+        append_time = (time.perf_counter() - start) / num_generations
+
+        chart = FitnessChart(None, history)
+        chart.resize(width, height)
+        chart.refresh()
+        chart.grab()  # Warm up
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            chart.grab()
+        paint_time = (time.perf_counter() - start) / args.frames
+        print('{:>12} {:>12.1f} {:>12.2f} {:>10}'.format(num_generations, append_time * 1e6, paint_time * 1e3, len(history.buckets()[0])))
@@ -0,0 +1,63 @@
+"""
+Time it takes to draw the floor, for different track lengths.
+
+Draws the floor onto an offscreen image the size of the game window, once with the camera at the start
+of the track and once at the end. With culling the time shouldn't depend on the number of tiles.
+
+    python benchmarks/floor_render.py --tiles 200,2000,20000
+"""
+import argparse
+import os
+import sys
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Box2D import b2World
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QApplication
+from boxcar.floor import Floor
+from settings import get_settings
+import PyGenoCar
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Floor drawing time')
+    parser.add_argument('--tiles', dest='tiles', type=str, default='200,2000,20000', help='comma separated track lengths')
+    parser.add_argument('--frames', dest='frames', type=int, default=100, help='frames to draw per measurement')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='take the best of this many runs')
+
+    args = parser.parse_args()
+    return args
+
+def time_frames(floor: Floor, camera_x: float, frames: int) -> float:
+    """
+    Milliseconds per frame to draw the floor with the camera at `camera_x`, same transform as `GameWindow`
+    """
+    image = QImage(800, 500, QImage.Format_RGB32)
+    scale = PyGenoCar.scale
+    start = time.perf_counter()
+    for _ in range(frames):
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.translate(200 - camera_x * scale, 250)
+        painter.scale(scale, -scale)
+        PyGenoCar.draw_floor(painter, floor)
+        painter.end()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    app = QApplication([])
+    settings = get_settings()
+    print('{:>8} {:>12} {:>12} {:>12}'.format('tiles', 'build (ms)', 'start (ms)', 'end (ms)'))
+    for num_tiles in (int(n) for n in args.tiles.split(',')):
+        floor = Floor(b2World(settings.boxcar.gravity), num_tiles=num_tiles, settings=settings)
+        end_x = floor.winning_tile.position.x
+        start = time.perf_counter()
+        time_frames(floor, 0.0, 1)  # The first frame builds anything that gets cached
+        build = (time.perf_counter() - start) * 1000
+        at_start = min(time_frames(floor, 0.0, args.frames) for _ in range(args.repeat))
+        at_end = min(time_frames(floor, end_x, args.frames) for _ in range(args.repeat))
+        print('{:>8} {:>12.2f} {:>12.3f} {:>12.3f}'.format(num_tiles, build, at_start, at_end))
@@ -0,0 +1,121 @@
+"""
+Startup benchmark for the headless entry point.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters, groups the import time of everything
+`<module>` pulls in by package and checks that none of the heavy modules (PyQt5, dill, scipy) were pulled in.
+numpy and Box2D are required by the simulation, so the budget only applies to everything else.
+
+    python benchmarks/import_time.py [--module boxcar.headless] [--budget-ms 30] [--record import_time.jsonl]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('PyQt5', 'dill', 'scipy')
+REQUIRED_MODULES = ('numpy', 'Box2D')
+
+
+def _import_times(module: str) -> Tuple[Dict[str, float], List[str]]:
+    """
+    Returns the self time (ms) per package for everything imported by `module`, and every package imported at all.
+    Modules that numpy or Box2D pull in (i.e. `typing` imported by numpy) are charged to numpy or Box2D.
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-c', 'import {}'.format(module)]
+    result = subprocess.run(cmd, cwd=REPO, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, check=True)
+
+    # The output is post-order, children are printed right before their parent and are indented further
+    roots = []
+    stack: List[Tuple[int, str, int, list]] = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        depth = len(name) - len(name.lstrip())
+        children = []
+        while stack and stack[-1][0] > depth:
+            children.insert(0, stack.pop())
+        stack.append((depth, name.strip(), int(self_us), children))
+    roots = [node for node in stack if node[1] == module]
+
+    per_package: Dict[str, float] = defaultdict(float)
+    imported = set()
+    def walk(node, owner):
+        _, name, self_us, children = node
+        package = name.split('.')[0]
+        imported.add(package)
+        if owner is None and package in REQUIRED_MODULES:
+            owner = package
+        per_package[owner or package] += self_us / 1000.0
+        for child in children:
+            walk(child, owner)
+    for root in roots:
+        walk(root, None)
+    return per_package, sorted(imported)
+
+def _wall_time(module: str, repeat: int) -> float:
+    """
+    Best wall time (ms) of starting an interpreter and importing `module`, minus an empty interpreter start.
+    """
+    def best(code: str) -> float:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=REPO, check=True)
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000.0
+    return best('import {}'.format(module)) - best('pass')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Import time benchmark for the headless entry point')
+    parser.add_argument('--module', dest='module', type=str, default='boxcar.headless', help='module to import')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5, help='number of runs, the best one is reported')
+    parser.add_argument('--budget-ms', dest='budget_ms', type=float, default=30.0,
+                        help='allowed import time (ms) not counting {}'.format(', '.join(REQUIRED_MODULES)))
+    parser.add_argument('--record', dest='record', type=str, default=None, help='append the result as a JSON line to this file')
+    parser.add_argument('--top', dest='top', type=int, default=10, help='number of packages to show')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    # Take the best run per package, i.e. the one with the least noise
+    per_package: Dict[str, float] = {}
+    imported: List[str] = []
+    for _ in range(args.repeat):
+        times, imported = _import_times(args.module)
+        for name, ms in times.items():
+            per_package[name] = min(per_package.get(name, ms), ms)
+    wall_ms = _wall_time(args.module, args.repeat)
+
+    required_ms = sum(per_package.get(name, 0.0) for name in REQUIRED_MODULES)
+    other_ms = sum(per_package.values()) - required_ms
+    heavy = [name for name in HEAVY_MODULES if name in imported]
+
+    print('import {}: {:.1f} ms wall ({:.1f} ms numpy/Box2D, {:.1f} ms everything else)'.format(
+        args.module, wall_ms, required_ms, other_ms))
+    for name, ms in sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print('  {:<24} {:>8.2f} ms'.format(name, ms))
+
+    if args.record:
+        with open(args.record, 'a') as f:
+            f.write(json.dumps({'time': time.time(), 'module': args.module, 'wall_ms': wall_ms,
+                                'required_ms': required_ms, 'other_ms': other_ms, 'heavy': heavy}) + '\n')
+
+    failed = False
+    if heavy:
+        print('FAIL: heavy modules imported: {}'.format(', '.join(heavy)))
+        failed = True
+    if other_ms > args.budget_ms:
+        print('FAIL: {:.1f} ms is over the budget of {:.1f} ms'.format(other_ms, args.budget_ms))
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,83 @@
+"""
+Time `GameWindow.paintEvent` takes per frame.
+
+Puts `--cars` random cars on the track, lets them drive for `--warmup` steps so they are spread out, then paints the
+game window into an offscreen image `--frames` times while the camera follows the leader. Only painting is timed.
+
+    python benchmarks/paint_time.py --cars 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from Box2D import b2World
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+from boxcar.floor import Floor
+from boxcar.car import Car, create_random_chromosome
+from settings import get_settings
+import PyGenoCar
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Game window paint time')
+    parser.add_argument('--cars', dest='cars', type=int, default=20, help='cars on the track')
+    parser.add_argument('--warmup', dest='warmup', type=int, default=300, help='steps to simulate before painting')
+    parser.add_argument('--frames', dest='frames', type=int, default=200, help='frames to paint')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='take the best of this many runs')
+    parser.add_argument('--scale', dest='scale', type=float, default=70, help='pixels per meter. Lower fits more cars on screen')
+    parser.add_argument('--lod-full', dest='lod_full', type=int, default=10, help='cars drawn in full detail besides the leader')
+    parser.add_argument('--lod-outline', dest='lod_outline', type=int, default=50, help='cars drawn as an outline')
+
+    args = parser.parse_args()
+    return args
+
+def leader(cars):
+    alive = [car for car in cars if car.is_alive]
+    return max(alive, key=lambda car: car.position.x) if alive else None
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    np.random.seed(0)
+    random.seed(0)
+    app = QApplication([])
+    settings = get_settings()
+    world = b2World(settings.boxcar.gravity)
+    floor = Floor(world, settings=settings)
+    # Cars die after a while, so make sure none do while painting
+    cars = [Car.create_car_from_chromosome(world, floor.winning_tile, floor.lowest_y, np.inf, create_random_chromosome(settings), settings)
+            for _ in range(args.cars)]
+    for car in cars:
+        car.max_tries = 10**9
+    for _ in range(args.warmup):
+        for car in cars:
+            car.update()
+        world.Step(1./PyGenoCar.FPS, 10, 6)
+
+    window = PyGenoCar.GameWindow(None, (800, 500), world, floor, cars, leader(cars))
+    window.resize(800, 500)
+    window.full_detail = args.lod_full
+    window.outline_detail = args.lod_outline
+    PyGenoCar.scale = args.scale
+    image = QImage(800, 500, QImage.Format_RGB32)
+    times = []
+    for _ in range(args.repeat):
+        elapsed = 0.0
+        for _ in range(args.frames):
+            for car in cars:
+                car.update()
+            world.Step(1./PyGenoCar.FPS, 10, 6)
+            window.leader = leader(cars)
+            if window.leader:
+                window.pan_camera_to_leader()
+            start = time.perf_counter()
+            window.render(image)
+            elapsed += time.perf_counter() - start
+        times.append(elapsed / args.frames * 1000)
+    print('{} cars: {:.3f} ms per frame ({} on screen)'.format(args.cars, min(times), window.num_drawn))
@@ -0,0 +1,71 @@
+"""
+Cost of `PhaseTimer` relative to a physics step.
+
+Times a loop of empty `with timer.phase(...)` blocks with the timer disabled and enabled, against the same loop
+without them. Then scores a few batches with `evaluate` and an enabled timer to get the time per step, and reports
+what the blocks around each step (`cars` and `physics`) cost as a share of it.
+
+    python benchmarks/phase_overhead.py --batches 3
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from boxcar.car import create_random_chromosome
+from boxcar.headless import evaluate
+from boxcar.phase_timer import PhaseTimer, format_phases
+from settings import get_settings
+
+
+# `with` blocks per physics step in the run loop: updating the cars and stepping the world
+PHASES_PER_STEP = 2
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Phase timer overhead')
+    parser.add_argument('--batches', dest='batches', type=int, default=3, help='batches to score for the step time')
+    parser.add_argument('--blocks', dest='blocks', type=int, default=1000000, help='with blocks to time')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='take the best of this many runs')
+
+    args = parser.parse_args()
+    return args
+
+def time_blocks(timer: PhaseTimer, blocks: int) -> float:
+    """
+    Seconds per `with` block, less the loop itself
+    """
+    start = time.perf_counter()
+    for _ in range(blocks):
+        pass
+    empty = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(blocks):
+        with timer.phase('physics'):
+            pass
+    return (time.perf_counter() - start - empty) / blocks
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    np.random.seed(0)
+    random.seed(0)
+    disabled = min(time_blocks(PhaseTimer(enabled=False), args.blocks) for _ in range(args.repeat))
+    enabled = min(time_blocks(PhaseTimer(), args.blocks) for _ in range(args.repeat))
+
+    batch_size = get_settings().boxcar.run_at_a_time
+    chromosomes = np.array([create_random_chromosome() for _ in range(batch_size * args.batches)])
+    timer = PhaseTimer()
+    evaluate(chromosomes, batch_size=batch_size, timer=timer)
+    phases = timer.end_generation(0)
+    steps = phases['physics'].count
+    step_time = (phases['physics'].total + phases['cars'].total) / steps
+
+    print(format_phases(phases))
+    print('{} steps of {} cars, {:.1f} us per step'.format(steps, batch_size, step_time * 1e6))
+    for name, per_block in (('disabled', disabled), ('enabled', enabled)):
+        print('{:>8}: {:.3f} us per block, {:.3f}% of a step'.format(
+            name, per_block * 1e6, 100.0 * PHASES_PER_STEP * per_block / step_time))
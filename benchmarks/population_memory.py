@@ -0,0 +1,63 @@
+"""
+Memory held per individual in the population between generations.
+
+`--mode car` keeps the finished Car objects around, the way the population used to.
+`--mode genome` keeps only the Genome records the population stores now.
+Python allocations are measured with tracemalloc, so this does not count memory inside Box2D.
+
+    python benchmarks/population_memory.py --size 10000 --mode genome
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Box2D import b2World
+from boxcar.floor import Floor
+from boxcar.car import Car, create_random_chromosome
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Bytes per individual kept by the population')
+    parser.add_argument('--size', dest='size', type=int, default=10000, help='population size')
+    parser.add_argument('--mode', dest='mode', choices=('car', 'genome'), default='genome')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=20, help='cars in the world at once')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    np.random.seed(0)
+    world = b2World((0, -9.8))
+    floor = Floor(world)
+    chromosomes = [create_random_chromosome() for _ in range(args.batch_size)]
+
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+
+    population = []
+    for i in range(0, args.size, args.batch_size):
+        cars = [Car.create_car_from_chromosome(world, floor.winning_tile, floor.lowest_y, np.inf, chromosome)
+                for chromosome in chromosomes[:min(args.batch_size, args.size - i)]]
+        # A finished car: its bodies are gone but the object lives on in the population
+        for car in cars:
+            car.calculate_fitness()
+            car._destroy()
+        if args.mode == 'car':
+            population.extend(cars)
+        else:
+            population.extend(car.to_genome() for car in cars)
+        del cars
+
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    held = current - start
+    print('{} individuals ({}): {:.1f} MB, {:.0f} bytes per individual'.format(
+        len(population), args.mode, held / 1e6, held / len(population)))
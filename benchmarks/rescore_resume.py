@@ -0,0 +1,77 @@
+"""
+Checks that an interrupted `rescore.py` job resumes to the same CSV as an uninterrupted one.
+
+Scores random cars once without stopping, then for several cut points cuts that CSV off where a job killed in the
+middle of writing a batch would have left it (some whole rows and half of the next one), resumes and compares.
+Cars sharing a world affect each other's scores, so this fails if a resumed batch isn't run the same as the first time.
+
+    python benchmarks/rescore_resume.py --cars 24 --batch-size 12
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from boxcar.car import create_random_chromosome
+from rescore import rescore
+from settings import get_settings
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Resume check for rescore.py')
+    parser.add_argument('--cars', dest='cars', type=int, default=24, help='number of cars to score')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=12, help='cars per world')
+    parser.add_argument('--floor-seeds', dest='floor_seeds', type=str, default='0,1', help='comma separated floor seeds')
+    parser.add_argument('--workers', dest='workers', type=int, default=2, help='number of worker processes')
+
+    args = parser.parse_args()
+    return args
+
+def read_rows(path: str):
+    with open(path, newline='') as f:
+        return sorted(tuple(row) for row in csv.reader(f))
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    np.random.seed(0)
+    random.seed(0)
+    settings = get_settings()
+    floor_types = [settings.boxcar.floor_creation_type]
+    floor_seeds = [int(seed) for seed in args.floor_seeds.split(',')]
+
+    failed = False
+    with tempfile.TemporaryDirectory() as folder:
+        population = os.path.join(folder, 'pop')
+        os.makedirs(population)
+        for i in range(args.cars):
+            np.save(os.path.join(population, 'car_{}.npy'.format(i)), create_random_chromosome(settings))
+
+        full = os.path.join(folder, 'full.csv')
+        rescore([population], full, floor_types, floor_seeds, settings, args.batch_size, args.workers)
+        expected = read_rows(full)
+        with open(full, newline='') as f:
+            lines = f.readlines()
+
+        # Header plus a few rows into the first batch, and a few rows into a later one
+        cuts = sorted({1 + max(1, args.batch_size // 2), 1 + args.batch_size + max(1, args.batch_size // 2), len(lines) - 2})
+        for cut in cuts:
+            if cut < 1 or cut >= len(lines):
+                continue
+            resumed = os.path.join(folder, 'resumed_{}.csv'.format(cut))
+            with open(resumed, 'w', newline='') as f:
+                f.writelines(lines[:cut])
+                f.write(lines[cut][:len(lines[cut]) // 2])
+            rescore([population], resumed, floor_types, floor_seeds, settings, args.batch_size, args.workers)
+            rows = read_rows(resumed)
+            same = rows == expected
+            print('cut after {} of {} rows: {}'.format(cut - 1, len(lines) - 1, 'same' if same else 'DIFFERENT'))
+            failed = failed or not same
+
+    if failed:
+        print('FAIL: resuming did not reproduce the uninterrupted run')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,90 @@
+"""
+Cost of recording trajectories relative to simulating.
+
+Runs batches of cars with a `TrajectoryRecorder` and times the `record` calls separately from the rest of
+the step (car updates + world.Step). Comparing two separate runs is too noisy for a difference this small.
+Also checks that the recording plays back.
+
+    python benchmarks/trajectory_overhead.py --batches 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Box2D import b2World
+from boxcar.floor import Floor
+from boxcar.car import Car, create_random_chromosome
+from boxcar.trajectory import TrajectoryRecorder, TrajectoryFile
+from settings import get_settings
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Trajectory recording overhead')
+    parser.add_argument('--batches', dest='batches', type=int, default=5, help='batches to run')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=None, help='cars per batch. Defaults to run_at_a_time')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=3, help='take the best of this many runs')
+
+    args = parser.parse_args()
+    return args
+
+def run(chromosomes: np.ndarray, recorder: TrajectoryRecorder) -> (float, float, int):
+    """
+    Runs every batch in a new world.
+    Returns (seconds spent stepping, seconds spent recording, number of steps).
+    """
+    settings = get_settings()
+    elapsed = 0.0
+    recording = 0.0
+    steps = 0
+    for batch, batch_chromosomes in enumerate(chromosomes):
+        world = b2World(settings.boxcar.gravity)
+        floor = Floor(world, settings=settings)
+        cars = [Car.create_car_from_chromosome(world, floor.winning_tile, floor.lowest_y, np.inf, chromosome, settings)
+                for chromosome in batch_chromosomes]
+        alive = len(cars)
+        start = time.perf_counter()
+        while alive:
+            for car in cars:
+                if car.is_alive and not car.update():
+                    alive -= 1
+            record_start = time.perf_counter()
+            recorder.record(cars)
+            recording += time.perf_counter() - record_start
+            world.ClearForces()
+            world.Step(1./60, 10, 6)
+            steps += 1
+        record_start = time.perf_counter()
+        recorder.end_batch(cars, 0, batch * len(cars))
+        end = time.perf_counter()
+        recording += end - record_start
+        elapsed += end - start
+    return elapsed - recording, recording, steps
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    np.random.seed(0)
+    random.seed(0)
+    batch_size = args.batch_size or get_settings().boxcar.run_at_a_time
+    chromosomes = np.array([[create_random_chromosome() for _ in range(batch_size)] for _ in range(args.batches)])
+
+    best_step = best_recording = np.inf
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as folder:
+            stepping, recording, steps = run(chromosomes, TrajectoryRecorder(folder))
+            trajectories = TrajectoryFile(folder)
+            frames = int(trajectories.index['num_frames'].sum())
+            size = os.path.getsize(os.path.join(folder, 'poses.f32'))
+            trajectories.poses(0)
+        best_step = min(best_step, stepping)
+        best_recording = min(best_recording, recording)
+
+    print('{} steps of {} cars'.format(steps, batch_size))
+    print('step time: {:.1f} us, recording: {:.1f} us ({:.1f}% of step time)'.format(
+        best_step / steps * 1e6, best_recording / steps * 1e6, best_recording / best_step * 100))
+    print('{} car frames recorded, {:.1f} bytes per car frame'.format(frames, size / frames))
@@ -0,0 +1,2 @@
+from .headless import evaluate, STATS_DTYPE
+from .genome import Genome
@@ -0,0 +1,205 @@
+import os
+import struct
+import zipfile
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .genome import Genome, STATS_DTYPE
+
+
+# Members of a population archive. Each one is a regular .npy stored (not compressed) inside the .npz
+_CHROMOSOMES = 'chromosomes'
+_STATS = 'stats'
+_LIFESPAN = 'lifespan'
+_SETTINGS = 'settings'
+
+# Size of the fixed part of a zip local file header
+_LOCAL_HEADER_SIZE = 30
+
+
+def save_archive(path: str, genomes: Sequence[Genome], settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Writes a whole population to a single uncompressed .npz in one call:
+        chromosomes: (N, 5, 8) float64
+        stats:       (N,) STATS_DTYPE
+        lifespan:    (N,) float64
+        settings:    dill pickle of the settings dictionary, as uint8. Only written if settings is given.
+
+    Returns the path written to, with '.npz' appended if it was missing.
+    """
+    return write_archive(path, population_arrays(genomes), settings)
+
+def population_arrays(genomes: Sequence[Genome]) -> Dict[str, np.ndarray]:
+    """
+    Copies the genomes into the columns of an archive. The result doesn't share memory with the genomes,
+    so it can be written later (i.e. from another thread) while the population keeps changing.
+    """
+    num_genomes = len(genomes)
+    chromosomes = np.empty((num_genomes, 5, 8), dtype=np.float64)
+    stats = np.empty(num_genomes, dtype=STATS_DTYPE)
+    lifespan = np.empty(num_genomes, dtype=np.float64)
+    for i, genome in enumerate(genomes):
+        chromosomes[i] = genome.chromosome
+        stats[i] = genome.stats
+        lifespan[i] = genome.lifespan
+    return {_CHROMOSOMES: chromosomes, _STATS: stats, _LIFESPAN: lifespan}
+
+def write_archive(path: str, arrays: Dict[str, np.ndarray], settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Writes the arrays from `population_arrays` and the settings to `path`. See `save_archive`.
+    Extra arrays can be added to `arrays` and are read back with `PopulationArchive.array`.
+    """
+    if not path.endswith('.npz'):
+        path += '.npz'
+    arrays = dict(arrays)
+    if settings is not None:
+        # dill is only needed here (the fitness function is a lambda), so don't make every import pay for it
+        import dill as pickle
+        arrays[_SETTINGS] = np.frombuffer(pickle.dumps(settings), dtype=np.uint8)
+
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    # Write to a temporary file and move it into place so a crash never leaves a half written archive behind
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+class PopulationArchive(object):
+    """
+    Read access to an archive written by `save_archive`.
+
+    The chromosome, stats and lifespan columns are memory mapped, so reading one individual by index
+    only touches the pages it lives on. Nothing is loaded until it is asked for.
+    """
+    def __init__(self, path: str):
+        if not os.path.isfile(path):
+            raise Exception('{} is not a population archive'.format(path))
+        self.path = path
+        self._offsets = _member_offsets(path)
+        if _CHROMOSOMES not in self._offsets:
+            raise Exception('{} does not contain any chromosomes'.format(path))
+        self._columns = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._offsets
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Memory mapped view of any member, including extra ones passed to `write_archive`
+        """
+        if name not in self._offsets:
+            raise Exception('{} has no member named "{}"'.format(self.path, name))
+        return self._column(name)
+
+    def _column(self, name: str) -> np.memmap:
+        if name not in self._columns:
+            offset, shape, dtype = self._offsets[name]
+            # mmap can't map zero bytes
+            if np.prod(shape) == 0:
+                self._columns[name] = np.empty(shape, dtype=dtype)
+            else:
+                self._columns[name] = np.memmap(self.path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return self._offsets[_CHROMOSOMES][1][0]
+
+    @property
+    def chromosomes(self) -> np.memmap:
+        return self._column(_CHROMOSOMES)
+
+    @property
+    def stats(self) -> np.memmap:
+        return self._column(_STATS)
+
+    @property
+    def lifespan(self) -> np.memmap:
+        return self._column(_LIFESPAN)
+
+    @property
+    def fitness(self) -> np.ndarray:
+        return self.stats['fitness']
+
+    @property
+    def settings(self) -> Optional[Dict[str, Any]]:
+        """
+        The settings dictionary saved with the population, or None if there isn't one.
+        """
+        if _SETTINGS not in self._offsets:
+            return None
+        import dill as pickle
+        return pickle.loads(self._column(_SETTINGS).tobytes())
+
+    def chromosome(self, index: int) -> np.ndarray:
+        """
+        Copy of the chromosome at `index`, so it can outlive the archive
+        """
+        return np.array(self.chromosomes[index])
+
+    def genome(self, index: int) -> Genome:
+        stats = self.stats[index]
+        return Genome(self.chromosome(index), float(stats['fitness']), float(self.lifespan[index]),
+                      float(stats['max_position']), int(stats['frames']),
+                      float(stats['chassis_volume']), float(stats['wheels_volume']),
+                      int(stats['num_wheels']), bool(stats['is_winner']))
+
+    def genomes(self) -> List[Genome]:
+        return [self.genome(i) for i in range(len(self))]
+
+
+def is_archive(path: str) -> bool:
+    return os.path.isfile(path) and zipfile.is_zipfile(path)
+
+def load_chromosomes(source: str) -> np.ndarray:
+    """
+    Loads every chromosome from a population archive or a folder of `car_N.npy` files (i.e. from `--save-best`).
+    Returns an (N, 5, 8) array, best first. Archives are sorted by fitness. Folders have no fitness,
+    so the highest N (the latest generation) comes first.
+    """
+    if is_archive(source):
+        archive = PopulationArchive(source)
+        order = np.argsort(-archive.fitness, kind='stable')
+        return np.array(archive.chromosomes[order])
+    if not os.path.isdir(source):
+        raise Exception('{} is neither a population archive nor a folder'.format(source))
+
+    names = [name for name in os.listdir(source) if name.startswith('car_') and name.endswith('.npy')]
+    names.sort(key=lambda name: int(name[len('car_'):-len('.npy')]), reverse=True)
+    if not names:
+        raise Exception('No car_N.npy files found within {}'.format(source))
+    return np.stack([np.load(os.path.join(source, name)) for name in names])
+
+def _member_offsets(path: str) -> Dict[str, Tuple[int, Tuple[int, ...], np.dtype]]:
+    """
+    Finds where the array data of each .npy member starts within the .npz file.
+    This is what lets us memory map a member instead of reading it through zipfile.
+    """
+    offsets = {}
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+    with open(path, 'rb') as f:
+        for info in infos:
+            if not info.filename.endswith('.npy'):
+                continue
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise Exception('{} in {} is compressed and cannot be memory mapped'.format(info.filename, path))
+            # The local header can have a different extra field than the central directory, so read it
+            f.seek(info.header_offset)
+            header = f.read(_LOCAL_HEADER_SIZE)
+            name_len, extra_len = struct.unpack('<HH', header[26:30])
+            f.seek(info.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if fortran_order:
+                raise Exception('{} in {} is not C ordered'.format(info.filename, path))
+            offsets[info.filename[:-len('.npy')]] = (f.tell(), shape, dtype)
+    return offsets
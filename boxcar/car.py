@@ -3,12 +3,12 @@ import numpy as np
 from typing import List, Union
 from numpy import random
 import random as rand
-from settings import get_boxcar_constant, get_ga_constant
+from settings import Settings, get_settings
 from .wheel import *
+from .genome import Genome
 from genetic_algorithm.individual import Individual
 from typing import List, Optional, Union, Dict, Any
 import math
-import dill as pickle
 import os
 
 genes = {
@@ -22,17 +22,27 @@ genes = {
 }
 
 class Car(Individual):
+    # A car is only a handle to its Box2D bodies while it is on the track. What the population keeps is the `Genome`
+    __slots__ = ('world', 'settings',
+                 'wheel_radii', 'wheel_densities', 'chassis_vertices', 'chassis_densities',
+                 'winning_x', 'lowest_y_pos', 'lifespan', 'is_winner',
+                 'chassis', 'wheels', '_wheel_vertices', 'num_wheels', 'mass', 'chassis_volume', 'wheels_volume',
+                 'is_alive', 'frames', 'max_tries', 'num_failures', 'max_position', '_destroyed', 'x', 'y',
+                 '_chromosome', '_fitness', '__weakref__')
+
     def __init__(self, world: b2World, 
                  wheel_radii: List[float], wheel_densities: List[float],# wheel_motor_speeds: List[float],
                  chassis_vertices: List[b2Vec2], chassis_densities: List[float],
                  winning_tile: b2Vec2, lowest_y_pos: float, 
-                 lifespan: Union[int, float], from_chromosome: bool = False) -> None:
+                 lifespan: Union[int, float], from_chromosome: bool = False,
+                 settings: Optional[Settings] = None) -> None:
         self.world = world
+        self.settings = settings or get_settings()
         self.wheel_radii = wheel_radii
         self.wheel_densities = wheel_densities
         self.chassis_vertices = chassis_vertices
         self.chassis_densities = chassis_densities
-        self.winning_tile = winning_tile
+        self.winning_x = winning_tile.position.x
         self.lowest_y_pos = lowest_y_pos
         self.lifespan = lifespan
         self.is_winner = False
@@ -42,10 +52,11 @@ class Car(Individual):
 
         self.is_alive = True
         self.frames = 0
-        self.max_tries = get_boxcar_constant('car_max_tries')
+        self.max_tries = self.settings.boxcar.car_max_tries
         self.num_failures = 0
         self.max_position = -100
         self._destroyed = False
+        self.x, self.y = 0.0, 0.0  # Chassis position as of the last `update`
 
         # GA stuff
         self._chromosome = None
@@ -129,7 +140,8 @@ class Car(Individual):
 
     @classmethod
     def create_car_from_chromosome(cls, world: b2World, winning_tile: b2Vec2, lowest_y_pos: float,
-                                   lifespan: Union[int, float], chromosome: np.ndarray) -> 'Car':
+                                   lifespan: Union[int, float], chromosome: np.ndarray,
+                                   settings: Optional[Settings] = None) -> 'Car':
         """
         Creates a car from a chromosome. This is helpful in two areas:
         1. You can just keep a bunch of chromosome references and create a car when you need.
@@ -139,7 +151,7 @@ class Car(Individual):
         car = Car(world, 
                   None, None, # None,  # Wheel stuff set to None
                   None, None,        # Chassis stuff set to None
-                  winning_tile, lowest_y_pos, lifespan, from_chromosome=True)
+                  winning_tile, lowest_y_pos, lifespan, from_chromosome=True, settings=settings)
         car._chromosome = np.copy(chromosome)
         car.decode_chromosome()
         return car
@@ -148,7 +160,7 @@ class Car(Individual):
         """
         Calculate the fitness of an individual at the end of a generation.
         """
-        func = get_ga_constant('fitness_function')
+        func = self.settings.ga.fitness_function
         fitness = func(max(self.max_position, 0.0),
                        self.num_wheels,
                        self.chassis_volume,
@@ -211,25 +223,16 @@ class Car(Individual):
     def chromosome(self):
         return self._chromosome
 
-
-    def clone(self):
-        world = self.world
-        wheels = []
-        for wheel in self.wheels:
-            radius = wheel.radius
-            density = wheel.density
-            restitution = wheel.restitution
-            wheels.append(Wheel(world, radius, density, restitution))
-
-        wheel_vertices = self._wheel_vertices[:]
-        chassis_vertices = self.chassis_vertices[:]
-        chassis_densities = self.chassis_densities[:]
-        winning_tile = self.winning_tile
-        lowest_y_pos = self.lowest_y_pos
-
-        return Car(world, wheels, wheel_vertices, 
-                 chassis_vertices, chassis_densities,
-                 winning_tile, lowest_y_pos, True)
+    def to_genome(self) -> Genome:
+        """
+        Calculates the fitness and returns the record the population keeps once this car is off the track.
+        The chromosome is not copied, so the car should not be decoded again afterwards.
+        """
+        self.calculate_fitness()
+        return Genome(self._chromosome, self._fitness, self.lifespan,
+                      self.max_position, self.frames,
+                      self.chassis_volume, self.wheels_volume,
+                      self.num_wheels, self.is_winner)
 
     def update(self) -> bool:
         """
@@ -241,24 +244,27 @@ class Car(Individual):
 
         self.frames += 1
         current_position = self.position
+        # Only ask Box2D once. The position is kept around for anything that needs it this frame, i.e. the trajectory recorder
+        x, y = current_position.x, current_position.y
+        self.x, self.y = x, y
         # Did we win?
-        if current_position.x > self.winning_tile.position.x:
+        if x > self.winning_x:
             self.is_winner = True
             self.is_alive = False
             self._destroy()
             print('winnnerr')
             return False
         # If we advanced past our max position, reset failures and max position
-        if (current_position.x > self.max_position) and (current_position.y > self.lowest_y_pos) and (self.linear_velocity.x >= .4):
+        if (x > self.max_position) and (y > self.lowest_y_pos) and (self.linear_velocity.x >= .4):
             self.num_failures = 0
-            self.max_position = current_position.x
+            self.max_position = x
             return True
 
         # If we have not improved or are going very slow, update failures and destroy if needed
-        if current_position.x <= self.max_position or self.linear_velocity.x < .4:
+        if x <= self.max_position or self.linear_velocity.x < .4:
             self.num_failures += 1
 
-        if current_position.y < self.lowest_y_pos:
+        if y < self.lowest_y_pos:
             self.num_failures += 2
 
         if self.num_failures > self.max_tries:
@@ -300,32 +306,34 @@ class Car(Individual):
 
 
 
-def create_random_car(world: b2World, winning_tile: b2Vec2, lowest_y_pos: float):
+def create_random_car(world: b2World, winning_tile: b2Vec2, lowest_y_pos: float, settings: Optional[Settings] = None):
     """
     Creates a random car based off the values found in settings.py under the settings dictionary
     """
+    settings = settings or get_settings()
+    boxcar = settings.boxcar
     # Create a number of random wheels.
     # Each wheel will have a random radius and density
-    num_wheels = random.randint(get_boxcar_constant('min_num_wheels'), get_boxcar_constant('max_num_wheels') + 1)
+    num_wheels = random.randint(boxcar.min_num_wheels, boxcar.max_num_wheels + 1)
     wheel_verts = list(range(num_wheels))  # What vertices should we attach to?
     rand.shuffle(wheel_verts)
     wheel_verts = wheel_verts[:num_wheels]
     wheel_radii = [0.0 for _ in range(8)]
     wheel_densities = [0.0 for _ in range(8)]
-    # wheel_motor_speeds = [random.uniform(get_boxcar_constant('min_wheel_motor_speed'), get_boxcar_constant('max_wheel_motor_speed'))
+    # wheel_motor_speeds = [random.uniform(boxcar.min_wheel_motor_speed, boxcar.max_wheel_motor_speed)
     #                       for _ in range(8)]  # Doesn't matter if this is set. There won't be a wheel if the density OR radius is 0
 
     # Assign a random radius/density to vertices found in wheel_verts
     for vert_idx in wheel_verts:
-        radius = random.uniform(get_boxcar_constant('min_wheel_radius'), get_boxcar_constant('max_wheel_radius'))
-        density = random.uniform(get_boxcar_constant('min_wheel_density'), get_boxcar_constant('max_wheel_density'))
+        radius = random.uniform(boxcar.min_wheel_radius, boxcar.max_wheel_radius)
+        density = random.uniform(boxcar.min_wheel_density, boxcar.max_wheel_density)
 
         # Override the intiial 0.0
         wheel_radii[vert_idx] = radius
         wheel_densities[vert_idx] = density
     
-    min_chassis_axis = get_boxcar_constant('min_chassis_axis')
-    max_chassis_axis = get_boxcar_constant('max_chassis_axis')
+    min_chassis_axis = boxcar.min_chassis_axis
+    max_chassis_axis = boxcar.max_chassis_axis
 
     ####
     # The chassis vertices are on a grid and defined by v0-v7 like so:
@@ -352,18 +360,52 @@ def create_random_car(world: b2World, winning_tile: b2Vec2, lowest_y_pos: float)
     # Now t hat we have our chassis vertices, we need to get a random density for them as well
     densities = []
     for i in range(8):
-        densities.append(random.uniform(get_boxcar_constant('min_chassis_density'), get_boxcar_constant('max_chassis_density')))
+        densities.append(random.uniform(boxcar.min_chassis_density, boxcar.max_chassis_density))
 
 
     return Car(world, 
                wheel_radii, wheel_densities,# wheel_motor_speeds,
                chassis_vertices, densities, 
                winning_tile, lowest_y_pos, 
-               lifespan=get_ga_constant('lifespan'))
+               lifespan=settings.ga.lifespan,
+               settings=settings)
+
+def create_random_chromosome(settings: Optional[Settings] = None) -> np.ndarray:
+    """
+    Creates a random chromosome without needing a world. Uses the same value ranges as `create_random_car`
+    and is useful when you only want to hand chromosomes around, i.e. to an optimizer or another process.
+    """
+    settings = settings or get_settings()
+    boxcar = settings.boxcar
+    chromosome = np.zeros((len(genes.keys()), 8))
 
-def create_random_chassis(world: b2World) -> b2Body:
-    min_chassis_axis = get_boxcar_constant('min_chassis_axis')
-    max_chassis_axis = get_boxcar_constant('max_chassis_axis')
+    # Wheels
+    num_wheels = random.randint(boxcar.min_num_wheels, boxcar.max_num_wheels + 1)
+    wheel_verts = list(range(num_wheels))
+    rand.shuffle(wheel_verts)
+    for vert_idx in wheel_verts:
+        chromosome[genes['wheel_radii'], vert_idx] = random.uniform(boxcar.min_wheel_radius, boxcar.max_wheel_radius)
+        chromosome[genes['wheel_densities'], vert_idx] = random.uniform(boxcar.min_wheel_density, boxcar.max_wheel_density)
+
+    # Chassis. Same layout as described in `create_random_car`.
+    # The sign tells us which quadrant each vertex lives in, and 0 means the vertex is on an axis.
+    x_signs = np.array([1, 1, 0, -1, -1, -1, 0, 1])
+    y_signs = np.array([0, 1, 1, 1, 0, -1, -1, -1])
+    min_chassis_axis = boxcar.min_chassis_axis
+    max_chassis_axis = boxcar.max_chassis_axis
+    chromosome[genes['chassis_vertices_x'], :] = x_signs * random.uniform(min_chassis_axis, max_chassis_axis, size=8)
+    chromosome[genes['chassis_vertices_y'], :] = y_signs * random.uniform(min_chassis_axis, max_chassis_axis, size=8)
+    chromosome[genes['chassis_densities'], :] = random.uniform(boxcar.min_chassis_density,
+                                                               boxcar.max_chassis_density,
+                                                               size=8)
+
+    return chromosome
+
+def create_random_chassis(world: b2World, settings: Optional[Settings] = None) -> b2Body:
+    settings = settings or get_settings()
+    boxcar = settings.boxcar
+    min_chassis_axis = boxcar.min_chassis_axis
+    max_chassis_axis = boxcar.max_chassis_axis
 
     vertices = []
     vertices.append(b2Vec2(random.uniform(min_chassis_axis, max_chassis_axis), 0))
@@ -377,7 +419,7 @@ def create_random_chassis(world: b2World) -> b2Body:
 
     densities = []
     for i in range(8):
-        densities.append(random.uniform(get_boxcar_constant('min_chassis_density'), get_boxcar_constant('max_chassis_density')))
+        densities.append(random.uniform(boxcar.min_chassis_density, boxcar.max_chassis_density))
 
     return create_chassis(world, vertices, densities)
 
@@ -445,8 +487,10 @@ def save_car(population_folder: str, individual_name: str, car: Car, settings: D
         os.makedirs(population_folder)
     
     # Save settings
-    if 'settings.pkl' not in os.listdir(population_folder):
-        f = os.path.join(population_folder, 'settings.pkl')
+    f = os.path.join(population_folder, 'settings.pkl')
+    if not os.path.exists(f):
+        # dill is only needed here (the fitness function is a lambda), so don't make every import pay for it
+        import dill as pickle
         with open(f, 'wb') as out:
             pickle.dump(settings, out)
 
@@ -456,10 +500,18 @@ def save_car(population_folder: str, individual_name: str, car: Car, settings: D
 def load_car(world: b2World, 
              winning_tile: b2Vec2, lowest_y: float,
              lifespan: Union[int, float],
-             population_folder: str, individual_name: str) -> Car:
+             population_folder: str, individual_name: Union[str, int],
+             settings: Optional[Settings] = None) -> Car:
     """
     Loads a car from a folder. This loads the chromosome.
+    `population_folder` can also be a population archive (see boxcar/archive.py), in which case
+    `individual_name` is the index of the car within it. Only that car is read.
     """
-    chromosome = np.load(os.path.join(population_folder, individual_name))
-    car = Car.create_car_from_chromosome(world, winning_tile, lowest_y, lifespan, chromosome)
+    # Only replays read archives, so don't make every import pay for zipfile and friends
+    from .archive import PopulationArchive, is_archive
+    if is_archive(population_folder):
+        chromosome = PopulationArchive(population_folder).chromosome(int(individual_name))
+    else:
+        chromosome = np.load(os.path.join(population_folder, individual_name))
+    car = Car.create_car_from_chromosome(world, winning_tile, lowest_y, lifespan, chromosome, settings)
     return car
\ No newline at end of file
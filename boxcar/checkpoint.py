@@ -0,0 +1,37 @@
+import pickle
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from .archive import PopulationArchive, population_arrays, write_archive
+from .genome import Genome
+
+
+# Archive member holding everything that isn't a genome
+_TRAINER = 'trainer'
+
+
+def checkpoint_arrays(state: Dict[str, Any], genomes: List[Genome]) -> Dict[str, np.ndarray]:
+    """
+    Snapshot of the trainer `state` (plain python/numpy values, i.e. counters and RNG states) and the population.
+    Like `population_arrays`, it can be written later with `write_archive`.
+    """
+    arrays = population_arrays(genomes)
+    arrays[_TRAINER] = np.frombuffer(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+    return arrays
+
+def save_checkpoint(path: str, state: Dict[str, Any], genomes: List[Genome],
+                    settings: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Atomically writes a checkpoint. A checkpoint is a population archive with the trainer state as an extra
+    member, so it can also be replayed or used with anything else that reads archives.
+    """
+    return write_archive(path, checkpoint_arrays(state, genomes), settings)
+
+def load_checkpoint(path: str) -> Tuple[Dict[str, Any], List[Genome], Optional[Dict[str, Any]]]:
+    """
+    Returns (state, genomes, settings) from a checkpoint written by `save_checkpoint`.
+    """
+    archive = PopulationArchive(path)
+    if _TRAINER not in archive:
+        raise Exception('{} is a population archive, not a checkpoint'.format(path))
+    state = pickle.loads(archive.array(_TRAINER).tobytes())
+    return state, archive.genomes(), archive.settings
@@ -1,6 +1,6 @@
 from Box2D import *
-from typing import List
-from settings import get_boxcar_constant
+from typing import List, Optional
+from settings import Settings, get_settings
 import math
 import numpy as np
 
@@ -19,12 +19,13 @@ def rotate_floor_tile(coords: List[b2Vec2], center: b2Vec2, angle: float) -> Lis
 
     return new_coords
 
-def create_floor_tile(world: b2World, position: b2Vec2, angle: float) -> b2Body:
+def create_floor_tile(world: b2World, position: b2Vec2, angle: float, settings: Optional[Settings] = None) -> b2Body:
     """
     Create a floor tile at some angle
     """
-    width = get_boxcar_constant('floor_tile_width')
-    height = get_boxcar_constant('floor_tile_height')
+    settings = settings or get_settings()
+    width = settings.boxcar.floor_tile_width
+    height = settings.boxcar.floor_tile_height
 
     body_def = b2BodyDef()
     body_def.position = position
@@ -55,14 +56,16 @@ def create_floor_tile(world: b2World, position: b2Vec2, angle: float) -> b2Body:
 
 
 class Floor(object):
-    def __init__(self, world: b2World, seed = get_boxcar_constant('gaussian_floor_seed'), num_tiles = get_boxcar_constant('max_floor_tiles')):
+    def __init__(self, world: b2World, seed: Optional[int] = None, num_tiles: Optional[int] = None,
+                 settings: Optional[Settings] = None):
         self.world = world
-        self.seed = seed  # @TODO: Add this to the setting
-        self.num_tiles = num_tiles
+        self.settings = settings or get_settings()
+        self.seed = seed if seed is not None else self.settings.boxcar.gaussian_floor_seed
+        self.num_tiles = num_tiles if num_tiles is not None else self.settings.boxcar.max_floor_tiles
         self.floor_tiles: List[b2Body] = []
         self.rand = np.random.RandomState(self.seed)  # @NOTE: the floor has it's own random that it references.
 
-        self.floor_creation_type = get_boxcar_constant('floor_creation_type').lower()
+        self.floor_creation_type = self.settings.boxcar.floor_creation_type.lower()
         if self.floor_creation_type == 'gaussian':
             self._generate_gaussian_random_floor()
         elif self.floor_creation_type == 'ramp':
@@ -89,10 +92,10 @@ class Floor(object):
         """
         Helper method for generating a gaussian random floor
         """
-        threshold = get_boxcar_constant('tile_gaussian_threshold')
-        denominator = get_boxcar_constant('tile_gaussian_denominator')
-        mu = get_boxcar_constant('tile_angle_mu')
-        std = get_boxcar_constant('tile_angle_std')
+        threshold = self.settings.boxcar.tile_gaussian_threshold
+        denominator = self.settings.boxcar.tile_gaussian_denominator
+        mu = self.settings.boxcar.tile_angle_mu
+        std = self.settings.boxcar.tile_angle_std
 
         tile_position = b2Vec2(-5, 0)
         #@NOTE: Look in README.md for explanation of the below equation
@@ -100,7 +103,7 @@ class Floor(object):
             numerator = min(i, threshold)
             scale = min(float(numerator) / denominator, 1.0)
             angle = self.rand.normal(mu, std) * scale
-            floor_tile = create_floor_tile(self.world, tile_position, angle)
+            floor_tile = create_floor_tile(self.world, tile_position, angle, self.settings)
             self.floor_tiles.append(floor_tile)
 
             t = 1
@@ -118,14 +121,14 @@ class Floor(object):
         """
         Helper method for generating a ramp
         """
-        const_angle = get_boxcar_constant('ramp_constant_angle')
-        approach_tiles_needed = get_boxcar_constant('ramp_approach_distance') / get_boxcar_constant('floor_tile_width')
+        const_angle = self.settings.boxcar.ramp_constant_angle
+        approach_tiles_needed = self.settings.boxcar.ramp_approach_distance / self.settings.boxcar.floor_tile_width
         approach_tiles_needed = math.ceil(approach_tiles_needed)
 
         # Create the approach
         tile_position = b2Vec2(-5, 0)
         for i in range(approach_tiles_needed):
-            floor_tile = create_floor_tile(self.world, tile_position, 0)
+            floor_tile = create_floor_tile(self.world, tile_position, 0, self.settings)
             self.floor_tiles.append(floor_tile)
             world_coord = floor_tile.GetWorldPoint(floor_tile.fixtures[0].shape.vertices[1])
             tile_position = world_coord
@@ -134,22 +137,22 @@ class Floor(object):
 
         # Are we using a constant angle for the ramp?
         if const_angle:
-            num_ramp_tiles = get_boxcar_constant('ramp_constant_distance') / get_boxcar_constant('floor_tile_width')
+            num_ramp_tiles = self.settings.boxcar.ramp_constant_distance / self.settings.boxcar.floor_tile_width
             num_ramp_tiles = math.ceil(num_ramp_tiles)
 
             # Create ramp
             for i in range(num_ramp_tiles):
-                floor_tile = create_floor_tile(self.world, tile_position, const_angle)
+                floor_tile = create_floor_tile(self.world, tile_position, const_angle, self.settings)
                 self.floor_tiles.append(floor_tile)
                 world_coord = floor_tile.GetWorldPoint(floor_tile.fixtures[0].shape.vertices[1])
                 tile_position = world_coord
 
         # If not, create the increasing ramp
         else:
-            start_angle = get_boxcar_constant('ramp_start_angle')
-            increasing_angle = get_boxcar_constant('ramp_increasing_angle')
-            max_angle = get_boxcar_constant('ramp_max_angle')
-            increasing_type = get_boxcar_constant('ramp_increasing_type').lower()
+            start_angle = self.settings.boxcar.ramp_start_angle
+            increasing_angle = self.settings.boxcar.ramp_increasing_angle
+            max_angle = self.settings.boxcar.ramp_max_angle
+            increasing_type = self.settings.boxcar.ramp_increasing_type.lower()
             current_angle = start_angle
             
 
@@ -166,7 +169,7 @@ class Floor(object):
                 if next_angle > max_angle:
                     break
 
-                floor_tile = create_floor_tile(self.world, tile_position, current_angle)
+                floor_tile = create_floor_tile(self.world, tile_position, current_angle, self.settings)
                 self.floor_tiles.append(floor_tile)
                 world_coord = floor_tile.GetWorldPoint(floor_tile.fixtures[0].shape.vertices[1])
                 tile_position = world_coord
@@ -174,10 +177,10 @@ class Floor(object):
                 current_angle = next_angle
 
         # Create the landing zone
-        distance_to_fly = get_boxcar_constant('ramp_distance_needed_to_jump')
+        distance_to_fly = self.settings.boxcar.ramp_distance_needed_to_jump
         tile_position = b2Vec2(tile_position.x + distance_to_fly, last_approach_tile.y)
         for i in range(10):
-            floor_tile = create_floor_tile(self.world, tile_position, 0)
+            floor_tile = create_floor_tile(self.world, tile_position, 0, self.settings)
             self.floor_tiles.append(floor_tile)
             world_coord = floor_tile.GetWorldPoint(floor_tile.fixtures[0].shape.vertices[1])
             tile_position = world_coord
@@ -189,12 +192,12 @@ class Floor(object):
         Helper method for creating a jagged floor.
         """
         tile_position = b2Vec2(-5, 0)
-        increasing_angle = get_boxcar_constant('jagged_increasing_angle')
-        decreasing_angle = -get_boxcar_constant('jagged_decreasing_angle')
+        increasing_angle = self.settings.boxcar.jagged_increasing_angle
+        decreasing_angle = -self.settings.boxcar.jagged_decreasing_angle
 
-        for i in range(get_boxcar_constant('max_floor_tiles')):
+        for i in range(self.settings.boxcar.max_floor_tiles):
             angle = increasing_angle if i % 2 == 1 else decreasing_angle
-            floor_tile = create_floor_tile(self.world, tile_position, angle)
+            floor_tile = create_floor_tile(self.world, tile_position, angle, self.settings)
             self.floor_tiles.append(floor_tile)
 
             # You can blame this part of B2D. For Python it rearranges the vertices that I reference...
@@ -211,8 +214,8 @@ class Floor(object):
         """
         Creates a stopping zone so that the cars have a flat surface at the end of whatever track they were on.
         """
-        max_car_size = (get_boxcar_constant('max_chassis_axis') * 2.0) + (2.0 * get_boxcar_constant('max_wheel_radius'))
-        tile_width = get_boxcar_constant('floor_tile_width')
+        max_car_size = (self.settings.boxcar.max_chassis_axis * 2.0) + (2.0 * self.settings.boxcar.max_wheel_radius)
+        tile_width = self.settings.boxcar.floor_tile_width
         tiles_needed_before_wall = math.ceil(max_car_size / tile_width)
         additional_landing_zone = 0.0
         additional_tiles_needed = additional_landing_zone / tile_width
@@ -220,7 +223,7 @@ class Floor(object):
 
         # Create a landing zone
         for i in range(total_tiles_needed):
-            floor_tile = create_floor_tile(self.world, tile_position, 0)
+            floor_tile = create_floor_tile(self.world, tile_position, 0, self.settings)
             self.floor_tiles.append(floor_tile)
             world_coord = floor_tile.GetWorldPoint(floor_tile.fixtures[0].shape.vertices[1])
             tile_position = world_coord
@@ -238,5 +241,5 @@ class Floor(object):
         #     self.floor_tiles.append(floor_tile)
         #     world_coord = floor_tile.GetWorldPoint(floor_tile.fixtures[0].shape.vertices[1])
         #     # Adjust the tile to the left a bit so they overlap and form a wall
-        #     tile_position = b2Vec2(world_coord.x - get_boxcar_constant('floor_tile_height'), world_coord.y)
+        #     tile_position = b2Vec2(world_coord.x - self.settings.boxcar.floor_tile_height, world_coord.y)
     
\ No newline at end of file
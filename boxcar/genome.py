@@ -0,0 +1,62 @@
+import numpy as np
+from typing import Tuple, Union
+from genetic_algorithm.individual import Individual
+
+
+# One row per car. Field order matches `Genome.stats`
+STATS_DTYPE = np.dtype([
+    ('max_position',   np.float64),
+    ('frames',         np.int64),
+    ('chassis_volume', np.float64),
+    ('wheels_volume',  np.float64),
+    ('num_wheels',     np.int64),
+    ('is_winner',      np.bool_),
+    ('fitness',        np.float64),
+])
+
+
+class Genome(Individual):
+    """
+    What the population keeps of an individual between generations.
+    A `Car` only exists while it is on the track. Once it has finished, `Car.to_genome` boils it down to this.
+    """
+    __slots__ = ('_chromosome', '_fitness', 'lifespan',
+                 'max_position', 'frames', 'chassis_volume', 'wheels_volume', 'num_wheels', 'is_winner')
+
+    def __init__(self, chromosome: np.ndarray, fitness: float = 0.01, lifespan: Union[int, float] = np.inf,
+                 max_position: float = 0.0, frames: int = 0,
+                 chassis_volume: float = 0.0, wheels_volume: float = 0.0,
+                 num_wheels: int = 0, is_winner: bool = False):
+        self._chromosome = chromosome
+        self._fitness = fitness
+        self.lifespan = lifespan
+        self.max_position = max_position
+        self.frames = frames
+        self.chassis_volume = chassis_volume
+        self.wheels_volume = wheels_volume
+        self.num_wheels = num_wheels
+        self.is_winner = is_winner
+
+    def calculate_fitness(self) -> None:
+        # Fitness is calculated by the car before it becomes a genome
+        pass
+
+    @property
+    def fitness(self) -> float:
+        return self._fitness
+
+    @fitness.setter
+    def fitness(self, val):
+        self._fitness = val
+
+    @property
+    def chromosome(self) -> np.ndarray:
+        return self._chromosome
+
+    @property
+    def stats(self) -> Tuple:
+        """
+        The stats as a tuple that can be assigned to a row of STATS_DTYPE
+        """
+        return (self.max_position, self.frames, self.chassis_volume, self.wheels_volume,
+                self.num_wheels, self.is_winner, self._fitness)
@@ -0,0 +1,75 @@
+from Box2D import *
+import numpy as np
+from typing import Any, Dict, Optional, Union
+from settings import Settings, compile_settings, get_settings
+from .floor import Floor
+from .car import Car
+from .genome import STATS_DTYPE
+from .phase_timer import PhaseTimer
+
+
+FPS = 60
+
+
+def evaluate(chromosomes: np.ndarray,
+             settings: Optional[Union[Settings, Dict[str, Any]]] = None,
+             seed: Optional[int] = None,
+             batch_size: Optional[int] = None,
+             timer: Optional[PhaseTimer] = None) -> np.ndarray:
+    """
+    Scores a batch of chromosomes without the GUI.
+
+    Every car is created through `Car.create_car_from_chromosome` and run until it dies or wins, `batch_size`
+    cars at a time (defaults to `run_at_a_time`). Returns a structured array with STATS_DTYPE, one row per
+    chromosome, in the same order.
+
+    @NOTE: Each batch gets a brand new world and floor. Box2D keeps internal state around (contact and proxy
+    ordering) even after bodies are destroyed, so reusing a world would make the results depend on what ran before.
+
+    settings: Optional `Settings` snapshot or settings dictionary (same layout as `settings.settings`)
+              to use instead of the global settings.
+    seed: Floor seed. Defaults to `gaussian_floor_seed`.
+    timer: Optional `PhaseTimer` to time creating the cars, updating them and stepping the world with. `end_batch`
+           is called after every batch, as generation 0. Calling `end_generation` is up to the caller.
+    """
+    chromosomes = np.asarray(chromosomes, dtype=np.float64).reshape(-1, 5, 8)
+    if settings is None:
+        settings = get_settings()
+    elif not isinstance(settings, Settings):
+        settings = compile_settings(settings)
+    batch_size = batch_size or settings.boxcar.run_at_a_time
+    if timer is None:
+        timer = PhaseTimer(enabled=False)
+
+    stats = np.empty(len(chromosomes), dtype=STATS_DTYPE)
+    for start in range(0, len(chromosomes), batch_size):
+        end = min(start + batch_size, len(chromosomes))
+        stats[start:end] = _run_batch(chromosomes[start:end], settings, seed, timer)
+        timer.end_batch(0, start // batch_size + 1)
+    return stats
+
+def _run_batch(chromosomes: np.ndarray, settings: Settings, seed: Optional[int], timer: PhaseTimer) -> np.ndarray:
+    """
+    Runs all chromosomes in a new world until every car is dead.
+    """
+    with timer.phase('create_cars'):
+        world = b2World(settings.boxcar.gravity)
+        floor = Floor(world, seed, settings=settings)
+        cars = [Car.create_car_from_chromosome(world, floor.winning_tile, floor.lowest_y, np.inf, chromosome, settings)
+                for chromosome in chromosomes]
+
+    alive = len(cars)
+    while alive:
+        with timer.phase('cars'):
+            for car in cars:
+                if car.is_alive and not car.update():
+                    alive -= 1
+        with timer.phase('physics'):
+            world.ClearForces()
+            world.Step(1./FPS, 10, 6)
+
+    with timer.phase('genomes'):
+        stats = np.empty(len(cars), dtype=STATS_DTYPE)
+        for i, car in enumerate(cars):
+            stats[i] = car.to_genome().stats
+    return stats
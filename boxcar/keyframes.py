@@ -0,0 +1,154 @@
+import bisect
+import numpy as np
+from typing import List, Optional
+from Box2D import b2World
+from .car import Car
+from .floor import Floor
+from settings import Settings
+
+
+# Per body, in the order [chassis] + wheels
+_X, _Y, _ANGLE, _VX, _VY, _ANGULAR_VELOCITY = range(6)
+_BODY_STATE_SIZE = 6
+
+# One row per car. Everything `Car.update` keeps track of between frames
+CAR_STATE_DTYPE = np.dtype([
+    ('frames',       np.int64),
+    ('num_failures', np.int64),
+    ('max_position', np.float64),
+    ('is_alive',     np.bool_),
+    ('is_winner',    np.bool_),
+    ('lifespan',     np.float64),
+    ('num_bodies',   np.int64),
+])
+
+
+class Keyframe(object):
+    """
+    State of a group of cars after `frame` world steps. Enough to put them back into a new world with `restore_keyframe`.
+    """
+    __slots__ = ('frame', 'bodies', 'cars', 'chromosomes')
+
+    def __init__(self, frame: int, bodies: np.ndarray, cars: np.ndarray, chromosomes: List[np.ndarray]):
+        self.frame = frame
+        self.bodies = bodies            # (total bodies, 6) float64: x, y, angle, vx, vy, angular velocity
+        self.cars = cars                # (num cars,) CAR_STATE_DTYPE
+        self.chromosomes = chromosomes  # Shared with the cars, they don't change while on the track
+
+    @property
+    def nbytes(self) -> int:
+        return self.bodies.nbytes + self.cars.nbytes
+
+
+def capture_keyframe(frame: int, cars: List[Car]) -> Keyframe:
+    """
+    Snapshots the bodies and counters of `cars`. Cars that are no longer alive have no bodies.
+    """
+    states = np.zeros(len(cars), dtype=CAR_STATE_DTYPE)
+    rows = []
+    for i, car in enumerate(cars):
+        num_bodies = 0
+        if car.is_alive:
+            for body in [car.chassis] + [wheel.body for wheel in car.wheels]:
+                position, velocity = body.position, body.linearVelocity
+                rows.append((position.x, position.y, body.angle, velocity.x, velocity.y, body.angularVelocity))
+                num_bodies += 1
+        states[i] = (car.frames, car.num_failures, car.max_position, car.is_alive, car.is_winner, car.lifespan, num_bodies)
+    bodies = np.array(rows, dtype=np.float64).reshape(-1, _BODY_STATE_SIZE)
+    return Keyframe(frame, bodies, states, [car.chromosome for car in cars])
+
+def restore_keyframe(keyframe: Keyframe, world: b2World, floor: Floor, settings: Optional[Settings] = None) -> List[Car]:
+    """
+    Creates the cars of a keyframe in `world` and puts them back where they were.
+    `world` should be a new world. Box2D keeps internal state (contact and proxy ordering) around, so only a new world
+    continues the same way every time.
+    """
+    cars = []
+    row = 0
+    for state, chromosome in zip(keyframe.cars, keyframe.chromosomes):
+        car = Car.create_car_from_chromosome(world, floor.winning_tile, floor.lowest_y, float(state['lifespan']),
+                                             chromosome, settings)
+        car.frames = int(state['frames'])
+        car.num_failures = int(state['num_failures'])
+        car.max_position = float(state['max_position'])
+        car.is_winner = bool(state['is_winner'])
+        if state['is_alive']:
+            for body in [car.chassis] + [wheel.body for wheel in car.wheels]:
+                x, y, angle, vx, vy, angular_velocity = keyframe.bodies[row].tolist()
+                body.transform = ((x, y), angle)
+                body.linearVelocity = (vx, vy)
+                body.angularVelocity = angular_velocity
+                row += 1
+            car.x, car.y = car.chassis.position.x, car.chassis.position.y
+        else:
+            car.is_alive = False
+            car._destroy()
+        cars.append(car)
+    return cars
+
+
+class KeyframeStore(object):
+    """
+    Keyframes every `interval` frames, using at most `budget` bytes.
+
+    Once the budget is used up, every other keyframe is dropped and the interval doubles.
+    Seeking then has to simulate up to twice as far, but a long replay never runs out of memory.
+    """
+    def __init__(self, interval: int = 60, budget: int = 64 * 2**20):
+        if interval < 1:
+            raise Exception('Keyframe interval must be at least 1, not {}'.format(interval))
+        self.base_interval = interval
+        self.interval = interval
+        self.budget = budget
+        self.nbytes = 0
+        self._frames: List[int] = []  # Sorted
+        self._keyframes: List[Keyframe] = []
+
+    def __len__(self) -> int:
+        return len(self._keyframes)
+
+    def is_due(self, frame: int) -> bool:
+        return frame % self.interval == 0
+
+    def add(self, keyframe: Keyframe) -> bool:
+        """
+        Keeps the keyframe if it lands on the interval. Returns whether it was kept.
+        """
+        if not self.is_due(keyframe.frame):
+            return False
+        i = bisect.bisect_left(self._frames, keyframe.frame)
+        if i < len(self._frames) and self._frames[i] == keyframe.frame:
+            self.nbytes -= self._keyframes[i].nbytes
+            self._keyframes[i] = keyframe
+        else:
+            self._frames.insert(i, keyframe.frame)
+            self._keyframes.insert(i, keyframe)
+        self.nbytes += keyframe.nbytes
+        while self.nbytes > self.budget and len(self._keyframes) > 1:
+            self._thin()
+        return keyframe.frame % self.interval == 0
+
+    def _thin(self) -> None:
+        self.interval *= 2
+        keep = [i for i, frame in enumerate(self._frames) if frame % self.interval == 0]
+        # Always hang on to the earliest one so there is something to seek from
+        if not keep or keep[0] != 0:
+            keep.insert(0, 0)
+        self._frames = [self._frames[i] for i in keep]
+        self._keyframes = [self._keyframes[i] for i in keep]
+        self.nbytes = sum(keyframe.nbytes for keyframe in self._keyframes)
+
+    def nearest(self, frame: int) -> Optional[Keyframe]:
+        """
+        The latest keyframe at or before `frame`, or None if there isn't one
+        """
+        i = bisect.bisect_right(self._frames, frame)
+        if i == 0:
+            return None
+        return self._keyframes[i - 1]
+
+    def clear(self) -> None:
+        self.interval = self.base_interval
+        self.nbytes = 0
+        self._frames = []
+        self._keyframes = []
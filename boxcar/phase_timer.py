@@ -0,0 +1,178 @@
+import os
+import time
+import numpy as np
+from typing import Dict, List, Optional, Union
+
+
+# Columns of the log, in order
+LOG_FIELDS = ['scope', 'generation', 'batch', 'phase', 'count', 'total', 'p50', 'p95']
+
+
+class PhaseStats(object):
+    """
+    How long a phase took over a batch or a generation. Times are in seconds.
+    """
+    __slots__ = ('count', 'total', 'p50', 'p95')
+
+    def __init__(self, samples: List[float]):
+        self.count = len(samples)
+        self.total = float(sum(samples))
+        if samples:
+            self.p50, self.p95 = (float(x) for x in np.percentile(samples, (50, 95)))
+        else:
+            self.p50 = self.p95 = 0.0
+
+
+class _Phase(object):
+    """
+    Times one `with` block. There is one per phase name, so the same phase can't be nested within itself.
+    """
+    __slots__ = ('_timer', '_name', '_start')
+
+    def __init__(self, timer: 'PhaseTimer', name: str):
+        self._timer = timer
+        self._name = name
+        self._start = 0.0
+
+    def __enter__(self) -> '_Phase':
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._start
+        # Looked up every time, since `end_batch` swaps in a new dict
+        samples = self._timer._batch.get(self._name)
+        if samples is None:
+            samples = self._timer._batch[self._name] = []
+        samples.append(elapsed)
+
+
+class _NullPhase(object):
+    """
+    What `PhaseTimer.phase` returns when timing is off. Does nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullPhase':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class PhaseTimer(object):
+    """
+    Wall clock time spent in each phase of the run loop (stepping the world, updating cars, creating cars, the GA,
+    saving, painting...), from `time.perf_counter`.
+
+    Wrap a phase in `with timer.phase('physics'):`. Every block is one sample. `end_batch` and `end_generation`
+    summarize the samples since the last call into `PhaseStats` per phase (count, total, p50, p95), keep them in
+    `last_batch`/`last_generation` and, with a `log_path`, append them to it. A path ending in .csv is written as CSV,
+    anything else as JSONL, one row per phase with the columns in LOG_FIELDS.
+
+    A disabled timer hands out a shared no-op context manager and ignores everything else, so the `with` blocks can
+    stay in the loop.
+
+    @NOTE: Phases can be timed from more than one thread (i.e. painting while the simulation thread steps). A sample
+    that finishes right as a batch ends may land in the next batch, which doesn't matter for these numbers.
+    """
+    def __init__(self, log_path: Optional[str] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.log_path = log_path if enabled else None
+        self.last_batch: Dict[str, PhaseStats] = {}
+        self.last_generation: Dict[str, PhaseStats] = {}
+        self._phases: Dict[str, _Phase] = {}
+        self._batch: Dict[str, List[float]] = {}        # Samples since the last `end_batch`
+        self._generation: Dict[str, List[float]] = {}   # Samples of finished batches since the last `end_generation`
+        self._log = None
+        self._csv = None
+        self._json = None
+        if self.log_path:
+            # Only needed for the log. Headless workers time nothing, so they don't pay for these imports
+            import csv
+            import json
+            self._json = json
+            directory = os.path.dirname(self.log_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            new_file = not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0
+            self._log = open(self.log_path, 'a', newline='')
+            if self.log_path.lower().endswith('.csv'):
+                self._csv = csv.writer(self._log)
+                if new_file:
+                    self._csv.writerow(LOG_FIELDS)
+
+    def phase(self, name: str) -> Union[_Phase, _NullPhase]:
+        """
+        Context manager timing one run of the phase `name`
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self._phases.get(name)
+        if phase is None:
+            phase = self._phases[name] = _Phase(self, name)
+        return phase
+
+    def end_batch(self, generation: int, batch: int) -> Dict[str, PhaseStats]:
+        """
+        Summarizes and logs the samples since the last batch ended. They also count towards the generation.
+        """
+        if not self.enabled:
+            return {}
+        samples, self._batch = self._batch, {}
+        for name, values in samples.items():
+            self._generation.setdefault(name, []).extend(values)
+        self.last_batch = {name: PhaseStats(values) for name, values in samples.items()}
+        self._write('batch', generation, batch, self.last_batch)
+        return self.last_batch
+
+    def end_generation(self, generation: int) -> Dict[str, PhaseStats]:
+        """
+        Summarizes and logs the samples since the last generation ended, including any since the last `end_batch`
+        """
+        if not self.enabled:
+            return {}
+        samples, self._batch = self._batch, {}
+        for name, values in samples.items():
+            self._generation.setdefault(name, []).extend(values)
+        samples, self._generation = self._generation, {}
+        self.last_generation = {name: PhaseStats(values) for name, values in samples.items()}
+        self._write('generation', generation, -1, self.last_generation)
+        if self._log:
+            self._log.flush()
+        return self.last_generation
+
+    def _write(self, scope: str, generation: int, batch: int, stats: Dict[str, PhaseStats]) -> None:
+        if not self._log:
+            return
+        for name in sorted(stats):
+            phase = stats[name]
+            row = [scope, generation, batch, name, phase.count, phase.total, phase.p50, phase.p95]
+            if self._csv:
+                self._csv.writerow(row)
+            else:
+                self._log.write(self._json.dumps(dict(zip(LOG_FIELDS, row))) + '\n')
+
+    def close(self) -> None:
+        """
+        Closes the log. Safe to call more than once.
+        """
+        if self._log:
+            self._log.close()
+            self._log = None
+            self._csv = None
+
+
+def format_phases(stats: Dict[str, PhaseStats]) -> str:
+    """
+    One line per phase, slowest first: name, share of the total, count, total, p50 and p95
+    """
+    overall = sum(phase.total for phase in stats.values()) or 1.0
+    lines = []
+    for name, phase in sorted(stats.items(), key=lambda item: -item[1].total):
+        lines.append('{:<12} {:5.1f}%  {:>7} x  {:8.3f}s  p50 {:7.3f}ms  p95 {:7.3f}ms'.format(
+            name, 100.0 * phase.total / overall, phase.count, phase.total, phase.p50 * 1e3, phase.p95 * 1e3))
+    return '\n'.join(lines)
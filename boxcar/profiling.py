@@ -0,0 +1,125 @@
+import cProfile
+import os
+import pstats
+from typing import Dict, List, Optional, Tuple
+
+
+# (filename, line, function name), how pstats identifies a function
+Function = Tuple[str, int, str]
+
+
+def generation_range(value: str) -> range:
+    """
+    '120-125' -> generations 120 to 125, both included. A single number is just that generation.
+    Raises ValueError otherwise, so it works as an argparse type.
+    """
+    if '-' in value:
+        first, last = (int(x) for x in value.split('-', 1))
+    else:
+        first = last = int(value)
+    if first < 0 or last < first:
+        raise ValueError('invalid range of generations "{}"'.format(value))
+    return range(first, last + 1)
+
+
+def _frame_name(function: Function) -> str:
+    filename, _, name = function
+    if filename == '~':
+        # Built-ins, i.e. '<built-in method Box2D._Box2D.b2World_Step>'
+        return name.replace('<built-in method ', '').replace('<method ', '').strip('<>')
+    return '{}:{}'.format(os.path.basename(filename), name)
+
+
+def collapsed_stacks(stats: pstats.Stats, min_fraction: float = 1e-4) -> Dict[str, float]:
+    """
+    Seconds spent in each call stack, with stacks written root first as 'file.py:function' frames joined by ';'.
+
+    cProfile only records who called whom, not whole stacks, so the stacks are rebuilt from the call graph: a
+    function's time is split between its callers by how much of it each one caused, and the same split is applied
+    all the way down. That is exact for anything only called from one place, and the usual approximation otherwise.
+    Recursion is cut at the first repeat, and stacks below `min_fraction` of the total are dropped.
+    """
+    entries = stats.stats
+    children: Dict[Function, List[Tuple[Function, float]]] = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            children.setdefault(caller, []).append((function, cumulative))
+    total = sum(entry[2] for entry in entries.values())
+    cutoff = total * min_fraction
+    stacks: Dict[str, float] = {}
+
+    def walk(function: Function, path: Tuple[Function, ...], names: str, time: float) -> None:
+        _, _, own, cumulative, _ = entries[function]
+        share = time / cumulative if cumulative > 0 else 0.0
+        if own * share > 0:
+            stacks[names] = stacks.get(names, 0.0) + own * share
+        for child, edge in children.get(function, []):
+            child_time = edge * share
+            if child_time < cutoff or child in path:
+                continue
+            walk(child, path + (child,), names + ';' + _frame_name(child), child_time)
+
+    # Functions nothing profiled called, i.e. whatever was already running when profiling started
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        if not callers and cumulative >= cutoff:
+            walk(function, (function,), _frame_name(function), cumulative)
+    return stacks
+
+
+class GenerationProfiler(object):
+    """
+    Runs cProfile over a range of generations, one at a time, and writes for each of them to `folder`:
+        <name>.pstats: the cProfile stats. Open with `pstats` or snakeviz
+        <name>.collapsed: microseconds per call stack, for flame graphs (flamegraph.pl, speedscope). See `collapsed_stacks`
+    where <name> is gen<N>_pop<population size>_batch<run_at_a_time>_<floor type>, so profiles of different runs
+    can be told apart and compared.
+
+    Call `at_generation` from the thread that runs the generations, every step, with the size of the population
+    being run. It only does something when the generation changes, which is also when the profile of the last one
+    is written. cProfile follows the thread it was enabled on, which is why it has to be that thread. Whatever else
+    that thread does in the meantime (i.e. painting, without --simulation-thread) is part of the profile as well.
+    """
+    def __init__(self, folder: str, generations: range, run_at_a_time: int, floor_type: str):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.folder = folder
+        self.generations = generations
+        self.pop_size = 0                      # Population size of the generation being profiled
+        self.run_at_a_time = run_at_a_time
+        self.floor_type = floor_type
+        self.generation: Optional[int] = None  # Generation `at_generation` was last called with
+        self._profile: Optional[cProfile.Profile] = None
+        self._profiled: Optional[int] = None   # Generation being profiled right now
+
+    def at_generation(self, generation: int, pop_size: int) -> None:
+        """
+        Starts or stops profiling when the generation changed since the last call
+        """
+        if generation == self.generation:
+            return
+        self.generation = generation
+        self.stop()
+        if generation in self.generations:
+            self._profiled = generation
+            self.pop_size = pop_size
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> None:
+        """
+        Writes the profile of the generation being profiled, if any. Also call this when the run ends early.
+        """
+        if self._profile is None:
+            return
+        self._profile.disable()
+        name = os.path.join(self.folder, 'gen{}_pop{}_batch{}_{}'.format(self._profiled, self.pop_size, self.run_at_a_time, self.floor_type))
+        self._profile.dump_stats(name + '.pstats')
+        stacks = collapsed_stacks(pstats.Stats(self._profile))
+        with open(name + '.collapsed', 'w') as f:
+            for stack, seconds in sorted(stacks.items(), key=lambda item: -item[1]):
+                microseconds = int(round(seconds * 1e6))
+                if microseconds > 0:
+                    f.write('{} {}\n'.format(stack, microseconds))
+        print('wrote the profile of generation {} to {}.pstats/.collapsed'.format(self._profiled, name))
+        self._profile = None
+        self._profiled = None
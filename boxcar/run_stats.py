@@ -0,0 +1,102 @@
+import threading
+import numpy as np
+from typing import Tuple
+
+
+class FitnessHistory(object):
+    """
+    Best, mean and std of the fitness and the number of winners of every generation, kept for charting.
+
+    Generations go into at most `max_buckets` buckets, each keeping the min and max of every value over the
+    generations it covers. Once every bucket is used, neighbouring buckets are merged and from then on each one covers
+    twice as many generations. Appending is O(1) and what gets drawn never grows past `max_buckets`, so charting
+    100k generations costs the same as charting 1k. Spikes survive since a bucket keeps its extremes, not an average.
+
+    Appended to by whichever thread runs the generations and read by the GUI thread, hence the lock.
+    """
+    SERIES = ('best', 'mean', 'std', 'winners')
+
+    def __init__(self, max_buckets: int = 512):
+        if max_buckets < 2 or max_buckets % 2:
+            raise Exception('max_buckets must be an even number >= 2, not {}'.format(max_buckets))
+        self.max_buckets = max_buckets
+        self.first_generation = 0
+        self.num_generations = 0
+        self.bucket_size = 1  # Generations per bucket
+        self._low = np.zeros((max_buckets, len(self.SERIES)))
+        self._high = np.zeros((max_buckets, len(self.SERIES)))
+        self._lock = threading.Lock()
+
+    def append(self, generation: int, best: float, mean: float, std: float, winners: int) -> None:
+        """
+        Adds the next generation. Generations are expected back to back, starting at the first one appended.
+        """
+        values = np.array((best, mean, std, winners), dtype=np.float64)
+        with self._lock:
+            if self.num_generations == 0:
+                self.first_generation = generation
+            bucket, offset = divmod(self.num_generations, self.bucket_size)
+            if bucket == self.max_buckets:
+                self._merge()
+                bucket, offset = divmod(self.num_generations, self.bucket_size)
+            if offset == 0:
+                self._low[bucket] = values
+                self._high[bucket] = values
+            else:
+                np.minimum(self._low[bucket], values, out=self._low[bucket])
+                np.maximum(self._high[bucket], values, out=self._high[bucket])
+            self.num_generations += 1
+
+    def _merge(self) -> None:
+        """
+        Halves the number of buckets in use by merging neighbours. Only called once every bucket is full.
+        """
+        half = self.max_buckets // 2
+        self._low[:half] = np.minimum(self._low[0::2], self._low[1::2])
+        self._high[:half] = np.maximum(self._high[0::2], self._high[1::2])
+        self.bucket_size *= 2
+
+    def buckets(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (first generation of each bucket, (num_buckets, 4) min, (num_buckets, 4) max) of the buckets in use.
+        Columns are in the order of `SERIES`. These are copies, so they stay consistent while more generations come in.
+        """
+        with self._lock:
+            num_buckets = -(-self.num_generations // self.bucket_size)
+            starts = self.first_generation + np.arange(num_buckets) * self.bucket_size
+            return starts, self._low[:num_buckets].copy(), self._high[:num_buckets].copy()
+
+
+class RunStats(object):
+    """
+    The numbers `StatsWindow` shows, as plain attributes. The simulation writes to them as things happen, on whatever
+    thread it runs on, and the window formats and shows them on its own schedule (see `MainWindow._push_stats`).
+    How often they change therefore doesn't cost anything.
+    """
+    __slots__ = ('generation', 'pop_size', 'num_alive', 'batch_size', 'current_batch', 'num_batches',
+                 'best_fitness', 'mean_fitness_last_gen', 'num_solved_last_gen', 'gens_without_improvement',
+                 'history')
+
+    def __init__(self):
+        self.generation = 0                 # Counting from 0, like `MainWindow.current_generation`
+        self.pop_size = 0
+        self.num_alive = 0                  # Cars still on the track in the current batch
+        self.batch_size = 0
+        self.current_batch = 1
+        self.num_batches = 1                # Batches in the current generation
+        self.best_fitness = 0.0             # Best fitness ever
+        self.mean_fitness_last_gen = 0.0
+        self.num_solved_last_gen = 0
+        self.gens_without_improvement = 0
+        self.history = FitnessHistory()     # Every finished generation, for the chart
+
+    def end_generation(self, generation: int, fitness: np.ndarray, num_winners: int) -> None:
+        """
+        Records a finished generation from the fitness of each of its individuals
+        """
+        mean = float(np.mean(fitness)) if len(fitness) else 0.0
+        std = float(np.std(fitness)) if len(fitness) else 0.0
+        best = float(np.max(fitness)) if len(fitness) else 0.0
+        self.mean_fitness_last_gen = mean
+        self.num_solved_last_gen = int(num_winners)
+        self.history.append(generation, best, mean, std, num_winners)
@@ -0,0 +1,102 @@
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+from .car import Car
+from .trajectory import CarShape, _get_angle
+
+
+class Snapshot(object):
+    """
+    Poses of the cars on the track after `frame` steps. Enough to draw them without touching Box2D,
+    i.e. from another thread while the world keeps stepping.
+    """
+    __slots__ = ('frame', 'generation', 'poses', 'starts', 'alive', 'shapes', 'leader', 'floor')
+
+    def __init__(self):
+        self.frame = 0
+        self.generation = 0
+        self.poses = np.zeros((0, 3), dtype=np.float32)  # (total bodies, 3) x, y, angle. Each car's chassis, then its wheels
+        self.starts = np.zeros(1, dtype=np.int64)        # Bodies of car i are poses[starts[i]:starts[i+1]]
+        self.alive = np.zeros(0, dtype=np.bool_)
+        self.shapes: List[CarShape] = []                 # Shared by every snapshot of the same batch
+        self.leader = -1                                 # Index of the leading car, -1 if there isn't one
+        self.floor: Any = None                           # Drawable floor built by the simulation thread, i.e. FloorGeometry
+
+    def car_poses(self, i: int) -> np.ndarray:
+        """
+        (1 + num_wheels, 3) poses of car i, in the same layout as `TrajectoryFile.poses`
+        """
+        return self.poses[self.starts[i]: self.starts[i + 1]]
+
+
+class SnapshotBuffer(object):
+    """
+    Double buffer of snapshots between the thread stepping the world and the one drawing it.
+
+    The simulation fills the back snapshot with `capture` and swaps it to the front with `publish`. The drawing side
+    holds the front snapshot with `read` while it draws. `publish` never waits on the reader: if the front snapshot
+    is being read, the swap is skipped and the next `capture` simply overwrites the back one again.
+    """
+    def __init__(self):
+        self._front = Snapshot()
+        self._back = Snapshot()
+        self._lock = threading.Lock()
+        # Per batch. Only the poses change from one capture to the next
+        self._cars: Optional[List[Car]] = None
+        self._shapes: List[CarShape] = []
+        self._starts = np.zeros(1, dtype=np.int64)
+
+    def capture(self, frame: int, generation: int, cars: List[Car], leader: Optional[Car], floor: Any = None) -> None:
+        """
+        Copies the poses of `cars` into the back snapshot. Only call from the thread stepping the world.
+        `floor` is passed along as is. It must not reference Box2D, the drawing side reads it while the world steps.
+        """
+        if cars is not self._cars:
+            self._cars = cars
+            self._shapes = [CarShape(car.chromosome) for car in cars]
+            self._starts = np.concatenate(([0], np.cumsum([1 + len(shape.wheel_radii) for shape in self._shapes]))).astype(np.int64)
+
+        snapshot = self._back
+        snapshot.frame = frame
+        snapshot.generation = generation
+        snapshot.shapes = self._shapes
+        snapshot.starts = self._starts
+        snapshot.alive = np.array([car.is_alive for car in cars], dtype=np.bool_)
+        snapshot.leader = -1
+        snapshot.floor = floor
+        rows = []
+        for i, car in enumerate(cars):
+            if car is leader:
+                snapshot.leader = i
+            if car.is_alive:
+                for body in [car.chassis] + [wheel.body for wheel in car.wheels]:
+                    position = body.position
+                    rows.append((position.x, position.y, _get_angle(body)))
+            else:
+                # Nothing left to read. The car isn't drawn, so its rows are only placeholders
+                rows.extend([(0.0, 0.0, 0.0)] * int(self._starts[i + 1] - self._starts[i]))
+        if snapshot.poses.shape[0] != len(rows):
+            snapshot.poses = np.zeros((len(rows), 3), dtype=np.float32)
+        if rows:
+            snapshot.poses[:] = rows
+
+    def publish(self) -> bool:
+        """
+        Makes the last capture the one `read` returns. Returns False if the reader was busy and nothing was swapped.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._front, self._back = self._back, self._front
+        finally:
+            self._lock.release()
+        return True
+
+    @contextmanager
+    def read(self) -> Iterator[Snapshot]:
+        """
+        The latest published snapshot. It doesn't change until the `with` block is done
+        """
+        with self._lock:
+            yield self._front
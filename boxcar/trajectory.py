@@ -0,0 +1,312 @@
+import os
+import numpy as np
+from Box2D import b2Body, _Box2D
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .car import Car, genes
+
+
+# Raw SWIG accessor. It is about twice as fast as the b2Body.angle property,
+# which matters since this runs for every body, every frame.
+_get_angle = _Box2D.b2Body___GetAngle
+
+POSES_FILE = 'poses.f32'
+INDEX_FILE = 'index.bin'
+SETTINGS_FILE = 'settings.pkl'
+
+# One record per car in INDEX_FILE
+INDEX_DTYPE = np.dtype([
+    ('generation', np.int32),
+    ('individual', np.int32),   # Index into the population the car ended up in. Same order as `--save-pop` archives
+    ('offset',     np.int64),   # Offset into POSES_FILE, in float32s
+    ('num_frames', np.int32),   # Frames the car was alive after. One less than `Car.frames`, since the last update destroys it
+    ('num_wheels', np.int32),
+    ('fitness',    np.float64),
+    ('chromosome', np.float64, (5, 8)),
+])
+
+
+class TrajectoryRecorder(object):
+    """
+    Records the pose of every car on the track, every frame, so a run can be played back without re-simulating.
+
+    Each frame, a car stores its chassis (x, y, angle) followed by the angle of each of its wheels.
+    Wheel positions are not stored: the wheels are pinned to chassis vertices by revolute joints, so they are
+    recovered from the chassis pose and the chromosome (see `TrajectoryFile.poses`).
+
+    Every batch is flushed to `folder` as float32 once all of its cars have finished:
+        poses.f32: float32 (num_frames, 3 + num_wheels) blocks, one per car, back to back
+        index.bin: INDEX_DTYPE records, one per car
+    Both can be memory mapped. See `TrajectoryFile`.
+    If `settings` is given, it is saved once to settings.pkl so playback can rebuild the same floor.
+
+    @NOTE: Frames are appended to a plain list per car and converted to float32 once per batch.
+    Writing every frame into a numpy buffer costs more than reading the poses from Box2D does.
+    """
+    def __init__(self, folder: str, settings: Optional[Dict[str, Any]] = None):
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        self.folder = folder
+        settings_path = os.path.join(folder, SETTINGS_FILE)
+        if settings is not None and not os.path.exists(settings_path):
+            # dill is only needed here (the fitness function is a lambda), so don't make every import pay for it
+            import dill as pickle
+            with open(settings_path, 'wb') as out:
+                pickle.dump(settings, out)
+        self._poses_path = os.path.join(folder, POSES_FILE)
+        self._index_path = os.path.join(folder, INDEX_FILE)
+        self._offset = os.path.getsize(self._poses_path) // 4 if os.path.exists(self._poses_path) else 0
+        self._cars: Optional[List[Car]] = None
+        self._tracks: List[Tuple[Car, List[b2Body], List[float]]] = []
+        self._alive: List[Tuple[Car, List[b2Body], List[float]]] = []
+
+    def _begin_batch(self, cars: List[Car]) -> None:
+        self._cars = cars
+        # (car, bodies to read the angle of, recorded values)
+        self._tracks = [(car, [car.chassis] + [wheel.body for wheel in car.wheels], []) for car in cars]
+        self._alive = list(self._tracks)
+
+    def record(self, cars: List[Car]) -> None:
+        """
+        Records one frame. Call after the cars have been updated and before `world.Step`,
+        since the chassis position comes from `Car.update` rather than asking Box2D again.
+        A different list of cars than last time starts a new batch.
+        """
+        if cars is not self._cars:
+            self._begin_batch(cars)
+        finished = False
+        for car, bodies, values in self._alive:
+            if car.is_alive:
+                values.append(car.x)
+                values.append(car.y)
+                values.extend(map(_get_angle, bodies))
+            else:
+                finished = True
+        # Cars don't come back, so stop looking at the ones that are done
+        if finished:
+            self._alive = [track for track in self._alive if track[0].is_alive]
+
+    def end_batch(self, cars: List[Car], generation: int, first_individual: int) -> None:
+        """
+        Writes the batch to disk. `cars` are the cars of the batch, which have all finished.
+        `first_individual` is where they start within the population of `generation`.
+        """
+        if cars is not self._cars:
+            self._begin_batch(cars)
+        index = np.zeros(len(cars), dtype=INDEX_DTYPE)
+        with open(self._poses_path, 'ab') as f:
+            for i, (car, bodies, values) in enumerate(self._tracks):
+                block = np.array(values, dtype=np.float32)
+                f.write(block.tobytes())
+
+                car.calculate_fitness()
+                index[i] = (generation, first_individual + i, self._offset, len(values) // (2 + len(bodies)),
+                            car.num_wheels, car.fitness, car.chromosome)
+                self._offset += block.size
+        with open(self._index_path, 'ab') as f:
+            f.write(index.tobytes())
+        self._cars = None
+        self._tracks = []
+        self._alive = []
+
+
+class TrajectoryFile(object):
+    """
+    Read access to a folder written by `TrajectoryRecorder`. Everything is memory mapped.
+    """
+    def __init__(self, folder: str):
+        poses_path = os.path.join(folder, POSES_FILE)
+        index_path = os.path.join(folder, INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise Exception('No trajectories found within {}'.format(folder))
+        self.folder = folder
+        self.index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+        if os.path.getsize(poses_path):
+            self._poses = np.memmap(poses_path, dtype=np.float32, mode='r')
+        else:
+            self._poses = np.empty(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def settings(self) -> Optional[Dict[str, Any]]:
+        """
+        The settings the recording was made with, or None if they weren't saved.
+        """
+        settings_path = os.path.join(self.folder, SETTINGS_FILE)
+        if not os.path.exists(settings_path):
+            return None
+        import dill as pickle
+        with open(settings_path, 'rb') as f:
+            return pickle.load(f)
+
+    def champions(self) -> np.ndarray:
+        """
+        Record number of the fittest car of every generation, in order of generation.
+        """
+        generations = self.index['generation']
+        # Sort by generation, then fitness, and take the last record of every generation
+        order = np.lexsort((self.index['fitness'], generations))
+        last = np.append(generations[order][1:] != generations[order][:-1], True)
+        return order[last]
+
+    def find(self, generation: int, individual: int) -> int:
+        """
+        Returns the record number of an individual from a generation
+        """
+        matches = np.flatnonzero((self.index['generation'] == generation) & (self.index['individual'] == individual))
+        if len(matches) == 0:
+            raise Exception('Generation {} individual {} was not recorded'.format(generation, individual))
+        return int(matches[-1])
+
+    def raw(self, record: int) -> np.ndarray:
+        """
+        (num_frames, 3 + num_wheels) view: chassis x, y, angle, then the angle of every wheel
+        """
+        entry = self.index[record]
+        width = 3 + int(entry['num_wheels'])
+        start = int(entry['offset'])
+        return self._poses[start: start + int(entry['num_frames']) * width].reshape(-1, width)
+
+    def poses(self, record: int) -> np.ndarray:
+        """
+        (num_frames, 1 + num_wheels, 3) array of (x, y, angle) for the chassis followed by each wheel.
+        Wheel positions are recovered from the chassis pose and the chassis vertex each wheel is attached to.
+        """
+        raw = self.raw(record)
+        chromosome = self.index[record]['chromosome']
+        vertices = wheel_vertices(chromosome)
+
+        poses = np.empty((len(raw), 1 + len(vertices), 3), dtype=np.float32)
+        poses[:, 0, :] = raw[:, :3]
+        if len(vertices):
+            local = np.stack((chromosome[genes['chassis_vertices_x'], vertices],
+                              chromosome[genes['chassis_vertices_y'], vertices]), axis=-1).astype(np.float32)
+            cos, sin = np.cos(raw[:, 2:3]), np.sin(raw[:, 2:3])
+            poses[:, 1:, 0] = raw[:, 0:1] + cos * local[:, 0] - sin * local[:, 1]
+            poses[:, 1:, 1] = raw[:, 1:2] + sin * local[:, 0] + cos * local[:, 1]
+            poses[:, 1:, 2] = raw[:, 3:]
+        return poses
+
+
+def wheel_vertices(chromosome: np.ndarray) -> np.ndarray:
+    """
+    Chassis vertices that have a wheel, in the same order as `Car.wheels`
+    """
+    radii = chromosome[genes['wheel_radii'], :]
+    densities = chromosome[genes['wheel_densities'], :]
+    return np.flatnonzero((radii > 0.0) & (densities > 0.0))
+
+
+class CarShape(object):
+    """
+    What a car looks like, from its chromosome. Together with a pose from `TrajectoryFile.poses` it is all that's
+    needed to draw the car.
+    """
+    __slots__ = ('chassis_vertices', 'chassis_densities', 'wheel_radii', 'wheel_densities', '__weakref__')
+
+    def __init__(self, chromosome: np.ndarray):
+        vertices = wheel_vertices(chromosome)
+        self.chassis_vertices = np.stack((chromosome[genes['chassis_vertices_x'], :],
+                                          chromosome[genes['chassis_vertices_y'], :]), axis=-1)
+        self.chassis_densities = chromosome[genes['chassis_densities'], :]
+        self.wheel_radii = chromosome[genes['wheel_radii'], vertices]
+        self.wheel_densities = chromosome[genes['wheel_densities'], vertices]
+
+
+def car_poses(car: Car) -> np.ndarray:
+    """
+    (1 + num_wheels, 3) array of (x, y, angle) for the chassis and wheels of a car on the track,
+    in the same layout as `TrajectoryFile.poses`
+    """
+    bodies = [car.chassis] + [wheel.body for wheel in car.wheels]
+    return np.array([(body.position.x, body.position.y, body.angle) for body in bodies], dtype=np.float32)
+
+
+class TrajectoryPlayer(object):
+    """
+    Plays back records of a `TrajectoryFile` without Box2D.
+
+    The position in the current record is a float frame, so any speed works. Moving past either end of a record
+    continues with the next/previous one. The poses of a record are rebuilt once when it is selected, so seeking
+    within it is just indexing.
+    """
+    def __init__(self, trajectories: TrajectoryFile, records: Sequence[int], speed: float = 1.0):
+        if len(records) == 0:
+            raise Exception('Nothing to play back in {}'.format(trajectories.folder))
+        self.trajectories = trajectories
+        self.records = [int(record) for record in records]
+        self.speed = speed
+        self.paused = False
+        self._position = 0  # Index into self.records
+        self._select(0)
+
+    def _select(self, position: int) -> None:
+        self._position = position % len(self.records)
+        self.record = int(self.records[self._position])
+        entry = self.trajectories.index[self.record]
+        self.generation = int(entry['generation'])
+        self.individual = int(entry['individual'])
+        self.fitness = float(entry['fitness'])
+
+        self.shape = CarShape(entry['chromosome'])
+        self._poses = self.trajectories.poses(self.record)
+        self.frame = 0.0
+
+    @property
+    def position(self) -> int:
+        """
+        Which of `records` is playing
+        """
+        return self._position
+
+    @property
+    def num_frames(self) -> int:
+        return len(self._poses)
+
+    @property
+    def poses(self) -> np.ndarray:
+        """
+        (1 + num_wheels, 3) array of (x, y, angle) for the chassis and wheels at the current frame
+        """
+        if self.num_frames == 0:
+            return np.zeros((1 + len(self.shape.wheel_radii), 3), dtype=np.float32)
+        return self._poses[int(self.frame)]
+
+    def advance(self) -> None:
+        """
+        Moves `speed` frames forward. Called once per tick.
+        """
+        if not self.paused:
+            self.skip(self.speed)
+
+    def skip(self, frames: float) -> None:
+        """
+        Moves forward (or backwards) by a number of frames, continuing into the next/previous record
+        """
+        frame = self.frame + frames
+        if frame >= self.num_frames:
+            self._select(self._position + 1)
+        elif frame < 0:
+            self._select(self._position - 1)
+            self.seek(self.num_frames - 1)
+        else:
+            self.frame = frame
+
+    def seek(self, frame: float) -> None:
+        """
+        Jumps to a frame of the current record
+        """
+        self.frame = float(min(max(frame, 0), max(self.num_frames - 1, 0)))
+
+    def seek_fraction(self, fraction: float) -> None:
+        """
+        Jumps to a fraction (0 to 1) of the way through the current record
+        """
+        self.seek(fraction * (self.num_frames - 1))
+
+    def next_record(self) -> None:
+        self._select(self._position + 1)
+
+    def previous_record(self) -> None:
+        self._select(self._position - 1)
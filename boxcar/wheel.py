@@ -1,7 +1,8 @@
 from Box2D import *
-from settings import get_boxcar_constant
 
 class Wheel(object):
+    __slots__ = ('radius', 'density', 'restitution', 'body', '_mass', '_torque')
+
     def __init__(self, world: b2World, radius: float, density: float, restitution: float = 0.2):
         self.radius = radius
         self.density = density
@@ -45,8 +46,3 @@ class Wheel(object):
     @torque.setter
     def torque(self, value):
         self._torque = value
-
-
-def clone(self) -> 'Wheel':
-    clone = Wheel(self.world, self.radius, self.density, self.restitution)
-    return clone
\ No newline at end of file
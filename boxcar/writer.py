@@ -0,0 +1,72 @@
+import atexit
+import queue
+import threading
+from typing import Any, Callable, Optional
+
+
+class BackgroundWriter(object):
+    """
+    Runs save jobs on a background thread so the simulation doesn't wait on the disk.
+
+    Jobs run one at a time in the order they were submitted. The queue is bounded: if the disk can't keep up,
+    `submit` blocks until there is room (back-pressure) instead of letting snapshots pile up in memory.
+    Whatever is passed to `submit` is used after it returns, so it needs to be a snapshot.
+
+    If a job fails, the error is raised from the next call to `submit`, `flush` or `close`.
+    Anything still queued is written at exit.
+    """
+    def __init__(self, max_pending: int = 4):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='BackgroundWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> None:
+        """
+        Queues `func(*args, **kwargs)`. Blocks while `max_pending` jobs are already waiting.
+        """
+        if self._closed:
+            raise Exception('BackgroundWriter is closed')
+        self._raise_error()
+        self._queue.put((func, args, kwargs))
+
+    def flush(self) -> None:
+        """
+        Waits until everything submitted so far has been written.
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """
+        Writes anything still queued and stops the thread. Safe to call more than once.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        atexit.unregister(self.close)
+        self._raise_error()
+
+    def _raise_error(self) -> None:
+        error, self._error = self._error, None
+        if error is not None:
+            raise Exception('Saving in the background failed: {}'.format(error)) from error
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                func, args, kwargs = job
+                func(*args, **kwargs)
+            except BaseException as e:
+                # Keep the first error. It is raised in the thread that submits the next job
+                if self._error is None:
+                    self._error = e
+            finally:
+                self._queue.task_done()
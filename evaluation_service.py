@@ -0,0 +1,334 @@
+"""
+Asyncio evaluation service for driving PyGenoCar from an external optimizer.
+
+Clients submit chromosomes through `EvaluationService.evaluate`. Concurrent requests are merged into full
+simulation batches (`run_at_a_time` cars per world) and handed to a process pool, so many small clients
+asking for a few cars each still keep every worker busy. On top of that there is a small ask/tell interface
+that uses the same GA operators as the GUI, and a Unix socket front end speaking JSON lines.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from boxcar.car import create_random_chromosome, smart_clip
+from boxcar.genome import Genome
+from boxcar.headless import evaluate, STATS_DTYPE
+from genetic_algorithm.population import Population
+from genetic_algorithm.crossover import simulated_binary_crossover as SBX
+from genetic_algorithm.mutation import gaussian_mutation
+from genetic_algorithm.selection import elitism_selection, roulette_wheel_selection, tournament_selection
+from settings import Settings, get_settings
+
+
+class _Request(object):
+    """
+    One call to `EvaluationService.evaluate`. A request may be split across several batches.
+    """
+    __slots__ = ('chromosomes', 'future', 'stats', 'remaining', 'next_idx')
+
+    def __init__(self, chromosomes: np.ndarray, future: asyncio.Future):
+        self.chromosomes = chromosomes
+        self.future = future
+        self.stats = np.empty(len(chromosomes), dtype=STATS_DTYPE)
+        self.remaining = len(chromosomes)
+        self.next_idx = 0  # Index of the next chromosome that has not been put into a batch
+
+
+class EvaluationService(object):
+    def __init__(self, batch_size: Optional[int] = None, max_workers: Optional[int] = None,
+                 max_delay: float = 0.01, executor: Optional[Executor] = None,
+                 settings: Optional[Settings] = None, isolate_requests: bool = False):
+        """
+        batch_size: Number of cars simulated together in one world. Defaults to `run_at_a_time`.
+        max_workers: Size of the process pool if no executor is given.
+        max_delay: How long (seconds) a partial batch waits for more requests while the pool is busy.
+        executor: Optional executor to use instead of creating a process pool.
+        settings: Settings snapshot used for the GA and shipped to the workers. Defaults to the global settings.
+        isolate_requests: Never put cars of different requests into the same world. See `evaluate`.
+        """
+        self.settings = settings or get_settings()
+        self.batch_size = batch_size or self.settings.boxcar.run_at_a_time
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_delay = max_delay
+        self.isolate_requests = isolate_requests
+        self._executor = executor
+        self._owns_executor = executor is None
+
+        self._pending: List[_Request] = []
+        self._num_pending = 0  # Number of chromosomes waiting to go into a batch
+        self._in_flight = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # ask/tell state
+        self.population = Population([])
+        self.generation = 0
+        self._num_told = 0
+        self._crossover_bins = np.cumsum([self.settings.ga.probability_SBX])
+        self._mutation_bins = np.cumsum([self.settings.ga.probability_gaussian,
+                                         self.settings.ga.probability_random_uniform])
+
+    async def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers)
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    async def close(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        if self._owns_executor and self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __aenter__(self) -> 'EvaluationService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def evaluate(self, chromosomes: np.ndarray) -> np.ndarray:
+        """
+        Evaluates the chromosomes and returns one row of STATS_DTYPE per chromosome, in the same order.
+
+        @NOTE: Cars in the same world affect each other's results (Box2D contact and proxy ordering), and by default
+        the chromosomes of concurrent requests are merged into one batch. So the same chromosomes can score differently
+        depending on what else was being evaluated. With `isolate_requests` every batch only holds cars of a single
+        request, and a request scores the same every time, at the cost of partly filled batches.
+        """
+        chromosomes = np.asarray(chromosomes, dtype=np.float64).reshape(-1, 5, 8)
+        future = asyncio.get_running_loop().create_future()
+        if len(chromosomes) == 0:
+            future.set_result(np.empty(0, dtype=STATS_DTYPE))
+            return await future
+
+        self._pending.append(_Request(chromosomes, future))
+        self._num_pending += len(chromosomes)
+        self._wakeup.set()
+        return await future
+
+    async def ask(self, n: Optional[int] = None) -> np.ndarray:
+        """
+        Returns `n` chromosomes to evaluate. Until `num_parents` individuals have been told, these are random.
+        Afterwards they are offspring of the current population.
+        """
+        n = n or self.settings.ga.num_offspring
+        if self.population.num_individuals < self.settings.ga.num_parents:
+            return np.array([create_random_chromosome(self.settings) for _ in range(n)])
+
+        children = []
+        while len(children) < n:
+            if self.settings.ga.crossover_selection.lower() == 'tournament':
+                p1, p2 = tournament_selection(self.population, 2, self.settings.ga.tournament_size)
+            elif self.settings.ga.crossover_selection.lower() == 'roulette':
+                p1, p2 = roulette_wheel_selection(self.population, 2)
+            else:
+                raise Exception('crossover_selection "{}" is not supported'.format(self.settings.ga.crossover_selection.lower()))
+
+            c1_chromosome, c2_chromosome = self._crossover(p1.chromosome, p2.chromosome)
+            for chromosome in (c1_chromosome, c2_chromosome):
+                self._mutation(chromosome)
+                smart_clip(chromosome)
+                children.append(chromosome)
+
+        return np.array(children[:n])
+
+    async def tell(self, chromosomes: np.ndarray, fitness: np.ndarray) -> None:
+        """
+        Adds evaluated chromosomes to the population. The population is kept at `num_parents` by elitism,
+        and the generation counter advances every `num_offspring` individuals.
+        """
+        chromosomes = np.asarray(chromosomes, dtype=np.float64).reshape(-1, 5, 8)
+        fitness = np.asarray(fitness, dtype=np.float64).reshape(-1)
+        if len(chromosomes) != len(fitness):
+            raise Exception('chromosomes and fitness must be same length')
+
+        for chromosome, fit in zip(chromosomes, fitness):
+            self.population.individuals.append(Genome(np.copy(chromosome), max(float(fit), 0.0001)))
+        self.population.individuals = elitism_selection(self.population, self.settings.ga.num_parents)
+
+        self._num_told += len(chromosomes)
+        self.generation = self._num_told // self.settings.ga.num_offspring
+
+    async def _dispatch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # If there isn't a full batch yet but the pool is already working, give other clients a moment
+            # to add to it. An idle pool gets whatever is there right away.
+            if 0 < self._num_pending < self.batch_size and self._in_flight > 0 and not self.isolate_requests:
+                await asyncio.sleep(self.max_delay)
+
+            # Keep at most two batches per worker queued so that the pool always has something next,
+            # without pulling the whole backlog into memory of the executor.
+            while self._num_pending and self._in_flight < 2 * self.max_workers:
+                batch, parts = self._take_batch()
+                self._in_flight += 1
+                # Workers only need boxcar.headless, which keeps their startup cheap. The whole batch runs in one world.
+                task = loop.run_in_executor(self._executor, evaluate, batch, self.settings, None, len(batch))
+                task.add_done_callback(lambda t, parts=parts: self._batch_done(t, parts))
+
+    def _take_batch(self) -> Tuple[np.ndarray, List[Tuple[_Request, int, int]]]:
+        """
+        Grabs up to `batch_size` chromosomes from the pending requests, in order.
+        Returns the batch and which slice of which request each part of the batch belongs to.
+        """
+        chunks = []
+        parts = []
+        needed = self.batch_size
+        while needed and self._pending:
+            request = self._pending[0]
+            start = request.next_idx
+            end = min(start + needed, len(request.chromosomes))
+            chunks.append(request.chromosomes[start:end])
+            parts.append((request, start, end))
+            request.next_idx = end
+            needed -= end - start
+            if end == len(request.chromosomes):
+                self._pending.pop(0)
+            if self.isolate_requests:
+                break
+
+        batch = np.concatenate(chunks)
+        self._num_pending -= len(batch)
+        return batch, parts
+
+    def _batch_done(self, task: asyncio.Future, parts: List[Tuple[_Request, int, int]]) -> None:
+        self._in_flight -= 1
+        self._wakeup.set()
+
+        # i.e. the executor was shut down under it
+        cancelled = task.cancelled()
+        error = None if cancelled else task.exception()
+        offset = 0
+        for request, start, end in parts:
+            size = end - start
+            offset += size
+            if request.future.done():
+                continue
+            if cancelled:
+                request.future.cancel()
+                self._drop_pending(request)
+                continue
+            if error:
+                request.future.set_exception(error)
+                self._drop_pending(request)
+                continue
+            request.stats[start:end] = task.result()[offset - size: offset]
+            request.remaining -= size
+            if request.remaining == 0:
+                request.future.set_result(request.stats)
+
+    def _drop_pending(self, request: _Request) -> None:
+        """
+        Takes whatever of `request` hasn't been put into a batch yet out of the queue, so it isn't simulated for nothing
+        """
+        if request.next_idx < len(request.chromosomes):
+            self._pending.remove(request)
+            self._num_pending -= len(request.chromosomes) - request.next_idx
+            request.next_idx = len(request.chromosomes)
+
+    def _crossover(self, p1_chromosome: np.ndarray, p2_chromosome: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rand_crossover = random.random()
+        crossover_bucket = np.digitize(rand_crossover, self._crossover_bins)
+
+        # SBX
+        if crossover_bucket == 0:
+            return SBX(p1_chromosome, p2_chromosome, self.settings.ga.SBX_eta)
+        raise Exception('Unable to determine valid crossover based off probabilities')
+
+    def _mutation(self, chromosome: np.ndarray) -> None:
+        rand_mutation = random.random()
+        mutation_bucket = np.digitize(rand_mutation, self._mutation_bins)
+
+        # Gaussian
+        if mutation_bucket == 0:
+            mutation_rate = self.settings.ga.mutation_rate
+            if self.settings.ga.mutation_rate_type.lower() == 'dynamic':
+                mutation_rate = mutation_rate / math.sqrt(self.generation + 1)
+            gaussian_mutation(chromosome, mutation_rate, scale=self.settings.ga.gaussian_mutation_scale)
+        # Random uniform
+        elif mutation_bucket == 1:
+            pass
+        else:
+            raise Exception('Unable to determine valid mutation based off probabilities')
+
+
+def _stats_to_json(stats: np.ndarray) -> Dict[str, List[Any]]:
+    return {name: stats[name].tolist() for name in stats.dtype.names}
+
+async def _handle_client(service: EvaluationService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Every line is a JSON request, answered with one JSON line:
+        {"op": "evaluate", "chromosomes": [...]}  -> {"stats": {...}}
+        {"op": "ask", "n": 10}                     -> {"chromosomes": [...]}
+        {"op": "tell", "chromosomes": [...], "fitness": [...]} -> {"generation": 3}
+    """
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'evaluate':
+                    stats = await service.evaluate(np.array(request['chromosomes']))
+                    response = {'stats': _stats_to_json(stats)}
+                elif op == 'ask':
+                    chromosomes = await service.ask(request.get('n'))
+                    response = {'chromosomes': chromosomes.tolist()}
+                elif op == 'tell':
+                    await service.tell(np.array(request['chromosomes']), np.array(request['fitness']))
+                    response = {'generation': service.generation}
+                else:
+                    response = {'error': 'Unknown op "{}"'.format(op)}
+            except Exception as e:
+                response = {'error': str(e)}
+            writer.write((json.dumps(response) + '\n').encode())
+            await writer.drain()
+    finally:
+        writer.close()
+
+async def serve_unix(path: str, service: EvaluationService) -> None:
+    """
+    Serves `service` on a Unix socket at `path` until cancelled.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    server = await asyncio.start_unix_server(lambda r, w: _handle_client(service, r, w), path=path)
+    async with server:
+        await server.serve_forever()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='PyGenoCar evaluation service')
+    parser.add_argument('--socket', dest='socket', type=str, required=True, help='path of the Unix socket to listen on')
+    parser.add_argument('--workers', dest='workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=None, help='cars per simulation batch (default: run_at_a_time)')
+    parser.add_argument('--max-delay', dest='max_delay', type=float, default=0.01, help='seconds a partial batch waits for more cars while the pool is busy')
+    parser.add_argument('--isolate-requests', dest='isolate_requests', action='store_true', help="don't mix cars of different requests in one world, so scores don't depend on other requests")
+
+    args = parser.parse_args()
+    return args
+
+async def _main(args) -> None:
+    async with EvaluationService(args.batch_size, args.workers, args.max_delay, isolate_requests=args.isolate_requests) as service:
+        await serve_unix(args.socket, service)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    asyncio.run(_main(args))
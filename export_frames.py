@@ -0,0 +1,235 @@
+"""
+Renders replays to a folder of PNG frames without a window, i.e. to turn into a video.
+
+Frames are drawn with the same functions as the GUI onto an offscreen QImage, so this also works without a display.
+Recorded trajectories (`--record-trajectories`) are drawn straight from the recorded poses. Cars from a folder or
+archive are simulated in a separate process that streams their poses here, so simulating and rendering overlap.
+Training never waits on any of this since it only has to record trajectories.
+
+    python export_frames.py --replay-trajectories runs/trajectories --out frames
+    ffmpeg -framerate 60 -i frames/frame_%06d.png replay.mp4
+"""
+import os
+# Has to be set before Qt is loaded
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import argparse
+import multiprocessing
+import queue
+import time
+from typing import Iterator, List, Optional, Tuple
+import numpy as np
+from Box2D import b2World, b2Vec2
+from PyQt5.QtGui import QImage, QPainter, QColor, QFont
+from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtWidgets import QApplication
+import PyGenoCar
+from PyGenoCar import draw_floor, draw_recorded_car, FPS
+from boxcar.archive import PopulationArchive
+from boxcar.car import Car
+from boxcar.floor import Floor
+from boxcar.trajectory import TrajectoryFile, CarShape, car_poses
+from boxcar.writer import BackgroundWriter
+import settings
+from settings import Settings, get_settings
+
+
+# Frames per message from the simulation process
+_CHUNK_FRAMES = 240
+
+
+class FrameRenderer(object):
+    """
+    Draws cars from their poses onto an offscreen image. The camera follows the chassis the same way
+    `GameWindow.pan_camera_to_leader` does.
+    """
+    def __init__(self, floor: Floor, size: Tuple[int, int] = (800, 500), scale: float = 70,
+                 camera_speed: float = 0.05):
+        self.floor = floor
+        self.width, self.height = size
+        self.scale = scale
+        self.camera_speed = camera_speed
+        self._camera = b2Vec2()
+        self._font = QFont()
+        self._font.setPixelSize(max(self.height // 25, 10))
+
+    def render(self, poses: np.ndarray, shape: CarShape, label: Optional[str] = None) -> QImage:
+        """
+        Moves the camera towards the car and draws the next frame
+        """
+        x, y = float(poses[0, 0]), float(poses[0, 1])
+        self._camera.x -= self.camera_speed * (self._camera.x - x)
+        self._camera.y -= self.camera_speed * (self._camera.y - y)
+
+        image = QImage(self.width, self.height, QImage.Format_RGB32)
+        image.fill(Qt.white)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+        # Same placement as the GUI: the camera sits a quarter of the way in and halfway down
+        painter.translate(self.width / 4 - self._camera.x * self.scale, self.height / 2 + self._camera.y * self.scale)
+        painter.scale(self.scale, -self.scale)
+        draw_floor(painter, self.floor)
+        draw_recorded_car(painter, poses, shape)
+        if label:
+            painter.resetTransform()
+            painter.setFont(self._font)
+            painter.setPen(QColor(Qt.black))
+            painter.drawText(QRectF(10, 10, self.width - 20, self.height - 20), Qt.AlignLeft | Qt.AlignTop, label)
+        painter.end()
+        return image
+
+
+def _simulate(chromosomes: List[np.ndarray], car_settings: Settings, out: multiprocessing.Queue) -> None:
+    """
+    Runs in the simulation process. Sends the poses of each car in chunks of (frames, 1 + num_wheels, 3),
+    followed by None once the car is done.
+    """
+    for chromosome in chromosomes:
+        # Every car gets a new world so it runs the same as when it is replayed on its own
+        world = b2World(car_settings.boxcar.gravity)
+        floor = Floor(world, settings=car_settings)
+        car = Car.create_car_from_chromosome(world, floor.winning_tile, floor.lowest_y, np.inf, chromosome, car_settings)
+        frames = []
+        while car.update():
+            frames.append(car_poses(car))
+            if len(frames) == _CHUNK_FRAMES:
+                out.put(np.stack(frames))
+                frames = []
+            world.ClearForces()
+            world.Step(1./FPS, 10, 6)
+        if frames:
+            out.put(np.stack(frames))
+        out.put(None)
+
+def _simulated_poses(chromosomes: List[np.ndarray], labels: List[str]) -> Iterator[Tuple[str, CarShape, np.ndarray]]:
+    """
+    Yields (label, shape, chunk of poses) while a separate process simulates the cars
+    """
+    # Don't fork a process that has Qt and writer threads running
+    context = multiprocessing.get_context('spawn')
+    # Bounded, so the simulation can't run arbitrarily far ahead of the rendering
+    poses = context.Queue(maxsize=8)
+    process = context.Process(target=_simulate, args=(chromosomes, get_settings(), poses), daemon=True)
+    process.start()
+    try:
+        for chromosome, label in zip(chromosomes, labels):
+            shape = CarShape(chromosome)
+            while True:
+                try:
+                    chunk = poses.get(timeout=1.0)
+                except queue.Empty:
+                    if not process.is_alive():
+                        raise Exception('The simulation process exited with code {}'.format(process.exitcode))
+                    continue
+                if chunk is None:
+                    break
+                yield label, shape, chunk
+    finally:
+        process.terminate()
+        process.join()
+
+def _recorded_poses(trajectories: TrajectoryFile, records: List[int]) -> Iterator[Tuple[str, CarShape, np.ndarray]]:
+    for record in records:
+        entry = trajectories.index[record]
+        label = 'Generation {}'.format(int(entry['generation']))
+        yield label, CarShape(entry['chromosome']), trajectories.poses(record)
+
+def _sources(args) -> Iterator[Tuple[str, CarShape, np.ndarray]]:
+    """
+    Loads the settings of whatever is being replayed and returns what to draw
+    """
+    if args.replay_trajectories:
+        trajectories = TrajectoryFile(args.replay_trajectories)
+        if trajectories.settings is None:
+            raise Exception('settings.pkl not found within {}'.format(args.replay_trajectories))
+        settings.settings = trajectories.settings
+        if args.replay_index is not None:
+            records = [int(trajectories.champions()[args.replay_index])]
+        else:
+            records = list(trajectories.champions())
+        return _recorded_poses(trajectories, records)
+
+    if args.replay_from_archive:
+        archive = PopulationArchive(args.replay_from_archive)
+        if archive.settings is None:
+            raise Exception('settings not found within {}'.format(args.replay_from_archive))
+        settings.settings = archive.settings
+        indices = [args.replay_index] if args.replay_index is not None else list(range(len(archive)))
+        chromosomes = [archive.chromosome(i) for i in indices]
+        labels = ['Individual {}'.format(i) for i in indices]
+    elif args.replay_from_folder:
+        if 'settings.pkl' not in os.listdir(args.replay_from_folder):
+            raise Exception('settings.pkl not found within {}'.format(args.replay_from_folder))
+        import dill as pickle
+        with open(os.path.join(args.replay_from_folder, 'settings.pkl'), 'rb') as f:
+            settings.settings = pickle.load(f)
+        num_cars = len([x for x in os.listdir(args.replay_from_folder) if x.startswith('car_')])
+        indices = [args.replay_index] if args.replay_index is not None else list(range(num_cars))
+        chromosomes = [np.load(os.path.join(args.replay_from_folder, 'car_{}.npy'.format(i))) for i in indices]
+        labels = ['Car {}'.format(i) for i in indices]
+    else:
+        raise Exception('Nothing to export. Pass --replay-trajectories, --replay-from-archive or --replay-from-folder')
+    return _simulated_poses(chromosomes, labels)
+
+def export_frames(args) -> int:
+    """
+    Writes every `--every`th frame to `--out` as frame_NNNNNN.png. Returns the number of frames written.
+    """
+    if os.path.isdir(args.out) and any(name.startswith('frame_') for name in os.listdir(args.out)):
+        raise Exception('{} already contains frames. This would overwrite them, choose a different folder or delete it and try again'.format(args.out))
+    if not os.path.exists(args.out):
+        os.makedirs(args.out)
+    width, height = (int(x) for x in args.size.lower().split('x'))
+
+    sources = _sources(args)
+    # The pen widths in the drawing functions go off of the GUI's zoom
+    PyGenoCar.scale = args.scale
+    world = b2World(get_settings().boxcar.gravity)
+    renderer = FrameRenderer(Floor(world, settings=get_settings()), (width, height), args.scale, args.camera_speed)
+
+    # Encoding PNGs takes longer than drawing them, and Qt lets go of the GIL while it does
+    writers = [BackgroundWriter() for _ in range(args.writers)]
+    frame = 0
+    written = 0
+    for label, shape, poses in sources:
+        for pose in poses:
+            image = renderer.render(pose, shape, label)
+            if frame % args.every == 0:
+                path = os.path.join(args.out, 'frame_{:06d}.png'.format(written))
+                writers[written % len(writers)].submit(image.save, path, 'PNG', args.png_quality)
+                written += 1
+                if args.max_frames and written >= args.max_frames:
+                    break
+            frame += 1
+        if args.max_frames and written >= args.max_frames:
+            break
+    for writer in writers:
+        writer.close()
+    return written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Export PyGenoCar replays as PNG frames')
+    parser.add_argument('--out', dest='out', type=str, required=True, help='folder to write frame_NNNNNN.png to')
+    parser.add_argument('--replay-trajectories', dest='replay_trajectories', type=str, help='folder from --record-trajectories. Exports the champion of each generation')
+    parser.add_argument('--replay-from-archive', dest='replay_from_archive', type=str, help='population archive (.npz) to simulate individuals from')
+    parser.add_argument('--replay-from-folder', dest='replay_from_folder', type=str, help='folder of car_N.npy to simulate individuals from')
+    parser.add_argument('--replay-index', dest='replay_index', type=int, help='only export this individual (or this champion for trajectories)')
+    parser.add_argument('--size', dest='size', type=str, default='800x500', help='WIDTHxHEIGHT of the frames')
+    parser.add_argument('--scale', dest='scale', type=float, default=70, help='pixels per meter')
+    parser.add_argument('--camera-speed', dest='camera_speed', type=float, default=0.05, help='how far the camera moves towards the car each frame. 1 locks onto it')
+    parser.add_argument('--every', dest='every', type=int, default=1, help='only write every Nth frame, i.e. 2 for 30 FPS')
+    parser.add_argument('--max-frames', dest='max_frames', type=int, default=None, help='stop after writing this many frames')
+    parser.add_argument('--png-quality', dest='png_quality', type=int, default=-1, help='0-100, higher is faster to write but larger. -1 uses the Qt default')
+    parser.add_argument('--writers', dest='writers', type=int, default=2, help='threads encoding PNGs')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    app = QApplication([])
+    start = time.time()
+    num_frames = export_frames(args)
+    elapsed = time.time() - start
+    print('wrote {} frames to {} in {:.1f}s ({:.1f} frames/s)'.format(num_frames, args.out, elapsed, num_frames / max(elapsed, 1e-9)))
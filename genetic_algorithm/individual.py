@@ -3,6 +3,9 @@ from typing import Optional, Union
 import numpy as np
 
 class Individual(object):
+    # Empty so that subclasses can use __slots__
+    __slots__ = ()
+
     def __init__(self):
         pass
 
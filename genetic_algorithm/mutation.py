@@ -94,10 +94,10 @@ def exponential_mutation(chromosome: np.ndarray, xi: Union[float, np.ndarray], p
     chromosome[mutation_array] += delta[mutation_array]
 
 def mmo_mutation(chromosome: np.ndarray, prob_mutation: float) -> None:
-    from scipy import stats
     mutation_array = np.random.random(chromosome.shape) < prob_mutation
     normal = np.random.normal(size=chromosome.shape)  # Eq 11.21
-    cauchy = stats.cauchy.rvs(size=chromosome.shape)  # Eq 11.22
+    # Same draw as scipy.stats.cauchy.rvs, without having to import scipy
+    cauchy = np.random.standard_cauchy(size=chromosome.shape)  # Eq 11.22
     
     # Eq 11.20
     delta = np.empty(chromosome.shape)
@@ -0,0 +1,178 @@
+"""
+Re-scores saved cars, i.e. after changing the fitness function or the track.
+
+Every chromosome from the given populations (archives, or folders of archives and/or `car_N.npy`) is run on every
+requested floor in a process pool. Populations are read a batch at a time, so memory use doesn't grow with how many
+cars there are. Results are appended to a CSV with one row per (source, index, floor type, floor seed):
+
+    python rescore.py runs/pops runs/best --floor-seeds 0,1,2 --out rescored.csv
+
+Running the same command again skips every row that is already in the CSV, so an interrupted job picks up where
+it stopped. A batch that was only partly written is scored again as a whole, since the cars sharing a world change
+the results, and only its missing rows are written. Rows also record the fingerprint of the settings they were scored with, and only rows with the current
+fingerprint count as done.
+"""
+import argparse
+import csv
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Set, Tuple
+import numpy as np
+from boxcar.archive import PopulationArchive, is_archive
+from boxcar.headless import evaluate
+from settings import Settings, compile_settings, get_settings
+
+
+STAT_COLUMNS = ['fitness', 'max_position', 'frames', 'chassis_volume', 'wheels_volume', 'num_wheels', 'is_winner']
+COLUMNS = ['source', 'index', 'floor_type', 'floor_seed', 'settings'] + STAT_COLUMNS
+
+# (source, index, floor type, floor seed)
+Key = Tuple[str, int, str, int]
+
+
+def iter_batches(paths: List[str], batch_size: int) -> Iterator[Tuple[List[Tuple[str, int]], np.ndarray]]:
+    """
+    Yields ([(source, index), ...], chromosomes) with at most `batch_size` chromosomes at a time.
+    A batch never mixes archives, so the batches of an archive are the same every run.
+    `car_N.npy` files are their own source with index 0.
+    """
+    for path in paths:
+        if is_archive(path):
+            yield from _archive_batches(path, batch_size)
+        elif os.path.isdir(path):
+            names = os.listdir(path)
+            archives = sorted((name for name in names if name.endswith('.npz')), key=_natural_key)
+            for name in archives:
+                yield from _archive_batches(os.path.join(path, name), batch_size)
+            cars = sorted((name for name in names if name.startswith('car_') and name.endswith('.npy')), key=_natural_key)
+            for start in range(0, len(cars), batch_size):
+                files = [os.path.join(path, name) for name in cars[start: start + batch_size]]
+                yield [(f, 0) for f in files], np.stack([np.load(f) for f in files])
+        else:
+            raise Exception('{} is neither a population archive nor a folder'.format(path))
+
+def _archive_batches(path: str, batch_size: int) -> Iterator[Tuple[List[Tuple[str, int]], np.ndarray]]:
+    archive = PopulationArchive(path)
+    for start in range(0, len(archive), batch_size):
+        end = min(start + batch_size, len(archive))
+        # Only this batch is read from the memory mapped archive
+        yield [(path, i) for i in range(start, end)], np.array(archive.chromosomes[start:end])
+
+def _natural_key(name: str) -> Tuple:
+    """
+    Sorts pop_gen2 before pop_gen10
+    """
+    match = re.match(r'(\D*)(\d+)', name)
+    if not match:
+        return (name, -1, name)
+    return (match.group(1), int(match.group(2)), name)
+
+def floor_settings(settings: Settings, floor_type: str) -> Settings:
+    """
+    Copy of `settings` with a different `floor_creation_type`
+    """
+    raw = dict(settings.raw)
+    raw['boxcar'] = dict(raw['boxcar'])
+    raw['boxcar']['floor_creation_type'] = (floor_type, str)
+    return compile_settings(raw)
+
+def load_done(path: str, fingerprint: str) -> Set[Key]:
+    """
+    Keys already in the results that were scored with the same settings.
+    A partly written last line (from being killed mid-write) is cut off.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['settings'] == fingerprint:
+                done.add((row['source'], int(row['index']), row['floor_type'], int(row['floor_seed'])))
+    return done
+
+def rescore(paths: List[str], out: str, floor_types: List[str], floor_seeds: List[int],
+            settings: Settings, batch_size: int, workers: int) -> int:
+    """
+    Scores everything that isn't in `out` yet. Returns the number of rows written.
+    """
+    fingerprint = settings.fingerprint[:12]
+    done = load_done(out, fingerprint)
+    floors = [(floor_type, seed, floor_settings(settings, floor_type)) for floor_type in floor_types for seed in floor_seeds]
+
+    new_file = not os.path.exists(out) or os.path.getsize(out) == 0
+    written = 0
+    skipped = 0
+    start_time = time.time()
+    with open(out, 'a', newline='') as f, ProcessPoolExecutor(workers) as pool:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(COLUMNS)
+            f.flush()
+        pending: Dict[Future, Tuple[List[Tuple[str, int]], str, int]] = {}
+
+        last_report = 0.0
+
+        def write_finished(block: bool) -> None:
+            nonlocal written, last_report
+            finished, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in finished:
+                keys, floor_type, seed = pending.pop(future)
+                stats = future.result()
+                columns = [stats[name].tolist() for name in STAT_COLUMNS]
+                # Killed part way through this, some of the rows make it to the file. Those aren't written again
+                rows = [[source, index, floor_type, seed, fingerprint] + list(row)
+                        for (source, index), row in zip(keys, zip(*columns))
+                        if (source, index, floor_type, seed) not in done]
+                writer.writerows(rows)
+                f.flush()
+                written += len(rows)
+            if finished and time.time() - last_report > 1.0:
+                last_report = time.time()
+                print('{} rows written, {} already done ({:.1f} rows/s)'.format(written, skipped, written / max(time.time() - start_time, 1e-9)))
+
+        for keys, chromosomes in iter_batches(paths, batch_size):
+            for floor_type, seed, settings_for_floor in floors:
+                num_done = sum((source, index, floor_type, seed) in done for source, index in keys)
+                skipped += num_done
+                if num_done == len(keys):
+                    continue
+                # Keep a couple of batches per worker queued. Anything more would just sit in memory
+                while len(pending) >= 2 * workers:
+                    write_finished(block=True)
+                # Always the whole batch, cars in the same world affect each other's scores
+                future = pool.submit(evaluate, chromosomes, settings_for_floor, seed, len(chromosomes))
+                pending[future] = (keys, floor_type, seed)
+            write_finished(block=False)
+        while pending:
+            write_finished(block=True)
+    return written
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Re-score saved PyGenoCar populations')
+    parser.add_argument('paths', nargs='+', help='population archives, or folders of archives and/or car_N.npy')
+    parser.add_argument('--out', dest='out', type=str, required=True, help='CSV to append results to. Rows already in it are skipped')
+    parser.add_argument('--floor-types', dest='floor_types', type=str, default=None, help='comma separated floor_creation_type values (default: from settings)')
+    parser.add_argument('--floor-seeds', dest='floor_seeds', type=str, default=None, help='comma separated floor seeds (default: gaussian_floor_seed)')
+    parser.add_argument('--batch-size', dest='batch_size', type=int, default=None, help='cars per world (default: run_at_a_time)')
+    parser.add_argument('--workers', dest='workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    settings = get_settings()
+    floor_types = args.floor_types.split(',') if args.floor_types else [settings.boxcar.floor_creation_type]
+    floor_seeds = [int(seed) for seed in args.floor_seeds.split(',')] if args.floor_seeds else [settings.boxcar.gaussian_floor_seed]
+    num_rows = rescore(args.paths, args.out, floor_types, floor_seeds, settings,
+                       args.batch_size or settings.boxcar.run_at_a_time, args.workers)
+    print('wrote {} rows to {}'.format(num_rows, args.out))
@@ -1,4 +1,6 @@
-from typing import Any, Tuple
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import warnings
 import numpy as np
 
 # Settings that control everything.
@@ -6,6 +8,9 @@ settings = {}
 settings['boxcar'] = {}
 settings['ga'] = {}
 __settings_cache = {}
+__settings_cache_source = None  # The settings dictionary the cache was built from
+__compiled = None  # Compiled snapshot of `settings`, see get_settings
+__compiled_source = None
 # The settings specific to the boxcar
 settings['boxcar'] = {
     ### Floor ###
@@ -99,6 +104,9 @@ settings['ga'] = {
     ),
 }
 
+# The defaults above. `settings` itself is replaced when loading settings.pkl
+_default_settings = settings
+
 def _verify_constants() -> None:
     failed = []
 
@@ -114,19 +122,10 @@ def _verify_constants() -> None:
         failed_constants = '\n'.join(fail for fail in failed)
         raise Exception('The following constants have invalid values for their types:\n{}'.format(failed_constants))
 
-def _get_constant(constant: str, controller: str) -> Any:
+def _resolve_constant(setting_map: Dict[str, Tuple[Any, Any]], constant: str) -> Any:
     """
-    Get the end value represented by the constant you are searching for
+    Resolve the end value of a constant within one controller (i.e. settings['boxcar']).
     """
-    # Caches are good. Normally making a cache for a dictionary doesn't make sense.
-    # Since I allow dependencies on other variables, a lookup could be O(N). By adding
-    # a cache where (constant, controller) is the key, we get O(1) lookup time again.
-    if (constant, controller) in __settings_cache:
-        return __settings_cache[(constant, controller)]
-    if controller not in settings:
-        raise Exception('Unable to find a setting for {}'.format(controller))
-    
-    setting_map = settings[controller]
     value, requested_type = setting_map[constant]
 
     while value in setting_map:
@@ -147,6 +146,27 @@ def _get_constant(constant: str, controller: str) -> Any:
             value = float(value)
     elif value and requested_type is float:
         value = float(value)
+
+    return value
+
+def _get_constant(constant: str, controller: str) -> Any:
+    """
+    Get the end value represented by the constant you are searching for
+    """
+    global __settings_cache_source
+    # Caches are good. Normally making a cache for a dictionary doesn't make sense.
+    # Since I allow dependencies on other variables, a lookup could be O(N). By adding
+    # a cache where (constant, controller) is the key, we get O(1) lookup time again.
+    # If `settings` was replaced (i.e. loaded from settings.pkl for a replay) the cache is stale.
+    if __settings_cache_source is not settings:
+        __settings_cache.clear()
+        __settings_cache_source = settings
+    if (constant, controller) in __settings_cache:
+        return __settings_cache[(constant, controller)]
+    if controller not in settings:
+        raise Exception('Unable to find a setting for {}'.format(controller))
+    
+    value = _resolve_constant(settings[controller], constant)
     
     # Set cache if we made it this far
     __settings_cache[(constant, controller)] = value
@@ -156,4 +176,130 @@ def get_boxcar_constant(constant: str) -> Any:
     return _get_constant(constant, 'boxcar')
 
 def get_ga_constant(constant: str) -> Any:
-    return _get_constant(constant, 'ga')
\ No newline at end of file
+    return _get_constant(constant, 'ga')
+
+
+class _Constants(object):
+    """
+    Resolved, read-only constants of one controller. Each subclass has a slot per constant.
+    """
+    __slots__ = ()
+    _controller = None
+
+    def __init__(self, values: Dict[str, Any]):
+        for constant in self.__slots__:
+            object.__setattr__(self, constant, values[constant])
+
+    def __setattr__(self, name, value):
+        raise Exception('{} settings are read-only'.format(self._controller))
+
+    def __delattr__(self, name):
+        raise Exception('{} settings are read-only'.format(self._controller))
+
+    def __repr__(self) -> str:
+        return '{}({})'.format(self.__class__.__name__,
+                               ', '.join('{}={!r}'.format(constant, getattr(self, constant)) for constant in self.__slots__))
+
+class BoxcarSettings(_Constants):
+    __slots__ = tuple(settings['boxcar'].keys())
+    _controller = 'boxcar'
+
+class GASettings(_Constants):
+    __slots__ = tuple(settings['ga'].keys())
+    _controller = 'ga'
+
+
+class Settings(object):
+    """
+    A compiled snapshot of a settings dictionary. Every constant is resolved and validated once,
+    and then read through plain attribute access, i.e. `snapshot.boxcar.max_wheel_density`.
+
+    Snapshots are immutable, can be pickled (so they can be shipped to worker processes) and have a
+    `fingerprint` that only changes if one of the values changes.
+
+    Settings saved before a constant was added (i.e. an old settings.pkl) get the default for it, with a warning
+    naming every constant that was filled in. Constants that no longer exist are ignored.
+    """
+    __slots__ = ('boxcar', 'ga', 'fingerprint', '_raw')
+
+    def __init__(self, raw: Dict[str, Dict[str, Tuple[Any, Any]]]):
+        failed = []
+        resolved = {}
+        missing = []
+        for controller, constants_class in (('boxcar', BoxcarSettings), ('ga', GASettings)):
+            setting_map = raw.get(controller, {})
+            missing_here = [constant for constant in constants_class.__slots__ if constant not in setting_map]
+            if missing_here:
+                missing.extend('{}: {}'.format(controller, constant) for constant in missing_here)
+                # Keep the filled in copy, so the snapshot pickles (i.e. for the workers) without warning again
+                setting_map = dict(_default_settings[controller], **setting_map)
+                raw = dict(raw, **{controller: setting_map})
+            values = {}
+            for constant in constants_class.__slots__:
+                try:
+                    values[constant] = _resolve_constant(setting_map, constant)
+                except Exception:
+                    failed.append('{}: {}'.format(controller, constant))
+            resolved[controller] = values
+
+        if failed:
+            failed_constants = '\n'.join(fail for fail in failed)
+            raise Exception('The following constants have invalid values for their types:\n{}'.format(failed_constants))
+        if missing:
+            warnings.warn('The settings are missing these constants, using their defaults instead:\n{}'.format('\n'.join(missing)))
+
+        object.__setattr__(self, 'boxcar', BoxcarSettings(resolved['boxcar']))
+        object.__setattr__(self, 'ga', GASettings(resolved['ga']))
+        object.__setattr__(self, 'fingerprint', _fingerprint(resolved))
+        object.__setattr__(self, '_raw', raw)
+
+    def __setattr__(self, name, value):
+        raise Exception('Settings are read-only')
+
+    def __reduce__(self):
+        # The fitness function is normally a lambda, which only dill can pickle
+        import dill
+        return (_unpickle_settings, (dill.dumps(self._raw),))
+
+    @property
+    def raw(self) -> Dict[str, Dict[str, Tuple[Any, Any]]]:
+        """
+        The settings dictionary this snapshot was compiled from. This is what gets saved to settings.pkl.
+        """
+        return self._raw
+
+def _unpickle_settings(data: bytes) -> Settings:
+    import dill
+    return Settings(dill.loads(data))
+
+def _fingerprint(resolved: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Hash of all resolved values. Functions are hashed by their bytecode and constants since their repr
+    contains a memory address.
+    """
+    digest = hashlib.sha1()
+    for controller in sorted(resolved):
+        for constant in sorted(resolved[controller]):
+            value = resolved[controller][constant]
+            if callable(value) and hasattr(value, '__code__'):
+                code = value.__code__
+                value = (code.co_code, code.co_consts, code.co_names, code.co_varnames)
+            digest.update('{}.{}={!r};'.format(controller, constant, value).encode())
+    return digest.hexdigest()
+
+def compile_settings(raw: Optional[Dict[str, Dict[str, Tuple[Any, Any]]]] = None) -> Settings:
+    """
+    Compiles a settings dictionary (defaults to the global `settings`) into an immutable `Settings` snapshot.
+    """
+    return Settings(settings if raw is None else raw)
+
+def get_settings() -> Settings:
+    """
+    Returns the snapshot of the global `settings`. It is recompiled if `settings` has been replaced,
+    i.e. when loading settings.pkl for a replay.
+    """
+    global __compiled, __compiled_source
+    if __compiled is None or __compiled_source is not settings:
+        __compiled = compile_settings(settings)
+        __compiled_source = settings
+    return __compiled
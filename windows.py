@@ -1,13 +1,14 @@
 from PyQt5 import QtGui, QtWidgets
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QScrollArea, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QFormLayout
 from PyQt5.QtGui import QPainter, QBrush, QPen, QPolygonF, QLinearGradient, QColor
-from PyQt5.QtCore import Qt, QPointF, QTimer, QRect
+from PyQt5.QtCore import Qt, QPointF, QTimer, QRect, QSize
 from boxcar.floor import *
 from boxcar.car import *
+from boxcar.run_stats import FitnessHistory
 from settings import settings, get_boxcar_constant, get_ga_constant
 import sys
 import time
-from typing import Tuple
+from typing import Optional, Tuple
 
 normal_font = QtGui.QFont('Times', 11, QtGui.QFont.Normal)
 font_bold = QtGui.QFont('Times', 11, QtGui.QFont.Bold)
@@ -248,10 +249,98 @@ class SettingsWindow(QWidget):
         self.setLayout(top_down)
 
     
+class FitnessChart(QWidget):
+    """
+    Best, mean and std of the fitness (left axis) and the number of winners (right axis) per generation.
+
+    Draws the buckets of a `FitnessHistory` rather than every generation, so it costs the same however long the run
+    is. Each bucket is drawn as a vertical span from its min to its max, joined to the next bucket, so a spike within a
+    bucket still shows. Nothing is redrawn until a generation is added, see `refresh`.
+    """
+    series_colors = {
+        'best':    QColor(200, 0, 0),
+        'mean':    QColor(0, 0, 200),
+        'std':     QColor(0, 150, 0),
+        'winners': QColor(150, 0, 200),
+    }
+
+    def __init__(self, parent, history: FitnessHistory):
+        super().__init__(parent)
+        self.history = history
+        self._num_generations = 0
+        self._font = QtGui.QFont('Times', 8, QtGui.QFont.Normal)
+
+    def sizeHint(self) -> QSize:
+        return QSize(160, 150)
+
+    def refresh(self) -> None:
+        """
+        Schedules a repaint if generations were added since the last one. Cheap enough to call on every stats update.
+        """
+        if self.history.num_generations != self._num_generations:
+            self._num_generations = self.history.num_generations
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setFont(self._font)
+        painter.setPen(QPen(Qt.black, 1, Qt.SolidLine))
+        painter.drawRect(0, 0, self.width() - 1, self.height() - 1)
+        starts, low, high = self.history.buckets()
+        if len(starts) == 0:
+            painter.drawText(self.rect(), Qt.AlignCenter, 'No generations finished yet')
+            return
+
+        metrics = painter.fontMetrics()
+        line_height = metrics.height()
+        # Leave room for the legend on top and the generations below
+        left, right = 4.0, self.width() - 4.0
+        top, bottom = 4.0 + line_height, self.height() - 4.0 - line_height
+
+        # Fitness can go negative. Winners get their own scale, from 0
+        fitness_low = min(0.0, float(low[:, :3].min()))
+        fitness_high = max(float(high[:, :3].max()), fitness_low + 1e-9)
+        winners_high = max(float(high[:, 3].max()), 1.0)
+
+        xs = left + np.arange(len(starts)) * ((right - left) / max(len(starts) - 1, 1))
+        painter.setRenderHint(QPainter.Antialiasing)
+        # Winners first, so they end up behind the fitness
+        for column, name in reversed(list(enumerate(FitnessHistory.SERIES))):
+            if name == 'winners':
+                span_low, span_high = 0.0, winners_high
+            else:
+                span_low, span_high = fitness_low, fitness_high
+            scale = (bottom - top) / (span_high - span_low)
+            ys_low = bottom - (low[:, column] - span_low) * scale
+            ys_high = bottom - (high[:, column] - span_low) * scale
+            points = [QPointF(x, y) for x, y_low, y_high in zip(xs, ys_low, ys_high) for y in (y_low, y_high)]
+            painter.setPen(QPen(self.series_colors[name], 1, Qt.SolidLine))
+            painter.drawPolyline(QPolygonF(points))
+        painter.setRenderHint(QPainter.Antialiasing, False)
+
+        # Legend and axes
+        x = left + 2
+        for name in FitnessHistory.SERIES:
+            painter.setPen(self.series_colors[name])
+            painter.drawText(QPointF(x, top - 4), name)
+            x += metrics.width(name) + 8
+        painter.setPen(Qt.black)
+        # The fitness usually climbs towards the right, so the top left is free
+        painter.drawText(QPointF(left + 2, top + line_height), 'max {:.0f} / {:.0f} won'.format(fitness_high, winners_high))
+        last_generation = self.history.first_generation + self._num_generations
+        generations = 'Gen {}-{}'.format(self.history.first_generation + 1, last_generation)
+        if self.history.bucket_size > 1:
+            generations += ', {}/point'.format(self.history.bucket_size)
+        painter.drawText(QPointF(left + 2, self.height() - 6), generations)
+
+
 class StatsWindow(QWidget):
-    def __init__(self, parent, size):
+    def __init__(self, parent, size, history: Optional[FitnessHistory] = None, show_phases: bool = False):
         super().__init__(parent)
         self.size = size
+        self.history = history if history is not None else FitnessHistory()
+        self.show_phases = show_phases
+        self.phases: Optional[QLabel] = None  # Slowest phase of the last generation, with --time-phases
 
         # Create a grid layout to keep track of certain stats
 
@@ -303,6 +392,22 @@ class StatsWindow(QWidget):
         hbox_num_alive.addWidget(self.current_num_alive, 1)
         stats_vbox.addLayout(hbox_num_alive)
 
+        # Cars on screen out of the ones on the track
+        cars_drawn_label = QLabel()
+        cars_drawn_label.setFont(font_bold)
+        cars_drawn_label.setText('Cars Drawn:')
+        cars_drawn_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        self.cars_drawn = QLabel()
+        self.cars_drawn.setFont(normal_font)
+        self.cars_drawn.setText('0/0')
+        self.cars_drawn.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+        hbox_cars_drawn = QHBoxLayout()
+        hbox_cars_drawn.setContentsMargins(5, 0, 0, 0)
+        # Give equal weight
+        hbox_cars_drawn.addWidget(cars_drawn_label, 1)
+        hbox_cars_drawn.addWidget(self.cars_drawn, 1)
+        stats_vbox.addLayout(hbox_cars_drawn)
+
         # population size
         pop_size_label = QLabel()
         pop_size_label.setFont(font_bold)
@@ -383,9 +488,28 @@ class StatsWindow(QWidget):
         hbox_gens_without_improvement.addWidget(self.gens_without_improvement, 1)
         stats_vbox.addLayout(hbox_gens_without_improvement)
 
+        # Where the time went last generation. The tooltip has every phase
+        if self.show_phases:
+            phases_label = QLabel()
+            phases_label.setFont(font_bold)
+            phases_label.setText('Time Last Gen:')
+            phases_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+            self.phases = QLabel()
+            self.phases.setFont(normal_font)
+            self.phases.setText('-')
+            self.phases.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+            hbox_phases = QHBoxLayout()
+            hbox_phases.setContentsMargins(5, 0, 0, 0)
+            # Give equal weight
+            hbox_phases.addWidget(phases_label, 1)
+            hbox_phases.addWidget(self.phases, 1)
+            stats_vbox.addLayout(hbox_phases)
+
         self.grid.addLayout(stats_vbox, 0, 0)
-        # self.grid.addWidget(QLabel(),0,1)
-        # self.grid.setColumnStretch(1,10)
+        self.fitness_chart = FitnessChart(self, self.history)
+        self.grid.addWidget(self.fitness_chart, 0, 1)
+        # The chart keeps its size hint and the stats and settings split the rest, so no labels get cut off
+        self.grid.setColumnStretch(0, 1)
         self._add_ga_settings_window()  # Finally add the GA Settings Window
     
     def _add_ga_settings_window(self) -> None:
@@ -439,6 +563,7 @@ class StatsWindow(QWidget):
         self._add_ga_entry(None, 'Lifespan:', font_bold, normal_font, force_value=lifespan)
 
         self.grid.addLayout(self.ga_settings_window, 0, 3)
+        self.grid.setColumnStretch(3, 1)
 
     def _add_ga_entry(self, constant: str, label_text: str,
                       label_font, value_font,